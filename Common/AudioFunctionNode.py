@@ -6,7 +6,7 @@ import torchaudio
 import struct
 import platform
 
-from .libs.function import get_next_file_path
+from .libs.file_index import claim_file_path
 
 def create_vorbis_comment_block(comment_dict, last_block):
     vendor_string = b'SmellCommon'
@@ -133,7 +133,7 @@ class AudioSaver:
             for (batch_number, waveform) in enumerate(audio["waveform"].cpu()):
                 try:
                     # 获取文件路径
-                    audio_path, txt_path = get_next_file_path(Directory, FilenamePrefix, "flac", FileMax)
+                    audio_path, txt_path = claim_file_path(Directory, FilenamePrefix, "flac", FileMax)
 
                     # 保存音频
                     buff = io.BytesIO()
@@ -5,12 +5,10 @@ import random
 import math
 
 from comfy.model_management import InterruptProcessingException
-from comfy.utils import common_upscale
 from nodes import PreviewImage, MAX_RESOLUTION
 
-from PIL import Image
+from PIL import Image, ImageColor
 from PIL.PngImagePlugin import PngInfo
-import torchvision.transforms.functional as F
 
 import numpy as np
 import psutil
@@ -18,24 +16,22 @@ import shutil
 
 from server import PromptServer
 from .libs.function import *
-from .libs.image_chooser_server import MessageHolder, Cancelled
+from .libs.image_chooser_server import MessageHolder, Cancelled, current_session
+from .libs.chooser_preview import send_previews
+from .libs.chooser_selection import choose_indices, select_tensor, select_items
+from .libs.chooser_policies import POLICIES, AUTO_MODES, TIMEOUT_MODE, auto_select
 from .libs.image_function import *
+from .libs.canvas import new_canvas, canvas_like, rgb_fill
+from .libs.image_compose import resize_batch, mask_for, channel_count, paste, grid_layout, atlas_layout, fit_resize_batch
+from .libs.tiled_resize import needs_tiling, tiled_resize_batch
+from .libs.aspect_buckets import COMMON_ASPECT_RATIOS, UNCOMMON_ASPECT_RATIOS, BucketTable, parse_ratios
 from .libs.os_function import *
+from .libs.save_queue import queue_image_batch
+from .libs.image_encoders import ENCODERS, PRESETS
 
 from .OpenPoseFunctionNode import MixOpenPoseNode
 
 
-def rescale(samples, width, height, algorithm: str):
-    if algorithm == "bislerp":  # convert for compatibility with old workflows
-        algorithm = "bicubic"
-    algorithm = getattr(Image, algorithm.upper())  # i.e. Image.BICUBIC
-    samples_pil: Image.Image = F.to_pil_image(samples[0].cpu()).resize((width, height), algorithm)
-    samples = F.to_tensor(samples_pil).unsqueeze(0)
-    return samples
-
-def pil2tensor(image):
-    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
-
 def is_folder_open(directory):
     for proc in psutil.process_iter():
         try:
@@ -52,11 +48,13 @@ class ImageChooser(PreviewImage):
     def INPUT_TYPES(self):
         return {
         "required":{
-            "mode": (["Always pause", "Repeat last selection", "Only pause if batch", "Pass through", "Take First n", "Take Last n"], {"default": "Always pause"}),
+            "mode": (["Always pause", "Repeat last selection", "Only pause if batch", "Pass through", "Take First n", "Take Last n", TIMEOUT_MODE, *AUTO_MODES], {"default": "Always pause"}),
             "count": ("INT", { "default": 1, "min": 1, "max": 999, "step": 1 }),
         },
         "optional": {
             "images": ("IMAGE",),
+            "timeout": ("FLOAT", { "default": 60.0, "min": 0.0, "max": 86400.0, "step": 1.0, "tooltip": "Seconds to wait in 'Pause with timeout' mode" }),
+            "timeout_policy": (list(POLICIES), { "default": "first n", "tooltip": "How to pick when 'Pause with timeout' expires" }),
         },
         "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO", "id":"UNIQUE_ID"},
         }
@@ -76,30 +74,19 @@ class ImageChooser(PreviewImage):
         return cls.last_ic[id[0]]
 
     def tensor_bundle(self, tensor_in: torch.Tensor, picks):
-        if tensor_in is not None and len(picks):
-            batch = tensor_in.shape[0]
-            return torch.cat(tuple([tensor_in[(x) % batch].unsqueeze_(0) for x in picks])).reshape([-1] + list(tensor_in.shape[1:]))
-        else:
-            return None
+        return select_tensor(tensor_in, picks)
 
     def batch_up_selections(self, images_in:torch.Tensor, selections, mode):
-        if (mode=="Pass through"):
-            chosen = range(0, self.batch)
-        elif (mode=="Take First n"):
-            end = self.count if self.batch >= self.count else self.batch
-            chosen = range(0, end)
-        elif (mode=="Take Last n"):
-            start = self.batch - self.count if self.batch - self.count >= 0 else 0
-            chosen = range(start, self.batch)
-        else:
-            chosen = [x for x in selections if x>=0]
-
+        chosen = choose_indices(mode, self.batch, self.count, selections)
         return (self.tensor_bundle(images_in, chosen), ",".join(str(x) for x in chosen), )
 
     def chooser(self, id=None, **kwargs):
         # mode doesn't exist in subclass
         self.count = int(kwargs.pop('count', [1,])[0])
         mode = kwargs.pop('mode',["Always pause",])[0]
+        timeout = float(kwargs.pop('timeout', [60.0,])[0])
+        timeout_policy = kwargs.pop('timeout_policy', ["first n",])[0]
+        repeat = (mode=="Repeat last selection")
         if mode=="Repeat last selection":
             print("Here despite 'Repeat last selection' - treat as 'Always pause'")
             mode = "Always pause"
@@ -108,15 +95,14 @@ class ImageChooser(PreviewImage):
             # UGH
             kwargs['prompt'][0][id[0]]['inputs']['mode'] = "Repeat last selection"
         id = id[0]
-        if id not in MessageHolder.stash:
-            MessageHolder.stash[id] = {}
-        my_stash = MessageHolder.stash[id]
-
+        client_id, prompt_id = current_session()
+        stash_key = MessageHolder.stashKey(id, client_id)
 
         # enable stashing. If images is None, we are operating in read-from-stash mode
         if 'images' in kwargs:
-            my_stash['images']  = kwargs['images']
+            MessageHolder.stash.put(stash_key, {'images': kwargs['images']})
         else:
+            my_stash = MessageHolder.stash.get(stash_key, {})
             kwargs['images']  = my_stash.get('images', None)
 
         if (kwargs['images'] is None):
@@ -129,17 +115,31 @@ class ImageChooser(PreviewImage):
         # any other parameters shouldn't be lists any more...
         for x in kwargs: kwargs[x] = kwargs[x][0]
 
-        # call PreviewImage base
-        ret = self.save_images(images=images_in, **kwargs)
+        # identical images seen before - reuse the remembered selection without previews or pausing
+        digest = MessageHolder.history.digest(images_in) if repeat else None
+        remembered = MessageHolder.history.get(id, digest) if repeat else None
 
-        # send the images to view
-        PromptServer.instance.send_sync("early-image-handler", {"id": id, "urls":ret['ui']['images']})
+        # send downscaled previews to view, full resolution is only encoded on request
+        if remembered is None:
+            send_previews(id, images_in, client_id, prompt_id)
 
         # wait for selection
         try:
-            is_block_condition = (mode == "Always pause" or mode == "Progress first pick" or self.batch > 1)
-            is_blocking_mode = (mode not in ["Pass through", "Take First n", "Take Last n"])
-            selections = MessageHolder.waitForMessage(id, asList=True) if (is_blocking_mode and is_block_condition) else [0]
+            is_block_condition = (mode == "Always pause" or mode == "Progress first pick" or mode == TIMEOUT_MODE or self.batch > 1)
+            is_blocking_mode = (mode not in ["Pass through", "Take First n", "Take Last n", *AUTO_MODES])
+            if remembered is not None:
+                selections = remembered
+            elif mode in AUTO_MODES:
+                selections = auto_select(AUTO_MODES[mode], images_in, self.count)
+            elif is_blocking_mode and is_block_condition:
+                selections = MessageHolder.waitForMessage(id, asList=True, timeout=timeout if mode == TIMEOUT_MODE else None, session=(client_id, prompt_id))
+                if selections is None:
+                    selections = auto_select(timeout_policy, images_in, self.count)
+                elif repeat:
+                    # remember the user's choice under the content hash of this batch (only hashed in repeat mode)
+                    MessageHolder.history.put(id, digest, selections)
+            else:
+                selections = [0]
         except Cancelled:
             raise InterruptProcessingException()
             #return (None, None,)
@@ -158,10 +158,13 @@ class PreviewAndChoose(PreviewImage):
     def INPUT_TYPES(s):
         return {
             "required": {
-                "mode" : (["Always pause", "Repeat last selection", "Only pause if batch", "Progress first pick", "Pass through", "Take First n", "Take Last n"],{}),
+                "mode" : (["Always pause", "Repeat last selection", "Only pause if batch", "Progress first pick", "Pass through", "Take First n", "Take Last n", TIMEOUT_MODE, *AUTO_MODES],{}),
 				"count": ("INT", { "default": 1, "min": 1, "max": 999, "step": 1 }),
             },
-            "optional": {"images": ("IMAGE", ), "latents": ("LATENT", ), "masks": ("MASK", ), "segs":("SEGS", ) },
+            "optional": {"images": ("IMAGE", ), "latents": ("LATENT", ), "masks": ("MASK", ), "segs":("SEGS", ),
+                         "timeout": ("FLOAT", { "default": 60.0, "min": 0.0, "max": 86400.0, "step": 1.0, "tooltip": "Seconds to wait in 'Pause with timeout' mode" }),
+                         "timeout_policy": (list(POLICIES), { "default": "first n", "tooltip": "How to pick when 'Pause with timeout' expires" }),
+            },
             "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO", "id":"UNIQUE_ID"},
         }
 
@@ -175,6 +178,9 @@ class PreviewAndChoose(PreviewImage):
         # mode doesn't exist in subclass
         self.count = int(kwargs.pop('count', [1,])[0])
         mode = kwargs.pop('mode',["Always pause",])[0]
+        timeout = float(kwargs.pop('timeout', [60.0,])[0])
+        timeout_policy = kwargs.pop('timeout_policy', ["first n",])[0]
+        repeat = (mode=="Repeat last selection")
         if mode=="Repeat last selection":
             print("Here despite 'Repeat last selection' - treat as 'Always pause'")
             mode = "Always pause"
@@ -183,18 +189,20 @@ class PreviewAndChoose(PreviewImage):
             # UGH
             kwargs['prompt'][0][id[0]]['inputs']['mode'] = "Repeat last selection"
         id = id[0]
-        if id not in MessageHolder.stash:
-            MessageHolder.stash[id] = {}
-        my_stash = MessageHolder.stash[id]
+        client_id, prompt_id = current_session()
+        stash_key = MessageHolder.stashKey(id, client_id)
 
         DOING_SEGS = 'segs' in kwargs
 
         # enable stashing. If images is None, we are operating in read-from-stash mode
         if 'images' in kwargs:
-            my_stash['images']  = kwargs['images']
-            my_stash['latents'] = kwargs.get('latents', None)
-            my_stash['masks']   = kwargs.get('masks', None)
+            MessageHolder.stash.put(stash_key, {
+                'images':  kwargs['images'],
+                'latents': kwargs.get('latents', None),
+                'masks':   kwargs.get('masks', None),
+            })
         else:
+            my_stash = MessageHolder.stash.get(stash_key, {})
             kwargs['images']  = my_stash.get('images', None)
             kwargs['latents'] = my_stash.get('latents', None)
             kwargs['masks']   = my_stash.get('masks', None)
@@ -214,33 +222,39 @@ class PreviewAndChoose(PreviewImage):
         # any other parameters shouldn't be lists any more...
         for x in kwargs: kwargs[x] = kwargs[x][0]
 
-        # call PreviewImage base
-        ret = self.save_images(images=images_in, **kwargs)
+        # identical images seen before - reuse the remembered selection without previews or pausing
+        digest = MessageHolder.history.digest(images_in) if repeat else None
+        remembered = MessageHolder.history.get(id, digest) if repeat else None
 
-        # send the images to view
-        PromptServer.instance.send_sync("early-image-handler", {"id": id, "urls":ret['ui']['images']})
+        # send downscaled previews to view, full resolution is only encoded on request
+        if remembered is None:
+            send_previews(id, images_in, client_id, prompt_id)
 
         # wait for selection
         try:
-            is_block_condition = (mode == "Always pause" or mode == "Progress first pick" or self.batch > 1)
-            is_blocking_mode = (mode not in ["Pass through", "Take First n", "Take Last n"])
-            selections = MessageHolder.waitForMessage(id, asList=True) if (is_blocking_mode and is_block_condition) else [0]
+            is_block_condition = (mode == "Always pause" or mode == "Progress first pick" or mode == TIMEOUT_MODE or self.batch > 1)
+            is_blocking_mode = (mode not in ["Pass through", "Take First n", "Take Last n", *AUTO_MODES])
+            if remembered is not None:
+                selections = remembered
+            elif mode in AUTO_MODES:
+                selections = auto_select(AUTO_MODES[mode], images_in, self.count)
+            elif is_blocking_mode and is_block_condition:
+                selections = MessageHolder.waitForMessage(id, asList=True, timeout=timeout if mode == TIMEOUT_MODE else None, session=(client_id, prompt_id))
+                if selections is None:
+                    selections = auto_select(timeout_policy, images_in, self.count)
+                elif repeat:
+                    # remember the user's choice under the content hash of this batch (only hashed in repeat mode)
+                    MessageHolder.history.put(id, digest, selections)
+            else:
+                selections = [0]
         except Cancelled:
             raise InterruptProcessingException()
             #return (None, None,)
 
-        if DOING_SEGS:
-            segs_out = (segs_in[0][0], list(segs_in[0][1][i] for i in selections if i>=0) )
-            return(None, None, None, None, segs_out)
-
-        return self.batch_up_selections(images_in=images_in, latent_samples_in=latent_samples_in, masks_in=masks_in, selections=selections, mode=mode)
+        return self.batch_up_selections(images_in=images_in, latent_samples_in=latent_samples_in, masks_in=masks_in, selections=selections, mode=mode, segs_in=segs_in)
 
     def tensor_bundle(self, tensor_in:torch.Tensor, picks):
-        if tensor_in is not None and len(picks):
-            batch = tensor_in.shape[0]
-            return torch.cat(tuple([tensor_in[(x)%batch].unsqueeze_(0) for x in picks])).reshape([-1]+list(tensor_in.shape[1:]))
-        else:
-            return None
+        return select_tensor(tensor_in, picks)
 
     def latent_bundle(self, latent_samples_in:torch.Tensor, picks):
         if (latent_samples_in is not None and len(picks)):
@@ -248,17 +262,12 @@ class PreviewAndChoose(PreviewImage):
         else:
             return None
 
-    def batch_up_selections(self, images_in:torch.Tensor, latent_samples_in:torch.Tensor, masks_in:torch.Tensor, selections, mode):
-        if (mode=="Pass through"):
-            chosen = range(0, self.batch)
-        elif (mode=="Take First n"):
-            end = self.count if self.batch >= self.count else self.batch
-            chosen = range(0, end)
-        elif (mode=="Take Last n"):
-            start = self.batch - self.count if self.batch - self.count >= 0 else 0
-            chosen = range(start, self.batch)
-        else:
-            chosen = [x for x in selections if x>=0]
+    def batch_up_selections(self, images_in:torch.Tensor, latent_samples_in:torch.Tensor, masks_in:torch.Tensor, selections, mode, segs_in=None):
+        chosen = choose_indices(mode, self.batch, self.count, selections)
+
+        if segs_in is not None:
+            segs_out = (segs_in[0][0], select_items(segs_in[0][1], chosen))
+            return (None, None, None, None, segs_out)
 
         return (self.tensor_bundle(images_in, chosen), self.latent_bundle(latent_samples_in, chosen), self.tensor_bundle(masks_in, chosen), ",".join(str(x) for x in chosen), None, )
 
@@ -296,128 +305,168 @@ class ImageAndMaskConcatenationNode:
         # 检查批量大小是否不同
         batch_size1 = image1.shape[0]
         batch_size2 = image2.shape[0]
-
-        if mask1 == None:
-            mask1 = torch.zeros_like(image1[:, :, :, 0])
-        if mask2 == None:
-            mask2 = torch.zeros_like(image2[:, :, :, 0])
-
         if batch_size1 != batch_size2:
             raise ValueError(f"Batch size mismatch: image1 has {batch_size1} samples, but image2 has {batch_size2} samples. Both must have the same batch size.")
 
-        results_image = []
-        results_mask = []
-        concatenated_width = 0
-        concatenated_height = 0
-        x = 0
-        y = 0
-
-        for b in range(batch_size1):
-            one_image1 = image1[b].unsqueeze(0)  # Adding batch dimension
-            one_mask1 = mask1[b].unsqueeze(0)    # Adding batch dimension
-            one_image2 = image2[b].unsqueeze(0)  # Adding batch dimension
-            one_mask2 = mask2[b].unsqueeze(0)    # Adding batch dimension
-
-            image1_height = one_image1.shape[1]
-            image1_width = one_image1.shape[2]
-            image2_height = one_image2.shape[1]
-            image2_width = one_image2.shape[2]
-
-            mask1_height = one_mask1.shape[1]
-            mask1_width = one_mask1.shape[2]
-            mask2_height = one_mask2.shape[1]
-            mask2_width = one_mask2.shape[2]
-
-            # 比较 image1 和 mask1 的尺寸
-            if image1_height != mask1_height or image1_width != mask1_width:
-                # 创建一个与 image1 尺寸相同的 mask1，初始化为全零或其他默认值
-                one_mask1 = torch.zeros_like(one_image1[:, :, :, 0])  # 创建一个与 image1 相同尺寸的全零掩膜
-                print(f"警告：image1 的尺寸 ({image1_height}, {image1_width}) 与 mask1 的尺寸 ({mask1_height}, {mask1_width}) 不匹配，已创建新的掩膜。")
-
-            # 比较 image2 和 mask2 的尺寸
-            if image2_height != mask2_height or image2_width != mask2_width:
-                # 创建一个与 image1 尺寸相同的 mask1，初始化为全零或其他默认值
-                one_mask2 = torch.zeros_like(one_image2[:, :, :, 0]) # 创建一个与 image1 相同尺寸的全零掩膜
-                print(f"警告：image2 的尺寸 ({image2_height}, {image2_width}) 与 mask2 的尺寸 ({mask2_height}, {mask2_width}) 不匹配，已创建新的掩膜。")
+        # 尺寸不匹配的掩膜替换为全零掩膜
+        mask1 = mask_for(image1, mask1, "mask1")
+        mask2 = mask_for(image2, mask2, "mask2")
+
+        if match_image_size:
+            # 如果提供了 first_image_shape，则使用它；否则，默认为 image1 的形状 (B, H, W, C 格式)
+            target_shape = first_image_shape if first_image_shape is not None else image1.shape
+            original_aspect_ratio = image2.shape[2] / image2.shape[1]
+            if direction in ['left', 'right']:
+                # 匹配高度并调整宽度以保持纵横比
+                target_height = target_shape[1]
+                target_width = int(target_height * original_aspect_ratio)
+            else:
+                # 匹配宽度并调整高度以保持纵横比
+                target_width = target_shape[2]
+                target_height = int(target_width / original_aspect_ratio)
+            # 整个批次一次插值，在 image2 所在设备上完成
+            image2 = resize_batch(image2, target_width, target_height)
+            mask2 = resize_batch(mask2, target_width, target_height)
+
+        height1, width1 = image1.shape[1], image1.shape[2]
+        height2, width2 = image2.shape[1], image2.shape[2]
+        if direction in ['left', 'right'] and height1 != height2:
+            raise ValueError(f"Height mismatch: cannot concatenate {direction} images of height {height1} and {height2}, enable match_image_size.")
+        if direction in ['up', 'down'] and width1 != width2:
+            raise ValueError(f"Width mismatch: cannot concatenate {direction} images of width {width1} and {width2}, enable match_image_size.")
+
+        # 根据指定的方向计算两张图的位置
+        x = y = 0
+        if direction == 'right':
+            pos1, pos2 = (0, 0), (width1, 0)
+            x = width1
+        elif direction == 'down':
+            pos1, pos2 = (0, 0), (0, height1)
+            y = height1
+        elif direction == 'left':
+            pos1, pos2 = (width2, 0), (0, 0)
+            x = width2
+        else:
+            pos1, pos2 = (0, height2), (0, 0)
+            y = height2
+
+        if direction in ['left', 'right']:
+            concatenated_width, concatenated_height = width1 + width2, height1
+        else:
+            concatenated_width, concatenated_height = width1, height1 + height2
 
-            if match_image_size:
-                # 如果提供了 first_image_shape，则使用它；否则，默认为 image1 的形状
-                target_shape = first_image_shape if first_image_shape is not None else one_image1.shape
-
-                original_height = one_image2.shape[1]
-                original_width = one_image2.shape[2]
-                original_aspect_ratio = original_width / original_height
-
-                if direction in ['left', 'right']:
-                    # 匹配高度并调整宽度以保持纵横比
-                    target_height = target_shape[1]  # B, H, W, C 格式
-                    target_width = int(target_height * original_aspect_ratio)
-                elif direction in ['up', 'down']:
-                    # 匹配宽度并调整高度以保持纵横比
-                    target_width = target_shape[2]  # B, H, W, C 格式
-                    target_height = int(target_width / original_aspect_ratio)
-
-                samples = one_image2
-                samples = samples.movedim(-1, 1)
-                samples = rescale(samples, target_width, target_height, "nearest")
-                samples = samples.movedim(1, -1)
-                one_image2 = samples
-
-                samples = one_mask2
-                samples = samples.unsqueeze(1)
-                samples = rescale(samples, target_width, target_height, "nearest")
-                samples = samples.squeeze(1)
-                one_mask2 = samples
-
-
-            # 确保两个图像具有相同数量的通道
-            channels_image1 = one_image1.shape[-1]
-            channels_mask1 = one_mask1.shape[-1]
-            channels_image2 = one_image2.shape[-1]
-            channels_mask2 = one_mask2.shape[-1]
-
-            if channels_image1 != channels_image2:
-                if channels_image1 < channels_image2:
-                    # 如果 image2 有 alpha 通道，则为 image1 添加 alpha 通道
-                    alpha_channel = torch.ones((*one_image1.shape[:-1], channels_image2 - channels_image1), device=one_image1.device)
-                    alpha_channel_mask = torch.ones((*one_mask1.shape[:-1], channels_mask2 - channels_mask1), device=one_mask1.device)
-                    one_image1 = torch.cat((one_image1, alpha_channel), dim=-1)
-                else:
-                    # 如果 image1 有 alpha 通道，则为 image2 添加 alpha 通道
-                    alpha_channel = torch.ones((*one_image2.shape[:-1], channels_image1 - channels_image2), device=one_image2.device)
-                    alpha_channel_mask = torch.ones((*one_mask2.shape[:-1], channels_mask1 - channels_mask2), device=one_mask2.device)
-                    one_image2 = torch.cat((one_image2, alpha_channel), dim=-1)
-
-
-            # 根据指定的方向进行拼接
-            if direction == 'right':
-                concatenated_image = torch.cat((one_image1, one_image2), dim=2)  # 沿宽度拼接
-                concatenated_mask = torch.cat((one_mask1, one_mask2), dim=2)  # 沿宽度拼接
-                x = one_image1.shape[2]
-            elif direction == 'down':
-                concatenated_image = torch.cat((one_image1, one_image2), dim=1)  # 沿高度拼接
-                concatenated_mask = torch.cat((one_mask1, one_mask2), dim=1)  # 沿高度拼接
-                y = one_image1.shape[1]
-            elif direction == 'left':
-                concatenated_image = torch.cat((one_image2, one_image1), dim=2)  # 沿宽度拼接
-                concatenated_mask = torch.cat((one_mask2, one_mask1), dim=2)  # 沿宽度拼接
-                x = one_image2.shape[2]
-            elif direction == 'up':
-                concatenated_image = torch.cat((one_image2, one_image1), dim=1)  # 沿高度拼接
-                concatenated_mask = torch.cat((one_mask2, one_mask1), dim=1)  # 沿高度拼接
-                y = one_image2.shape[1]
-
-            concatenated_height = concatenated_image.shape[1]
-            concatenated_width = concatenated_image.shape[2]
-
-            results_image.append(concatenated_image.squeeze(0))
-            results_mask.append(concatenated_mask.squeeze(0))
-
-        output_image = torch.stack(results_image, dim=0)
-        output_mask = torch.stack(results_mask, dim=0)
+        # 预先分配输出，两张图直接写入对应区域；通道较少的一方缺少的 alpha 通道填 1
+        channels = channel_count(image1, image2)
+        output_image = new_canvas(batch_size1, concatenated_height, concatenated_width, channels, None, image1.dtype, image1.device)
+        output_mask = new_canvas(batch_size1, concatenated_height, concatenated_width, None, None, mask1.dtype, mask1.device)
+        paste(output_image, image1, *pos1)
+        paste(output_image, image2, *pos2)
+        paste(output_mask, mask1, *pos1)
+        paste(output_mask, mask2, *pos2)
 
         return output_image, output_mask, concatenated_width, concatenated_height, x, y
 
+class ImageMosaicNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE", {"tooltip": "Images to arrange, a batch or a list of batches"}),
+                "columns": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1, "tooltip": "0 = ceil(sqrt(n))"}),
+                "spacing": ("INT", {"default": 0, "min": 0, "max": 1024, "step": 1}),
+                "background": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01}),
+                "match_image_size": ("BOOLEAN", {"default": True}),
+            },
+            "optional": {
+                "masks": ("MASK", {"tooltip": "Masks matching the images"}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT", "INT", "INT")
+    RETURN_NAMES = ("mosaic_image", "mosaic_mask", "mosaic_width", "mosaic_height", "x", "y")
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (False, False, False, False, True, True)
+    FUNCTION = "compose"
+    OUTPUT_NODE = True
+    CATEGORY = "🌱SmellCommon/ImageFunc"
+    DESCRIPTION = "Arrange images and masks into a grid, x / y are the offsets of each tile"
+
+    def compose(self, images, columns, spacing, background, match_image_size, masks=None):
+        columns, spacing, background, match_image_size = columns[0], spacing[0], background[0], match_image_size[0]
+        if not images:
+            raise ValueError("ImageMosaicNode: no images to compose")
+        masks = list(masks or [])
+        masks += [None] * (len(images) - len(masks))
+
+        # 每个输入批次整体处理 (掩膜校验、缩放各一次)，再按帧展开成格子
+        batches = []
+        cell_height, cell_width = images[0].shape[1], images[0].shape[2]
+        for i, (batch, mask) in enumerate(zip(images, masks)):
+            mask = mask_for(batch, mask, f"masks[{i}]")
+            if match_image_size:
+                batch = resize_batch(batch, cell_width, cell_height)
+                mask = resize_batch(mask, cell_width, cell_height)
+            batches.append((batch, mask))
+        tiles = [(batch[b:b+1], mask[b:b+1]) for batch, mask in batches for b in range(batch.shape[0])]
+
+        # 布局只计算一次，预先分配最终画布，每个格子原地写入
+        positions, width, height = grid_layout([(t.shape[2], t.shape[1]) for t, _ in tiles], columns, spacing)
+        first = batches[0][0]
+        mosaic_image = new_canvas(1, height, width, channel_count(*[b for b, _ in batches]), background, first.dtype, first.device)
+        mosaic_mask = new_canvas(1, height, width, None, 0.0, first.dtype, first.device)
+        for (tile, mask), (x, y) in zip(tiles, positions):
+            paste(mosaic_image, tile, x, y)
+            paste(mosaic_mask, mask, x, y)
+
+        return (mosaic_image, mosaic_mask, width, height, [p[0] for p in positions], [p[1] for p in positions])
+
+class ImageAtlasNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "images": ("IMAGE", {"tooltip": "List of images with different sizes"}),
+                "spacing": ("INT", {"default": 0, "min": 0, "max": 1024, "step": 1}),
+                "background": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01}),
+            },
+            "optional": {
+                "masks": ("MASK", {"tooltip": "Masks matching the images"}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT", "STRING")
+    RETURN_NAMES = ("atlas_image", "atlas_mask", "atlas_width", "atlas_height", "placements")
+    INPUT_IS_LIST = True
+    FUNCTION = "pack"
+    OUTPUT_NODE = True
+    CATEGORY = "🌱SmellCommon/ImageFunc"
+    DESCRIPTION = "Pack differently sized images and masks into one atlas, placements is a JSON table of the tile boxes"
+
+    def pack(self, images, spacing, background, masks=None):
+        spacing, background = spacing[0], background[0]
+        if not images:
+            raise ValueError("ImageAtlasNode: no images to pack")
+        masks = list(masks or [])
+        masks += [None] * (len(images) - len(masks))
+
+        tiles = []
+        for i, (batch, mask) in enumerate(zip(images, masks)):
+            mask = mask_for(batch, mask, f"masks[{i}]")
+            tiles += [(batch[b:b+1], mask[b:b+1]) for b in range(batch.shape[0])]
+
+        # skyline 装箱得到最小画布，预先分配后逐个原地写入
+        sizes = [(t.shape[2], t.shape[1]) for t, _ in tiles]
+        positions, width, height = atlas_layout(sizes, spacing)
+        first = images[0]
+        atlas_image = new_canvas(1, height, width, channel_count(*images), background, first.dtype, first.device)
+        atlas_mask = new_canvas(1, height, width, None, 0.0, first.dtype, first.device)
+        for (tile, mask), (x, y) in zip(tiles, positions):
+            paste(atlas_image, tile, x, y)
+            paste(atlas_mask, mask, x, y)
+
+        placements = [{"index": i, "x": x, "y": y, "width": w, "height": h} for i, ((x, y), (w, h)) in enumerate(zip(positions, sizes))]
+        return (atlas_image, atlas_mask, width, height, json.dumps(placements))
+
 class ImageBlank:
     def __init__(self):
         pass
@@ -446,11 +495,9 @@ class ImageBlank:
         width = (width // 8) * 8
         height = (height // 8) * 8
 
-        # Blend image
-        blank = Image.new(mode="RGB", size=(width, height),
-                          color=(red, green, blue))
+        blank = new_canvas(1, height, width, 3, fill=rgb_fill(red, green, blue))
 
-        return (pil2tensor(blank), )
+        return (blank, )
 
 class ImageFill:
     def __init__(self):
@@ -481,12 +528,8 @@ class ImageFill:
         if d3 > width or d2 > height:
             raise ValueError(f"图像尺寸超出限制，宽度限制为 {width}，当前宽度为 {d2}；高度限制为 {height}，当前高度为 {d3}。")
 
-        color_tensor = torch.tensor([red, green, blue], dtype=torch.float32)
-
-        new_image = torch.ones(
-            (d1, height, width, d4),
-            dtype=torch.float32,
-        ) * color_tensor
+        # 一次分配，与输入图像相同的设备和 dtype；多出的通道 (alpha) 填 1
+        new_image = canvas_like(image, height, width, fill=rgb_fill(red, green, blue))
 
         left = int((width - d3) / 2)
         top = int((height - d2) / 2)
@@ -519,33 +562,13 @@ class ImageAspectRatioAdjuster:
     DESCRIPTION = "Adjust image to the best aspect ratio and scale to max length."
 
     def adjust_aspect_ratio(self, image, max_length, round_to_multiple, use_common):
-        # 定义常见和不常见的宽高比
-        common_aspect_ratios = {
-            "1:1": (1, 1),
-            "3:2": (3, 2),
-            "4:3": (4, 3),
-            "16:9": (16, 9),
-            "2:3": (2, 3),
-            "3:4": (3, 4),
-        }
-
-        uncommon_aspect_ratios = {
-            "5:4": (5, 4),
-            "1.85:1": (185, 100),  # 乘以100以避免浮点数
-            "2.39:1": (239, 100),  # 乘以100以避免浮点数
-            "4:5": (4, 5),
-            "9:16": (9, 16),
-            "3:1": (3, 1),
-            "2:1": (2, 1),
-        }
-
         round_to_multiple_int = 1 if round_to_multiple == "None" else int(round_to_multiple)
         max_length = (max_length // round_to_multiple_int) * round_to_multiple_int
         # 如果不是使用常见宽高比，则合并两个字典
         if use_common:
-            aspect_ratios = common_aspect_ratios
+            aspect_ratios = COMMON_ASPECT_RATIOS
         else:
-            aspect_ratios = {**common_aspect_ratios, **uncommon_aspect_ratios}
+            aspect_ratios = {**COMMON_ASPECT_RATIOS, **UNCOMMON_ASPECT_RATIOS}
 
         d1, d2, d3, d4 = image.size()  # 获取输入图像的尺寸
 
@@ -593,10 +616,88 @@ class ImageAspectRatioAdjuster:
         print(f"最佳宽高比: {best_ratio}, 宽度: {best_width}, 高度: {best_height}")
         return (best_width, best_height, max_length, best_ratio)
 
-class ImageSaver:
+class ImageAspectRatioBucketNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        multiple_list = ['8', '16', '32', '64', '128', '256', '512', 'None']
+        return {
+            "required": {
+                "images": ("IMAGE", {"tooltip": "List of images with different sizes, e.g. from ImageAndTagLoader"}),
+                "ratios": ("STRING", {"default": "common", "multiline": False,
+                                      "tooltip": "Bucket aspect ratios such as '1:1, 3:2, 2:3, 16:9', or 'common' / 'all'"}),
+                "max_length": ("INT", {"default": 1024, "min": 8, "max": MAX_RESOLUTION, "step": 1}),
+                "round_to_multiple": (multiple_list, {"default": '64'}),
+                "fit": (['crop', 'letterbox', 'fill'],),
+                "method": (['lanczos', 'bicubic', 'hamming', 'bilinear', 'box', 'nearest'], {"default": 'bicubic'}),
+            },
+            "optional": {
+                "masks": ("MASK", {"tooltip": "Masks matching the images"}),
+                "tags": ("STRING", {"forceInput": True, "tooltip": "Tags matching the images"}),
+            }
+        }
 
-    def __init__(self):
-        self.compression = 4
+    RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("images", "masks", "width", "height", "ratio", "indexes", "tags")
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True, True, True, True, True, True)
+    FUNCTION = "bucket"
+    CATEGORY = "🌱SmellCommon/ImageFunc"
+    DESCRIPTION = "Assign images to aspect ratio buckets and resize each bucket into one batch, indexes / tags are JSON lists per bucket"
+
+    def bucket(self, images, ratios, max_length, round_to_multiple, fit, method, masks=None, tags=None):
+        ratios, max_length, round_to_multiple, fit, method = ratios[0], max_length[0], round_to_multiple[0], fit[0], method[0]
+        if not images:
+            raise ValueError("ImageAspectRatioBucketNode: no images to bucket")
+        masks = list(masks or [])
+        masks += [None] * (len(images) - len(masks))
+        tags = list(tags or [])
+        tags += [""] * (len(images) - len(tags))
+
+        # 按帧展开，(输入序号, 帧) 为每张图像的来源
+        frames = []
+        for i, (batch, mask) in enumerate(zip(images, masks)):
+            mask = mask_for(batch, mask, f"masks[{i}]")
+            frames += [(i, batch[b:b+1], mask[b:b+1]) for b in range(batch.shape[0])]
+
+        # 桶表只计算一次，所有图像一次分配
+        table = BucketTable(parse_ratios(ratios), max_length, 1 if round_to_multiple == "None" else int(round_to_multiple))
+        groups = table.group([(image.shape[2], image.shape[1]) for _, image, _ in frames])
+
+        out_images, out_masks, widths, heights, names, indexes, out_tags = [], [], [], [], [], [], []
+        for bucket, members in groups.items():
+            width, height = table.sizes[bucket]
+            first = frames[members[0]][1]
+            channels = channel_count(*[frames[m][1] for m in members])
+            bucket_images = new_canvas(len(members), height, width, channels, None, first.dtype, first.device)
+            bucket_masks = new_canvas(len(members), height, width, None, None, first.dtype, first.device)
+
+            # 桶内尺寸相同的图像合成一个批次一次缩放，结果写入预先分配的桶批次
+            by_size = {}
+            for slot, m in enumerate(members):
+                by_size.setdefault(tuple(frames[m][1].shape[1:]), []).append(slot)
+            for slots in by_size.values():
+                source = torch.cat([frames[members[s]][1] for s in slots])
+                source_masks = torch.cat([frames[members[s]][2] for s in slots])
+                resized = fit_resize_batch(source, width, height, fit, method)
+                if resized.shape[-1] < channels:
+                    resized = torch.nn.functional.pad(resized, (0, channels - resized.shape[-1]), value=1.0)
+                position = torch.tensor(slots, device=first.device)
+                bucket_images.index_copy_(0, position, resized)
+                bucket_masks.index_copy_(0, position, fit_resize_batch(source_masks, width, height, fit, method))
+
+            sources = [frames[m][0] for m in members]
+            out_images.append(bucket_images)
+            out_masks.append(bucket_masks)
+            widths.append(width)
+            heights.append(height)
+            names.append(table.names[bucket])
+            indexes.append(json.dumps(sources))
+            out_tags.append(json.dumps([tags[i] for i in sources], ensure_ascii=False))
+            log(f"Bucket {table.names[bucket]} ({width}x{height}): {len(members)} images")
+
+        return (out_images, out_masks, widths, heights, names, indexes, out_tags)
+
+class ImageSaver:
 
     @classmethod
     def INPUT_TYPES(s):
@@ -612,6 +713,9 @@ class ImageSaver:
             "optional": {
                 "FilenamePrefix2": ("STRING", {"default": None}),
                 "tags": ("STRING", {"default": None}),
+                "format": (list(ENCODERS), {"default": "png"}),
+                "preset": (PRESETS + ["autotune"], {"default": "balanced", "tooltip": "fast: 编码最快; balanced: 与旧版 PNG 相同; small: 文件最小; autotune: 按测得的编码速度与磁盘带宽自动选择 PNG 压缩级别"}),
+                "quality": ("INT", {"default": 90, "min": 1, "max": 100, "step": 1, "tooltip": "Quality of webp / jpeg"}),
             },
             "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
         }
@@ -622,14 +726,8 @@ class ImageSaver:
     CATEGORY = "🌱SmellCommon/ImageFunc"
     DESCRIPTION = "Batch save files to a folder"
 
-    def write_text_file(self, file, content, encoding="utf-8"):
-        try:
-            with open(file, 'w', encoding=encoding, newline='\n') as f:
-                f.write(content)
-        except OSError:
-            print(f"{file} save failed")
-
-    def BatchSave(self, Images, BaseDirectory, FilenamePrefix1, FileMax, OpenOutputDirectory, save_meta, FilenamePrefix2 = None, tags = None, prompt=None, extra_pnginfo=None):
+    def BatchSave(self, Images, BaseDirectory, FilenamePrefix1, FileMax, OpenOutputDirectory, save_meta, FilenamePrefix2 = None, tags = None, format="png", preset="balanced", quality=90, prompt=None, extra_pnginfo=None):
+        batch = None
         try:
             Directory1 = BaseDirectory
             Directory2 = os.path.join(Directory1, FilenamePrefix1)
@@ -651,25 +749,21 @@ class ImageSaver:
                 _FilenamePrefix2 = FilenamePrefix2
                 FilenamePrefix = f"{_FilenamePrefix1}_{_FilenamePrefix2}"
 
-            for image in Images:
-                print(image)
-                i = 255. * image.cpu().numpy()
-                img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-                metadata = None
-                if not save_meta:
-                    metadata = PngInfo()
-                    if prompt is not None:
-                        metadata.add_text("prompt", json.dumps(prompt))
-                    if extra_pnginfo is not None:
-                        for x in extra_pnginfo:
-                            metadata.add_text(x, json.dumps(extra_pnginfo[x]))
-
-                image_path, txt_path = get_next_file_path(Directory, FilenamePrefix,"png",FileMax)
-                img.save(image_path, pnginfo=metadata, compress_level=self.compression)
-                if tags != None and tags != "":
-                    self.write_text_file(txt_path, tags)
+            # 整批只转换一次得到 uint8 快照，编码与写入交给后台保存队列
+            frames = tensor2np(Images)
+            metadata = None
+            if not save_meta:
+                metadata = PngInfo()
+                if prompt is not None:
+                    metadata.add_text("prompt", json.dumps(prompt))
+                if extra_pnginfo is not None:
+                    for x in extra_pnginfo:
+                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+            batch = queue_image_batch(frames, Directory, FilenamePrefix, FileMax, tags, metadata, format, preset, quality)
 
             if (OpenOutputDirectory):
+                # 打开目录前等待本批写完
+                batch.wait()
                 try:
                     abs_path = os.path.abspath(Directory)
                     if not is_folder_open(abs_path):
@@ -685,13 +779,16 @@ class ImageSaver:
         except Exception as e:
             print(f"Error saving image: {e}")
 
-        return ()
+        if batch is None:
+            return ()
+        # 保存结果 (失败的帧数) 显示在节点上
+        ui = {"save": [batch.status()]}
+        if batch.autotune is not None:
+            ui["autotune"] = [batch.autotune]
+        return {"ui": ui}
 
 class ImageSwitchSaver:
 
-    def __init__(self):
-        self.compression = 4
-
     @classmethod
     def INPUT_TYPES(s):
         return {
@@ -708,6 +805,9 @@ class ImageSwitchSaver:
             },
             "optional": {
                 "tags": ("STRING", {"default": None}),
+                "format": (list(ENCODERS), {"default": "png"}),
+                "preset": (PRESETS + ["autotune"], {"default": "balanced", "tooltip": "fast: 编码最快; balanced: 与旧版 PNG 相同; small: 文件最小; autotune: 按测得的编码速度与磁盘带宽自动选择 PNG 压缩级别"}),
+                "quality": ("INT", {"default": 90, "min": 1, "max": 100, "step": 1, "tooltip": "Quality of webp / jpeg"}),
             },
             "hidden": {"prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},
         }
@@ -718,7 +818,8 @@ class ImageSwitchSaver:
     CATEGORY = "🌱SmellCommon/ImageFunc"
     DESCRIPTION = "Batch save files to a folder"
 
-    def BatchSave(self, Images, BaseDirectory, FilenamePrefix1, FileMax, OpenOutputDirectory, save_meta, switch, switch_dir1, switch_dir2, tags = None, prompt=None, extra_pnginfo=None):
+    def BatchSave(self, Images, BaseDirectory, FilenamePrefix1, FileMax, OpenOutputDirectory, save_meta, switch, switch_dir1, switch_dir2, tags = None, format="png", preset="balanced", quality=90, prompt=None, extra_pnginfo=None):
+        batch = None
         try:
             Directory1 = BaseDirectory
             Directory2 = os.path.join(Directory1, FilenamePrefix1)
@@ -743,25 +844,21 @@ class ImageSwitchSaver:
             _FilenamePrefix2 = FilenamePrefix2
             FilenamePrefix = f"{_FilenamePrefix1}_{_FilenamePrefix2}"
 
-            for image in Images:
-                print(image)
-                i = 255. * image.cpu().numpy()
-                img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-                metadata = None
-                if not save_meta:
-                    metadata = PngInfo()
-                    if prompt is not None:
-                        metadata.add_text("prompt", json.dumps(prompt))
-                    if extra_pnginfo is not None:
-                        for x in extra_pnginfo:
-                            metadata.add_text(x, json.dumps(extra_pnginfo[x]))
-
-                image_path, txt_path = get_next_file_path(Directory, FilenamePrefix, FileMax)
-                img.save(image_path, pnginfo=metadata, compress_level=self.compression)
-                if tags != None and tags != "":
-                    smell_write_text_file(txt_path, tags)
+            # 整批只转换一次得到 uint8 快照，编码与写入交给后台保存队列
+            frames = tensor2np(Images)
+            metadata = None
+            if not save_meta:
+                metadata = PngInfo()
+                if prompt is not None:
+                    metadata.add_text("prompt", json.dumps(prompt))
+                if extra_pnginfo is not None:
+                    for x in extra_pnginfo:
+                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+            batch = queue_image_batch(frames, Directory, FilenamePrefix, FileMax, tags, metadata, format, preset, quality)
 
             if (OpenOutputDirectory):
+                # 打开目录前等待本批写完
+                batch.wait()
                 smell_debug(f"OpenOutputDirectory OpenOutputDirectoryOpenOutputDirectoryOpenOutputDirectoryOpenOutputDirectoryOpenOutputDirectory {Directory}")
                 try:
                     abs_path = os.path.abspath(Directory)
@@ -778,7 +875,13 @@ class ImageSwitchSaver:
         except Exception as e:
             print(f"Error saving image: {e}")
 
-        return ()
+        if batch is None:
+            return ()
+        # 保存结果 (失败的帧数) 显示在节点上
+        ui = {"save": [batch.status()]}
+        if batch.autotune is not None:
+            ui["autotune"] = [batch.autotune]
+        return {"ui": ui}
 
 class ImageScaleByAspectRatio:
 
@@ -808,6 +911,7 @@ class ImageScaleByAspectRatio:
             "optional": {
                 "image": ("IMAGE",),  #
                 "mask": ("MASK",),  #
+                "resize_engine": (['torch', 'pil'], {"default": "torch", "tooltip": "torch: 整批在输入设备上一次缩放; pil: 逐张使用 PIL 重采样，与旧版结果完全一致"}),
             }
         }
 
@@ -819,34 +923,29 @@ class ImageScaleByAspectRatio:
     def image_scale_by_aspect_ratio(self, aspect_ratio, proportional_width, proportional_height,
                                     fit, method, round_to_multiple, scale_to_side, scale_to_length,
                                     background_color,
-                                    image=None, mask = None,
+                                    image=None, mask = None, resize_engine='torch',
                                     ):
-        orig_images = []
-        orig_masks = []
         orig_width = 0
         orig_height = 0
         target_width = 0
         target_height = 0
         ratio = 1.0
-        ret_images = []
-        ret_masks = []
         if image is not None:
-            for i in image:
-                i = torch.unsqueeze(i, 0)
-                orig_images.append(i)
-            orig_width, orig_height = tensor2pil(orig_images[0]).size
+            orig_width, orig_height = image.shape[2], image.shape[1]
         if mask is not None:
             if mask.dim() == 2:
                 mask = torch.unsqueeze(mask, 0)
-            for m in mask:
-                m = torch.unsqueeze(m, 0)
-                if not is_valid_mask(m) and m.shape==torch.Size([1,64,64]):
+            if mask.shape[1:] == torch.Size([64, 64]):
+                # ComfyUI 的默认空掩膜 (64x64 全零)，整批一次判断
+                valid = mask.flatten(1).any(dim=1)
+                if not bool(valid.all()):
                     log(f"Warning: {self.NODE_NAME} input mask is empty, ignore it.", message_type='warning')
-                else:
-                    orig_masks.append(m)
+                    mask = mask[valid]
+            if mask.shape[0] == 0:
+                mask = None
 
-            if len(orig_masks) > 0:
-                _width, _height = tensor2pil(orig_masks[0]).size
+            if mask is not None:
+                _width, _height = mask.shape[2], mask.shape[1]
                 if (orig_width > 0 and orig_width != _width) or (orig_height > 0 and orig_height != _height):
                     log(f"Error: {self.NODE_NAME} execute failed, because the mask is does'nt match image.", message_type='error')
                     return (None, None, None, 0, 0,)
@@ -915,9 +1014,23 @@ class ImageScaleByAspectRatio:
             target_width = num_round_up_to_multiple(target_width, multiple)
             target_height = num_round_up_to_multiple(target_height, multiple)
 
-        _mask = Image.new('L', size=(target_width, target_height), color='black')
-        _image = Image.new('RGB', size=(target_width, target_height), color='black')
+        if resize_engine == 'pil':
+            ret_image, ret_mask = self._pil_fit_resize(image, mask, target_width, target_height, fit, method, background_color)
+        else:
+            # 整批一次插值；与 PIL 路径一致，图像输出为 RGB
+            background = tuple(c / 255.0 for c in ImageColor.getrgb(background_color)[:3])
+            ret_image = None if image is None else fit_resize_batch(image[..., :3], target_width, target_height, fit, method, background)
+            ret_mask = None if mask is None else fit_resize_batch(mask, target_width, target_height, fit, method, 0.0)
+
+        count = max(0 if ret_image is None else ret_image.shape[0], 0 if ret_mask is None else ret_mask.shape[0])
+        if count == 0:
+            log(f"Error: {self.NODE_NAME} skipped, because the available image or mask is not found.", message_type='error')
+            return (None, None, None, 0, 0,)
+        log(f"{self.NODE_NAME} Processed {count} image(s).", message_type='finish')
+        return (ret_image, ret_mask, [orig_width, orig_height], target_width, target_height,)
 
+    def _pil_fit_resize(self, image, mask, target_width, target_height, fit, method, background_color):
+        """逐张经 PIL 重采样的兼容路径，结果与旧版完全一致"""
         resize_sampler = Image.LANCZOS
         if method == "bicubic":
             resize_sampler = Image.BICUBIC
@@ -930,28 +1043,16 @@ class ImageScaleByAspectRatio:
         elif method == "nearest":
             resize_sampler = Image.NEAREST
 
-        if len(orig_images) > 0:
-            for i in orig_images:
-                _image = tensor2pil(i).convert('RGB')
-                _image = fit_resize_image(_image, target_width, target_height, fit, resize_sampler, background_color)
-                ret_images.append(pil2tensor(_image))
-        if len(orig_masks) > 0:
-            for m in orig_masks:
-                _mask = tensor2pil(m).convert('L')
-                _mask = fit_resize_image(_mask, target_width, target_height, fit, resize_sampler).convert('L')
-                ret_masks.append(image2mask(_mask))
-        if len(ret_images) > 0 and len(ret_masks) >0:
-            log(f"{self.NODE_NAME} Processed {len(ret_images)} image(s).", message_type='finish')
-            return (torch.cat(ret_images, dim=0), torch.cat(ret_masks, dim=0),[orig_width, orig_height], target_width, target_height,)
-        elif len(ret_images) > 0 and len(ret_masks) == 0:
-            log(f"{self.NODE_NAME} Processed {len(ret_images)} image(s).", message_type='finish')
-            return (torch.cat(ret_images, dim=0), None, [orig_width, orig_height], target_width, target_height,)
-        elif len(ret_images) == 0 and len(ret_masks) > 0:
-            log(f"{self.NODE_NAME} Processed {len(ret_masks)} image(s).", message_type='finish')
-            return (None, torch.cat(ret_masks, dim=0), [orig_width, orig_height], target_width, target_height,)
-        else:
-            log(f"Error: {self.NODE_NAME} skipped, because the available image or mask is not found.", message_type='error')
-            return (None, None, None, 0, 0,)
+        # 整批转换一次，逐张的 PIL 重采样在共享线程池中并行执行，结果保持输入顺序
+        ret_image = None
+        ret_mask = None
+        if image is not None:
+            _images = fit_resize_images(tensor2pil_batch(image), target_width, target_height, fit, resize_sampler, background_color)
+            ret_image = pils2tensor(_images)
+        if mask is not None:
+            _masks = fit_resize_images(tensor2pil_batch(mask), target_width, target_height, fit, resize_sampler)
+            ret_mask = pils2tensor([m.convert('L') for m in _masks])
+        return (ret_image, ret_mask)
 
 class ImagePad:
     @classmethod
@@ -963,72 +1064,68 @@ class ImagePad:
                     "top": ("INT", {"default": 0, "min": 0, "max": MAX_RESOLUTION, "step": 1}),  # 顶部填充像素
                     "bottom": ("INT", {"default": 0, "min": 0, "max": MAX_RESOLUTION, "step": 1}),  # 底部填充像素
                     "extra_padding": ("INT", {"default": 0, "min": 0, "max": MAX_RESOLUTION, "step": 1}),  # 额外填充像素
-                    "pad_mode": (["edge", "color"], {"default": "edge", "tooltip": "填充模式：边缘色或指定颜色"}),
+                    "pad_mode": (["edge", "color", "reflect", "replicate", "circular"], {"default": "edge", "tooltip": "填充模式：边缘色、指定颜色、镜像、复制边缘像素或循环"}),
                     "color": ("STRING", {"default": "0, 0, 0", "tooltip": "填充颜色，RGB值(0-255)，用逗号分隔"}),
                   },
                 "optional": {
                     "mask": ("MASK", ),  # 可选的输入掩码
                     "target_width": ("INT", {"default": 512, "min": 0, "max": MAX_RESOLUTION, "step": 1, "forceInput": True}),
                     "target_height": ("INT", {"default": 512, "min": 0, "max": MAX_RESOLUTION, "step": 1, "forceInput": True}),
+                    "letterbox": ("BOOLEAN", {"default": False, "tooltip": "目标尺寸模式下将图像等比缩放到目标尺寸(四边各减去extra_padding)内再填充；关闭时图像宽高各缩小extra_padding，且不能大于目标尺寸"}),
                 }
                 }
 
-    RETURN_TYPES = ("IMAGE", "MASK", )
-    RETURN_NAMES = ("images", "masks",)
+    RETURN_TYPES = ("IMAGE", "MASK", "INT", "INT", "INT", "INT", )
+    RETURN_NAMES = ("images", "masks", "box_x", "box_y", "box_width", "box_height",)
     FUNCTION = "pad"
     CATEGORY = "🌱SmellCommon/ImageFunc"
     DESCRIPTION = "对输入图像和掩码应用自定义填充，支持边缘颜色或指定颜色填充。"
 
-    def pad(self, image, left, right, top, bottom, extra_padding, color, pad_mode, mask=None, target_width=None, target_height=None):
+    def pad(self, image, left, right, top, bottom, extra_padding, color, pad_mode, mask=None, target_width=None, target_height=None, letterbox=False):
         """
         填充图像和掩码
 
         参数:
             image: 输入图像 [B, H, W, C]
             left, right, top, bottom: 各方向填充像素数
-            extra_padding: 所有边额外填充像素数
+            extra_padding: 所有边额外填充像素数 (目标尺寸模式下图像宽高先各缩小 extra_padding，letterbox 时为四边的留白)
             color: 填充颜色(RGB值0-255)
-            pad_mode: 填充模式("edge"或"color")
+            pad_mode: 填充模式("edge"、"color"、"reflect"、"replicate"或"circular")
             mask: 可选输入掩码
             target_width, target_height: 目标尺寸(指定时进行居中填充)
+            letterbox: 目标尺寸模式下先等比缩放到目标尺寸减去四边 extra_padding 的区域内
+
+        返回填充后的图像、掩码，以及原图在输出中的位置 (box_x, box_y, box_width, box_height)，便于下游还原裁剪。
+        输出只分配一次: 图像 (需要时缩放) 直接写入输出的中央区域，边缘再按填充模式就地写入。
         """
         # 获取图像维度
         B, H, W, C = image.shape
 
-        # 调整掩码到图像尺寸(如果提供)
-        if mask is not None:
-            BM, HM, WM = mask.shape
-            if HM != H or WM != W:
-                mask = F.interpolate(mask.unsqueeze(1), size=(H, W), mode='nearest-exact').squeeze(1)
-
         # 解析背景色
         bg_color = self._parse_color(color, image.dtype, image.device)
 
         # 计算填充尺寸及位置
         padding_info = self._calculate_padding(
-            image, W, H, target_width, target_height,
-            left, right, top, bottom, extra_padding
+            W, H, target_width, target_height,
+            left, right, top, bottom, extra_padding, letterbox
         )
-        pad_left, pad_right, pad_top, pad_bottom, padded_width, padded_height = padding_info
-
-        # 创建输出图像
-        out_image = torch.zeros((B, padded_height, padded_width, C),
-                              dtype=image.dtype, device=image.device)
+        pad_left, pad_right, pad_top, pad_bottom, padded_width, padded_height, content_width, content_height = padding_info
+        self._check_padding(pad_mode, content_width, content_height, pad_left, pad_right, pad_top, pad_bottom)
 
-        # 应用填充
-        self._apply_padding(
-            image, out_image, pad_mode, bg_color,
-            pad_left, pad_right, pad_top, pad_bottom
-        )
+        # 颜色模式直接以背景色初始化；其它模式的每个像素都会被写入，无需初始化
+        out_image = canvas_like(image, padded_height, padded_width, fill=bg_color if pad_mode == "color" else None)
+        self._write_content(out_image, image, pad_left, pad_top, content_width, content_height, "bicubic", antialias=True)
+        self._apply_padding(out_image, pad_mode, pad_left, pad_right, pad_top, pad_bottom, content_width, content_height)
 
-        # 创建或调整掩码
+        # 创建或调整掩码 (图像被缩放时掩码随之平滑缩放，否则按最近邻对齐到图像尺寸)
+        mask_mode = "nearest-exact" if (content_width, content_height) == (W, H) else "bilinear"
         out_masks = self._prepare_masks(
-            mask, B, H, W, padded_height, padded_width,
+            mask, B, content_height, content_width, padded_height, padded_width,
             pad_left, pad_right, pad_top, pad_bottom,
-            image.dtype, image.device
+            image.dtype, image.device, mask_mode
         )
 
-        return (out_image, out_masks)
+        return (out_image, out_masks, pad_left, pad_top, content_width, content_height)
 
     def _parse_color(self, color_str, dtype, device):
         """解析颜色字符串为RGB tensor"""
@@ -1037,22 +1134,24 @@ class ImagePad:
             bg_color = bg_color * 3  # 灰度转RGB
         return torch.tensor(bg_color, dtype=dtype, device=device)
 
-    def _calculate_padding(self, image, W, H, target_width, target_height,
-                         left, right, top, bottom, extra_padding):
-        """计算各方向填充像素数和最终尺寸"""
+    def _calculate_padding(self, W, H, target_width, target_height,
+                         left, right, top, bottom, extra_padding, letterbox=False):
+        """计算各方向填充像素数、最终尺寸以及原图缩放后的尺寸"""
         if target_width is not None and target_height is not None:
             # 目标尺寸填充模式
-            if extra_padding > 0:
+            if letterbox:
+                # 等比缩放到目标尺寸减去四边额外填充的区域内
+                box_width = max(1, target_width - 2 * extra_padding)
+                box_height = max(1, target_height - 2 * extra_padding)
+                scale = min(box_width / W, box_height / H)
+                W = max(1, min(box_width, round(W * scale)))
+                H = max(1, min(box_height, round(H * scale)))
+            elif extra_padding > 0:
                 # 如果指定了额外填充，先缩小图像
-                image_resized = common_upscale(
-                    image.movedim(-1, 1),
-                    W - extra_padding,
-                    H - extra_padding,
-                    "lanczos", "disabled"
-                ).movedim(1, -1)
-
-                # 更新尺寸信息
-                _, H, W, _ = image_resized.shape
+                W = max(1, W - extra_padding)
+                H = max(1, H - extra_padding)
+            if W > target_width or H > target_height:
+                raise ValueError(f"Image size {W}x{H} is larger than the target size {target_width}x{target_height}, enable letterbox to scale it down.")
 
             # 居中对齐到目标尺寸
             padded_width = target_width
@@ -1070,59 +1169,96 @@ class ImagePad:
             padded_width = W + pad_left + pad_right
             padded_height = H + pad_top + pad_bottom
 
-        return pad_left, pad_right, pad_top, pad_bottom, padded_width, padded_height
-
-    def _apply_padding(self, image, out_image, pad_mode, bg_color,
-                      pad_left, pad_right, pad_top, pad_bottom):
-        """应用指定模式的填充"""
-        B, H, W, C = image.shape
-
-        for b in range(B):
-            if pad_mode == "edge":
-                # 边缘填充模式 - 提取四边缘像素
-                top_edge = image[b, 0, :, :]
-                bottom_edge = image[b, H-1, :, :]
-                left_edge = image[b, :, 0, :]
-                right_edge = image[b, :, W-1, :]
-
-                # 用边缘颜色均值填充对应区域
-                out_image[b, :pad_top, :, :] = top_edge.mean(dim=0)
-                out_image[b, pad_top+H:, :, :] = bottom_edge.mean(dim=0)
-                out_image[b, :, :pad_left, :] = left_edge.mean(dim=0)
-                out_image[b, :, pad_left+W:, :] = right_edge.mean(dim=0)
-            else:
-                # 颜色填充模式 - 用指定颜色填充整个画布
-                out_image[b, :, :, :] = bg_color.unsqueeze(0).unsqueeze(0)
+        return pad_left, pad_right, pad_top, pad_bottom, padded_width, padded_height, W, H
+
+    def _check_padding(self, pad_mode, W, H, pad_left, pad_right, pad_top, pad_bottom):
+        """镜像与循环填充的宽度不能超过图像尺寸 (与 torch.nn.functional.pad 的限制相同)"""
+        if pad_mode not in ("reflect", "circular"):
+            return
+        limit_h, limit_w = (H - 1, W - 1) if pad_mode == "reflect" else (H, W)
+        if max(pad_top, pad_bottom) > limit_h or max(pad_left, pad_right) > limit_w:
+            raise ValueError(f"{pad_mode} padding ({pad_left}, {pad_right}, {pad_top}, {pad_bottom}) must be smaller than the image size ({W}x{H}).")
+
+    def _write_content(self, out, source, pad_left, pad_top, width, height, mode, antialias=False):
+        """把 source (图像或掩膜) 写入 out 的中央区域，尺寸不同时缩放到该区域 (超出内存预算时分块直接写入)"""
+        interior = out[:, pad_top:pad_top+height, pad_left:pad_left+width]
+        if source.shape[1:3] == (height, width):
+            interior.copy_(source)
+        elif needs_tiling(source, width, height):
+            tiled_resize_batch(source, width, height, mode, antialias, out=interior)
+        else:
+            interior.copy_(resize_batch(source, width, height, mode, antialias))
+
+    def _border_index(self, before, size, after, mode):
+        """边缘填充时前后两侧每个位置取自中央区域的第几行/列"""
+        if mode == "replicate":
+            return [0] * before, [size - 1] * after
+        if mode == "reflect":
+            return [before - i for i in range(before)], [size - 2 - j for j in range(after)]
+        # circular
+        return [size - before + i for i in range(before)], [j % size for j in range(after)]
+
+    def _fill_border(self, out, mode, pad_left, pad_right, pad_top, pad_bottom, W, H):
+        """
+        按 replicate / reflect / circular 就地填充 out ([B, H, W] 或 [B, H, W, C]) 的边缘
 
-            # 复制原始图像到中央位置
-            out_image[b, pad_top:pad_top+H, pad_left:pad_left+W, :] = image[b]
+        先在中央区域的列范围内填充上下两侧，再在整个高度上填充左右两侧，与 torch.nn.functional.pad 的结果相同。
+        """
+        columns = slice(pad_left, pad_left + W)
+        before, after = self._border_index(pad_top, H, pad_bottom, mode)
+        if pad_top:
+            out[:, :pad_top, columns] = out[:, [pad_top + i for i in before], columns]
+        if pad_bottom:
+            out[:, pad_top+H:, columns] = out[:, [pad_top + i for i in after], columns]
+        before, after = self._border_index(pad_left, W, pad_right, mode)
+        if pad_left:
+            out[:, :, :pad_left] = out[:, :, [pad_left + i for i in before]]
+        if pad_right:
+            out[:, :, pad_left+W:] = out[:, :, [pad_left + i for i in after]]
+
+    def _apply_padding(self, out_image, pad_mode, pad_left, pad_right, pad_top, pad_bottom, W, H):
+        """中央区域写入后，对整个批次就地填充边缘"""
+        if pad_mode in ("reflect", "replicate", "circular"):
+            self._fill_border(out_image, pad_mode, pad_left, pad_right, pad_top, pad_bottom, W, H)
+        elif pad_mode == "edge":
+            # 边缘填充模式 - 一次归约得到所有图像上下/左右边缘的颜色均值 [B, 2, C]
+            interior = out_image[:, pad_top:pad_top+H, pad_left:pad_left+W]
+            rows = interior[:, [0, H-1], :, :].mean(dim=2)
+            cols = interior[:, :, [0, W-1], :].mean(dim=1)
+
+            # 用边缘颜色均值填充对应区域
+            out_image[:, :pad_top] = rows[:, 0, None, None, :]
+            out_image[:, pad_top+H:] = rows[:, 1, None, None, :]
+            out_image[:, :, :pad_left] = cols[:, 0, None, None, :]
+            out_image[:, :, pad_left+W:] = cols[:, 1, None, None, :]
+        return out_image
 
     def _prepare_masks(self, mask, B, H, W, padded_height, padded_width,
-                      pad_left, pad_right, pad_top, pad_bottom, dtype, device):
+                      pad_left, pad_right, pad_top, pad_bottom, dtype, device, mode="nearest-exact"):
         """准备输出掩码"""
         if mask is not None:
-            # 如果提供了掩码，使用相同的填充扩展它
-            out_masks = torch.nn.functional.pad(
-                mask,
-                (pad_left, pad_right, pad_top, pad_bottom),
-                mode='replicate'
-            )
+            # 如果提供了掩码，缩放到图像在输出中的尺寸，并以复制边缘的方式扩展它
+            out_masks = new_canvas(B, padded_height, padded_width, None, None, mask.dtype, mask.device)
+            self._write_content(out_masks, mask, pad_left, pad_top, W, H, mode, antialias=True)
+            self._fill_border(out_masks, "replicate", pad_left, pad_right, pad_top, pad_bottom, W, H)
         else:
             # 如果没有掩码，创建新掩码：填充区域为1，原图区域为0
-            out_masks = torch.ones((B, padded_height, padded_width), dtype=dtype, device=device)
-            for m in range(B):
-                out_masks[m, pad_top:pad_top+H, pad_left:pad_left+W] = 0.0
+            out_masks = new_canvas(B, padded_height, padded_width, fill=1.0, dtype=dtype, device=device)
+            out_masks[:, pad_top:pad_top+H, pad_left:pad_left+W] = 0.0
 
         return out_masks
 
 NODE_CLASS_MAPPINGS = {
     "ImageChooser": ImageChooser,
     "ImageAndMaskConcatenationNode": ImageAndMaskConcatenationNode,
+    "ImageMosaicNode": ImageMosaicNode,
+    "ImageAtlasNode": ImageAtlasNode,
     "ImageBlank": ImageBlank,
     "ImageFill": ImageFill,
     "ImageSaver": ImageSaver,
     "ImageSwitchSaver": ImageSwitchSaver,
     "ImageAspectRatioAdjuster": ImageAspectRatioAdjuster,
+    "ImageAspectRatioBucketNode": ImageAspectRatioBucketNode,
     "ImageScaleByAspectRatio": ImageScaleByAspectRatio,
     "ImagePad": ImagePad,
     "MixOpenPoseNode": MixOpenPoseNode,
@@ -1131,11 +1267,14 @@ NODE_CLASS_MAPPINGS = {
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ImageChooser" : "Smell Image Chooser",
     "ImageAndMaskConcatenationNode": "Smell Image And Mask Concatenation Node",
+    "ImageMosaicNode": "Smell Image Mosaic Node",
+    "ImageAtlasNode": "Smell Image Atlas Node",
     "ImageBlank": "Smell Image Blank",
     "ImageFill": "Smell Image Fill",
     "ImageSaver": "Smell Image Saver",
     "ImageSwitchSaver": "Smell Image Saver Switch",
     "ImageAspectRatioAdjuster": "Smell Image AspectRatio Adjuster",
+    "ImageAspectRatioBucketNode": "Smell Image AspectRatio Bucket Node",
     "ImageScaleByAspectRatio": "Smell Image Scale By AspectRatio",
     "ImagePad": "Smell Image Pad",
     "MixOpenPoseNode": "Smell OpenPose Mix Node",
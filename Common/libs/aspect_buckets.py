@@ -0,0 +1,102 @@
+"""
+宽高比分桶
+
+训练集准备时将大量不同尺寸的图像按宽高比分组，每组缩放到同一尺寸后作为一个批次处理。
+"""
+import math
+import re
+from typing import Dict, List, Tuple
+
+import torch
+
+# 与 ImageAspectRatioAdjuster 相同的宽高比表
+COMMON_ASPECT_RATIOS = {
+    "1:1": (1, 1),
+    "3:2": (3, 2),
+    "4:3": (4, 3),
+    "16:9": (16, 9),
+    "2:3": (2, 3),
+    "3:4": (3, 4),
+}
+
+UNCOMMON_ASPECT_RATIOS = {
+    "5:4": (5, 4),
+    "1.85:1": (185, 100),  # 乘以100以避免浮点数
+    "2.39:1": (239, 100),  # 乘以100以避免浮点数
+    "4:5": (4, 5),
+    "9:16": (9, 16),
+    "3:1": (3, 1),
+    "2:1": (2, 1),
+}
+
+
+def parse_ratios(text: str) -> Dict[str, Tuple[float, float]]:
+    """
+    解析 "1:1, 3:2, 1.85:1" 形式的宽高比列表 (逗号、空格或换行分隔)
+
+    也接受 "common" / "all" 表示 ImageAspectRatioAdjuster 的常见 / 全部宽高比。
+    """
+    text = text.strip()
+    if text.lower() == "common":
+        return dict(COMMON_ASPECT_RATIOS)
+    if text.lower() == "all":
+        return {**COMMON_ASPECT_RATIOS, **UNCOMMON_ASPECT_RATIOS}
+    ratios = {}
+    for item in re.split(r"[,\s]+", text):
+        if not item:
+            continue
+        try:
+            w, h = (float(x) for x in item.split(":"))
+        except ValueError:
+            raise ValueError(f"Invalid aspect ratio '{item}', expected the form 'width:height'.")
+        if w <= 0 or h <= 0:
+            raise ValueError(f"Invalid aspect ratio '{item}', both sides must be positive.")
+        ratios[item] = (w, h)
+    if not ratios:
+        raise ValueError("No aspect ratios given.")
+    return ratios
+
+
+class BucketTable:
+    """
+    宽高比分桶表
+
+    根据宽高比、最长边 max_length 与倍数 multiple 预先计算每个桶的输出尺寸 (最长边为 max_length，
+    短边取最接近该比例的 multiple 整数倍)。图像分到对数宽高比最接近的桶，即居中裁剪到该比例时保留面积最多的桶，
+    与 ImageAspectRatioAdjuster 的选择标准相同，但整批一次向量化完成。
+    """
+
+    def __init__(self, ratios: Dict[str, Tuple[float, float]], max_length: int, multiple: int = 1):
+        self.names = list(ratios)
+        self.multiple = max(1, int(multiple))
+        max_length = max(self.multiple, max_length // self.multiple * self.multiple)
+        self.sizes = []
+        for w, h in ratios.values():
+            ratio = w / h
+            if ratio >= 1:
+                width = max_length
+                height = max(self.multiple, min(max_length, round(max_length / ratio / self.multiple) * self.multiple))
+            else:
+                height = max_length
+                width = max(self.multiple, min(max_length, round(max_length * ratio / self.multiple) * self.multiple))
+            self.sizes.append((width, height))
+        self.log_ratios = torch.tensor([math.log(w / h) for w, h in ratios.values()], dtype=torch.float64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def assign(self, sizes: List[Tuple[int, int]]) -> torch.Tensor:
+        """sizes 为每张图像的 (width, height)，返回每张图像所属桶的索引 [N]"""
+        if not sizes:
+            return torch.empty(0, dtype=torch.long)
+        dims = torch.tensor(sizes, dtype=torch.float64)
+        log_aspect = torch.log(dims[:, 0] / dims[:, 1])
+        return (log_aspect[:, None] - self.log_ratios[None, :]).abs().argmin(dim=1)
+
+    def group(self, sizes: List[Tuple[int, int]]) -> Dict[int, List[int]]:
+        """按桶分组，返回 {桶索引: [图像索引, ...]}，桶按表中顺序、组内按输入顺序排列"""
+        assignment = self.assign(sizes)
+        groups = {}
+        for bucket in torch.unique(assignment).tolist():
+            groups[bucket] = torch.nonzero(assignment == bucket).flatten().tolist()
+        return groups
@@ -0,0 +1,35 @@
+import torch
+
+
+def new_canvas(batch: int, height: int, width: int, channels=None, fill=0.0, dtype=torch.float32, device=None) -> torch.Tensor:
+    """
+    创建 [B, H, W, C] 图像画布 (channels 为 None 时创建 [B, H, W] 掩膜画布)，只分配一次内存
+
+    fill:
+        None          不初始化 (torch.empty)，调用方会写满整个画布时使用
+        标量           所有元素填充该值
+        序列 / tensor  按通道填充的颜色 (0-1)，长度不足 channels 时其余通道 (如 alpha) 填 1
+    """
+    shape = (batch, height, width) if channels is None else (batch, height, width, channels)
+    if fill is None:
+        return torch.empty(shape, dtype=dtype, device=device)
+    if isinstance(fill, (int, float)):
+        return torch.full(shape, fill, dtype=dtype, device=device)
+
+    if channels is None:
+        raise ValueError("new_canvas: a per-channel fill needs a channel count")
+    colour = torch.as_tensor(fill, dtype=dtype, device=device).flatten()
+    if colour.numel() < channels:
+        colour = torch.cat([colour, colour.new_ones(channels - colour.numel())])
+    return colour[:channels].view(1, 1, 1, channels).expand(shape).contiguous()
+
+
+def canvas_like(image: torch.Tensor, height: int, width: int, fill=0.0) -> torch.Tensor:
+    """与 image ([B, H, W, C] 或 [B, H, W]) 批次、通道、dtype、设备相同的新画布"""
+    channels = image.shape[-1] if image.dim() == 4 else None
+    return new_canvas(image.shape[0], height, width, channels, fill, image.dtype, image.device)
+
+
+def rgb_fill(red: int, green: int, blue: int):
+    """0-255 的 RGB 值转换为画布使用的 0-1 颜色"""
+    return (red / 255.0, green / 255.0, blue / 255.0)
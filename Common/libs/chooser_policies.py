@@ -0,0 +1,86 @@
+import torch
+from typing import Callable, Dict, List, Union
+
+Images = Union[torch.Tensor, List[torch.Tensor]]
+
+_LUMA = (0.299, 0.587, 0.114)
+_LAPLACIAN = ((0.0, 1.0, 0.0), (1.0, -4.0, 1.0), (0.0, 1.0, 0.0))
+
+
+def _luma(images: torch.Tensor) -> torch.Tensor:
+    """[B, H, W, C] -> [B, 1, H, W] 亮度"""
+    images = images.float()
+    if images.shape[-1] >= 3:
+        weights = torch.tensor(_LUMA, dtype=images.dtype, device=images.device)
+        luma = images[..., :3] @ weights
+    else:
+        luma = images.mean(dim=-1)
+    return luma.unsqueeze(1)
+
+
+def _per_item(scorer):
+    """批次直接整体计算；尺寸不一的列表 (SEGS) 逐张计算后拼接"""
+    def score(images: Images) -> torch.Tensor:
+        if isinstance(images, torch.Tensor):
+            return scorer(images if images.dim() == 4 else images.unsqueeze(0))
+        return torch.cat([scorer(i.unsqueeze(0)).cpu() for i in images])
+    return score
+
+
+@_per_item
+def sharpness_score(images: torch.Tensor) -> torch.Tensor:
+    """拉普拉斯响应的方差，越大越清晰；宽或高不足 3 像素的图像放不下 3x3 卷积核，得分为 0"""
+    luma = _luma(images)
+    if luma.shape[-2] < 3 or luma.shape[-1] < 3:
+        return torch.zeros(luma.shape[0], dtype=luma.dtype, device=luma.device)
+    kernel = torch.tensor(_LAPLACIAN, dtype=luma.dtype, device=luma.device).view(1, 1, 3, 3)
+    response = torch.nn.functional.conv2d(luma, kernel)
+    return response.flatten(1).var(dim=1)
+
+
+@_per_item
+def contrast_score(images: torch.Tensor) -> torch.Tensor:
+    """亮度标准差 (RMS 对比度)"""
+    return _luma(images).flatten(1).std(dim=1)
+
+
+def _batch_size(images: Images) -> int:
+    return images.shape[0] if isinstance(images, torch.Tensor) else len(images)
+
+
+def top_k_by(scorer: Callable[[Images], torch.Tensor]):
+    def policy(images: Images, count: int) -> List[int]:
+        scores = scorer(images)
+        return torch.topk(scores, min(count, scores.shape[0])).indices.tolist()
+    return policy
+
+
+# 选择策略: (images, count) -> 选中的帧索引
+POLICIES: Dict[str, Callable[[Images, int], List[int]]] = {
+    "first n": lambda images, count: list(range(min(count, _batch_size(images)))),
+    "last n": lambda images, count: list(range(max(_batch_size(images) - count, 0), _batch_size(images))),
+    "sharpest n": top_k_by(sharpness_score),
+    "highest contrast n": top_k_by(contrast_score),
+}
+
+# 不暂停、直接由策略选择的模式，模式名 -> 策略名
+AUTO_MODES: Dict[str, str] = {
+    "Auto pick sharpest n": "sharpest n",
+    "Auto pick highest contrast n": "highest contrast n",
+}
+
+# 暂停等待用户选择，超时后由 timeout_policy 选择
+TIMEOUT_MODE = "Pause with timeout"
+
+
+def register_policy(name: str, policy: Callable[[Images, int], List[int]], auto_mode: str = None):
+    """注册新的选择策略；指定 auto_mode 时同时作为不暂停的自动选择模式出现在节点上"""
+    POLICIES[name] = policy
+    if auto_mode:
+        AUTO_MODES[auto_mode] = name
+
+
+def auto_select(policy: str, images: Images, count: int) -> List[int]:
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown image chooser policy '{policy}', available: {', '.join(POLICIES)}")
+    return POLICIES[policy](images, count)
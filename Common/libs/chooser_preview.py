@@ -0,0 +1,85 @@
+import io
+import os
+import uuid
+
+import torch
+from PIL import Image
+
+import folder_paths
+from server import PromptServer
+
+from .function import log
+from .image_convert import to_uint8
+from .thread_pool import get_pool
+
+# 预览图配置，可通过环境变量覆盖
+PREVIEW_MAX_EDGE = int(os.environ.get("SMELL_CHOOSER_PREVIEW_MAX_EDGE", 512))
+PREVIEW_FORMAT = os.environ.get("SMELL_CHOOSER_PREVIEW_FORMAT", "webp").lower()  # webp / jpeg
+PREVIEW_QUALITY = int(os.environ.get("SMELL_CHOOSER_PREVIEW_QUALITY", 80))
+
+def downscale_batch(images: torch.Tensor, max_edge: int) -> torch.Tensor:
+    """
+    将 [B, H, W, C] 批次按最长边等比缩小到 max_edge，在原设备上一次插值完成，返回 uint8 CPU tensor
+    """
+    _, H, W, _ = images.shape
+    scale = max_edge / max(H, W)
+    if max_edge > 0 and scale < 1.0:
+        size = (max(1, round(H * scale)), max(1, round(W * scale)))
+        images = torch.nn.functional.interpolate(
+            images.movedim(-1, 1).float(), size=size, mode='bilinear', align_corners=False, antialias=True
+        ).movedim(1, -1)
+    return to_uint8(images)
+
+
+def encode_image(array, fmt: str, quality: int = PREVIEW_QUALITY, compress_level: int = 1) -> bytes:
+    """将 [H, W, C] uint8 数组编码为指定格式的字节串"""
+    image = Image.fromarray(array.squeeze(-1) if array.shape[-1] == 1 else array)
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        image.save(buffer, format='PNG', compress_level=compress_level)
+    elif fmt == 'jpeg':
+        image.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    else:
+        image.save(buffer, format='WEBP', quality=quality, method=0)
+    return buffer.getvalue()
+
+
+def _write_preview(id, index, count, array, filename, client_id, prompt_id):
+    with open(os.path.join(folder_paths.get_temp_directory(), filename), 'wb') as f:
+        f.write(encode_image(array, PREVIEW_FORMAT))
+    url = {"filename": filename, "subfolder": "", "type": "temp"}
+    PromptServer.instance.send_sync("early-image-handler", {"id": id, "urls": [url], "index": index, "count": count, "prompt_id": prompt_id}, client_id)
+    return url
+
+
+def _report_failure(future):
+    """预览在线程池中失败时不会抛到执行线程，这里记录错误"""
+    error = future.exception()
+    if error is not None:
+        log(f"Chooser preview failed: {error}", message_type='error')
+
+
+def send_previews(id, images, client_id=None, prompt_id=None):
+    """
+    生成缩略预览并逐张推送到前端
+
+    images 可以是 [B, H, W, C] 批次，也可以是尺寸不同的 [H, W, C] 列表 (SEGS)。
+    先发送一条只含 count 的消息让前端准备占位，之后每张预览编码完成即通过 early-image-handler
+    单独推送，编码在线程池中并行进行。全分辨率图像只在前端请求时才编码 (/image_chooser_full)。
+    指定 client_id 时只发送给该客户端；prompt_id 随消息下发，前端回传选择时用于匹配会话。
+    """
+    if isinstance(images, torch.Tensor):
+        previews = list(downscale_batch(images, PREVIEW_MAX_EDGE).numpy())
+    else:
+        previews = [downscale_batch(i.unsqueeze(0), PREVIEW_MAX_EDGE)[0].numpy() for i in images]
+
+    count = len(previews)
+    PromptServer.instance.send_sync("early-image-handler", {"id": id, "urls": [], "count": count, "prompt_id": prompt_id}, client_id)
+
+    ext = 'jpg' if PREVIEW_FORMAT == 'jpeg' else PREVIEW_FORMAT
+    prefix = f"smell_chooser_{id}_{uuid.uuid4().hex[:8]}"
+    pool = get_pool()
+    futures = [pool.submit(_write_preview, id, i, count, array, f"{prefix}_{i:05}.{ext}", client_id, prompt_id) for i, array in enumerate(previews)]
+    for future in futures:
+        future.add_done_callback(_report_failure)
+    return futures
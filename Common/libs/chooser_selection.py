@@ -0,0 +1,59 @@
+import torch
+from typing import List, Optional, Sequence, Union
+
+Chosen = Union[range, List[int]]
+
+
+def choose_indices(mode: str, batch: int, count: int, selections: Sequence[int]) -> Chosen:
+    """
+    根据选择模式计算要输出的帧索引
+
+    连续模式 ("Pass through" / "Take First n" / "Take Last n") 返回 range，
+    其它模式返回用户选择中非负的索引列表 (负数是前端的分隔符)。
+    """
+    if mode == "Pass through":
+        return range(0, batch)
+    if mode == "Take First n":
+        return range(0, min(count, batch))
+    if mode == "Take Last n":
+        return range(max(batch - count, 0), batch)
+    return [x for x in selections if x >= 0]
+
+
+def _as_slice(chosen: Chosen, batch: int) -> Optional[slice]:
+    """chosen 在取模后是否为一段连续递增的区间，是则返回对应的 slice"""
+    if isinstance(chosen, range):
+        if chosen.step == 1 and 0 <= chosen.start and chosen.stop <= batch:
+            return slice(chosen.start, chosen.stop)
+        return None
+    start = chosen[0] % batch
+    for offset, x in enumerate(chosen):
+        if x % batch != start + offset:
+            return None
+    return slice(start, start + len(chosen))
+
+
+def select_tensor(tensor_in: Optional[torch.Tensor], chosen: Chosen) -> Optional[torch.Tensor]:
+    """
+    按第 0 维选出 chosen 对应的帧
+
+    连续区间直接返回切片视图 (零拷贝)，否则使用一次 index_select；从不修改输入 tensor。
+    """
+    if tensor_in is None or not len(chosen):
+        return None
+    batch = tensor_in.shape[0]
+    window = _as_slice(chosen, batch)
+    if window is not None:
+        return tensor_in[window]
+    index = torch.tensor(list(chosen), dtype=torch.long, device=tensor_in.device).remainder_(batch)
+    return tensor_in.index_select(0, index)
+
+
+def select_items(items_in: Optional[list], chosen: Chosen) -> Optional[list]:
+    """select_tensor 的列表版本，用于 SEGS 等非 tensor 批次"""
+    if items_in is None:
+        return None
+    batch = len(items_in)
+    if batch == 0:
+        return []
+    return [items_in[x % batch] for x in chosen]
@@ -0,0 +1,182 @@
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from .function import log
+
+# numpy 不支持的 dtype，按同宽度整数类型落盘
+_NUMPY_VIEW_DTYPES = {
+    torch.bfloat16: torch.int16,
+}
+
+
+def tensor_nbytes(obj) -> int:
+    """递归统计 dict / list / tuple 中所有 tensor 占用的字节数"""
+    if isinstance(obj, torch.Tensor):
+        return obj.element_size() * obj.nelement()
+    if isinstance(obj, dict):
+        return sum(tensor_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(tensor_nbytes(v) for v in obj)
+    return 0
+
+
+class _SpilledTensor:
+    """已写入磁盘的 tensor 占位符"""
+    def __init__(self, path, dtype, device):
+        self.path = path
+        self.dtype = dtype
+        self.device = device
+
+    def load(self) -> torch.Tensor:
+        # mmap_mode='c' 为写时复制，既不占用常驻内存也不会改动磁盘文件
+        tensor = torch.from_numpy(np.load(self.path, mmap_mode='c'))
+        if self.dtype in _NUMPY_VIEW_DTYPES:
+            tensor = tensor.view(self.dtype)
+        return tensor if self.device.type == 'cpu' else tensor.to(self.device)
+
+
+class ChooserStash:
+    """
+    ImageChooser / PreviewAndChoose 的暂存区
+
+    按节点 id 保存 images / latents / masks，统计其中 tensor 的字节数，超出预算时按 LRU
+    淘汰最久未使用的节点。配置了 spill_dir 时被淘汰的条目写入磁盘 (.npy)，读取时通过内存映射
+    加载，"Repeat last selection" 依旧可用；否则直接丢弃。
+
+    默认值可通过环境变量配置:
+        SMELL_CHOOSER_STASH_MB         内存预算(MB)，默认 2048
+        SMELL_CHOOSER_STASH_SPILL_DIR  落盘目录，默认不落盘
+    """
+
+    def __init__(self, budget_mb=None, spill_dir=None):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (entry, nbytes)
+        self._spilled = {}             # key -> 结构相同、tensor 替换为 _SpilledTensor 的 entry
+        self._versions = {}            # key -> 写入序号，供派生缓存 (如预览瓦片) 判断条目是否已被替换
+        self._serial = 0
+        self.nbytes = 0
+        self.configure(
+            budget_mb if budget_mb is not None else int(os.environ.get("SMELL_CHOOSER_STASH_MB", 2048)),
+            spill_dir if spill_dir is not None else os.environ.get("SMELL_CHOOSER_STASH_SPILL_DIR") or None,
+        )
+
+    def configure(self, budget_mb, spill_dir=None):
+        with self._lock:
+            self.budget = int(budget_mb) * 1024 * 1024
+            self.spill_dir = spill_dir
+            if spill_dir:
+                os.makedirs(spill_dir, exist_ok=True)
+            self._evict()
+
+    def __contains__(self, key):
+        key = str(key)
+        with self._lock:
+            return key in self._entries or key in self._spilled
+
+    def put(self, key, entry: dict):
+        key = str(key)
+        with self._lock:
+            self._discard(key)
+            self._serial += 1
+            self._versions[key] = self._serial
+            nbytes = tensor_nbytes(entry)
+            self._entries[key] = (entry, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+
+    def get(self, key, default=None):
+        key = str(key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            if key in self._spilled:
+                return self._restore(self._spilled[key])
+            return default
+
+    def version(self, key):
+        """条目的写入序号，每次 put 递增；条目不存在时返回 None"""
+        with self._lock:
+            return self._versions.get(str(key))
+
+    def clear(self, prefix=None):
+        """清空暂存区；指定 prefix 时只删除 key 以其开头的条目"""
+        with self._lock:
+            for key in list(self._entries) + list(self._spilled):
+                if prefix is None or key.startswith(prefix):
+                    self._discard(key)
+                    self._versions.pop(key, None)
+
+    def _discard(self, key):
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if key in self._spilled:
+            self._remove_spill_files(key)
+            del self._spilled[key]
+
+    def _evict(self):
+        while self.nbytes > self.budget and self._entries:
+            key, (entry, nbytes) = next(iter(self._entries.items()))
+            if not self.spill_dir and len(self._entries) == 1:
+                # 最新的条目即使超出预算也保留，避免当前节点的 "Repeat last selection" 失效
+                log(f"ChooserStash: entry '{key}' ({nbytes / 2**20:.1f}MB) exceeds budget ({self.budget / 2**20:.0f}MB)", message_type='warning')
+                break
+            self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            if self.spill_dir:
+                try:
+                    self._spilled[key] = self._spill(key, entry)
+                    continue
+                except OSError as e:
+                    self._remove_spill_files(key)
+                    log(f"ChooserStash: failed to spill '{key}': {e}", message_type='error')
+            # 条目已丢弃，写入序号也一并删除，避免 _versions 随出现过的 key 无限增长
+            self._versions.pop(key, None)
+
+    def _key_dir(self, key):
+        return os.path.join(self.spill_dir, re.sub(r'[^0-9A-Za-z_.-]', '_', key))
+
+    def _spill(self, key, entry):
+        directory = self._key_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        counter = [0]
+
+        def spill(obj):
+            if isinstance(obj, torch.Tensor):
+                path = os.path.join(directory, f"{counter[0]}.npy")
+                counter[0] += 1
+                data = obj.detach().cpu()
+                if data.dtype in _NUMPY_VIEW_DTYPES:
+                    data = data.view(_NUMPY_VIEW_DTYPES[data.dtype])
+                array = data.contiguous().numpy()
+                mm = np.lib.format.open_memmap(path, mode='w+', dtype=array.dtype, shape=array.shape)
+                mm[...] = array
+                mm.flush()
+                del mm
+                return _SpilledTensor(path, obj.dtype, obj.device)
+            if isinstance(obj, dict):
+                return {k: spill(v) for k, v in obj.items()}
+            if isinstance(obj, (list, tuple)):
+                return type(obj)(spill(v) for v in obj)
+            return obj
+
+        return spill(entry)
+
+    def _restore(self, obj):
+        if isinstance(obj, _SpilledTensor):
+            return obj.load()
+        if isinstance(obj, dict):
+            return {k: self._restore(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._restore(v) for v in obj)
+        return obj
+
+    def _remove_spill_files(self, key):
+        if self.spill_dir:
+            shutil.rmtree(self._key_dir(key), ignore_errors=True)
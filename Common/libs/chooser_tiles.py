@@ -0,0 +1,101 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+from .chooser_preview import encode_image
+from .image_convert import to_uint8
+
+# 瓦片配置，可通过环境变量覆盖
+TILE_SIZE = int(os.environ.get("SMELL_CHOOSER_TILE_SIZE", 256))
+TILE_FORMAT = os.environ.get("SMELL_CHOOSER_TILE_FORMAT", "webp").lower()  # webp / jpeg / png
+TILE_QUALITY = int(os.environ.get("SMELL_CHOOSER_TILE_QUALITY", 85))
+TILE_CACHE_MB = int(os.environ.get("SMELL_CHOOSER_TILE_CACHE_MB", 128))
+
+TILE_CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+
+def pick_image(images, index):
+    """从暂存的 images (批次列表) 中按全局索引取出单张 [H, W, C] 图像"""
+    if images is None or index < 0:
+        return None
+    for batch in images:
+        if index < batch.shape[0]:
+            return batch[index]
+        index -= batch.shape[0]
+    return None
+
+
+def pyramid_levels(width, height, tile_size=TILE_SIZE):
+    """
+    金字塔层数；第 0 层为原始分辨率，第 L 层缩小 2^L 倍，最高层整张图可放进单个瓦片
+    """
+    levels = 1
+    while max(width, height) > (tile_size << (levels - 1)):
+        levels += 1
+    return levels
+
+
+def pyramid_info(image, tile_size=TILE_SIZE):
+    H, W = image.shape[0], image.shape[1]
+    return {"width": W, "height": H, "tile_size": tile_size, "levels": pyramid_levels(W, H, tile_size), "format": TILE_FORMAT}
+
+
+def render_tile(image, level, x, y, tile_size=TILE_SIZE):
+    """
+    生成第 level 层 (x, y) 处的瓦片，返回 [h, w, C] uint8 数组；超出范围返回 None
+
+    只裁剪瓦片覆盖的原图区域再缩小，开销与瓦片大小成正比，不需要先缩放整张图。
+    """
+    H, W = image.shape[0], image.shape[1]
+    if level < 0 or level >= pyramid_levels(W, H, tile_size) or x < 0 or y < 0:
+        return None
+    span = tile_size << level  # 瓦片在原图中覆盖的边长
+    x0, y0 = x * span, y * span
+    if x0 >= W or y0 >= H:
+        return None
+    x1, y1 = min(x0 + span, W), min(y0 + span, H)
+    region = image[y0:y1, x0:x1]
+    if level > 0:
+        size = (max(1, math.ceil((y1 - y0) / (1 << level))), max(1, math.ceil((x1 - x0) / (1 << level))))
+        region = torch.nn.functional.interpolate(
+            region.movedim(-1, 0).unsqueeze(0).float(), size=size, mode='bilinear', align_corners=False, antialias=True
+        )[0].movedim(0, -1)
+    return to_uint8(region.unsqueeze(0))[0].numpy()
+
+
+class TileCache:
+    """
+    已编码瓦片的 LRU 缓存，按字节数限制大小
+
+    key 中包含暂存条目的写入序号 (ChooserStash.version)，条目被新的执行替换后旧瓦片自然失效。
+    """
+
+    def __init__(self, budget_mb=TILE_CACHE_MB):
+        self.budget = int(budget_mb) * 1024 * 1024
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, body: bytes):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self.nbytes += len(body)
+            while self.nbytes > self.budget and self._entries:
+                self.nbytes -= len(self._entries.popitem(last=False)[1])
+
+
+def encode_tile(image, level, x, y):
+    array = render_tile(image, level, x, y)
+    return None if array is None else encode_image(array, TILE_FORMAT, TILE_QUALITY)
@@ -0,0 +1,122 @@
+"""
+保存文件的序号分配
+
+get_next_file_path 每次都从 1 开始逐个 os.path.exists 探测，目录中已有 N 个文件时每张图像要 N 次 stat，
+网络文件系统上很慢。这里每个 (目录, 前缀, 扩展名) 只用 os.scandir 扫描一次，缓存已占用的序号与下一个空闲序号，
+之后每次分配为 O(1)。分配时用独占创建 (O_CREAT | O_EXCL) 占用文件，多个线程或进程同时保存也不会得到同一个文件名，
+被其它进程抢先占用的序号会被跳过。
+
+序号分为 1..FileMax 与 FileMax+1..2*FileMax 两个范围轮流使用: 当前范围用完时，在后台轮转备份该范围的文件，
+新的保存立即改用另一个范围，不等待文件移动。首次扫描 (或 FileMax 改变) 时，两个范围之外的旧文件
+(如旧版或更大的 FileMax 留下的) 也在后台一并轮转，不会永远留在目录中。
+"""
+import os
+import re
+import threading
+
+from .file_rotation import rotate_in_background
+
+
+class _Slot:
+    def __init__(self, used):
+        self.lock = threading.Lock()
+        self.used = used
+        self.base = 0
+        self.cursor = 1
+        self.rotations = {}  # 范围起点 -> 正在轮转该范围的 Future
+        self.file_max = None  # 按哪个 FileMax 划分的范围，改变时重新整理
+
+
+class FileIndexAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def _slot(self, key) -> _Slot:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = _Slot(self._scan(*key))
+            return slot
+
+    @staticmethod
+    def _scan(directory, filename_prefix, file_extension) -> set:
+        pattern = re.compile(re.escape(filename_prefix) + r"_(\d+)\." + re.escape(file_extension) + "$")
+        used = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    match = pattern.match(entry.name)
+                    if match:
+                        used.add(int(match.group(1)))
+        except FileNotFoundError:
+            pass
+        return used
+
+    def forget(self, directory: str):
+        """目录中的文件被外部移动或删除后调用，下次分配时重新扫描"""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            for key in [k for k in self._slots if k[0] == directory]:
+                del self._slots[key]
+
+    def claim(self, directory, filename_prefix, file_extension, file_max=64, before_backup=None):
+        """
+        占用下一个空闲序号，返回 (文件路径, 同名 txt 路径)，文件已创建为空文件
+
+        在当前范围内从小到大取空闲序号；范围用完时在后台轮转该范围 (移动前先调用 before_backup，
+        如等待后台保存写完)，并切换到另一个范围。另一个范围上一次的轮转如果还没完成，先等待它完成。
+        """
+        key = (os.path.abspath(directory), filename_prefix, file_extension)
+        slot = self._slot(key)
+        with slot.lock:
+            if slot.file_max != file_max:
+                self._rotate_out_of_range(slot, key, directory, file_max, before_backup)
+            while True:
+                while slot.cursor in slot.used:
+                    slot.cursor += 1
+                if slot.cursor > slot.base + file_max:
+                    self._switch_range(slot, key, directory, file_max, before_backup)
+                    continue
+
+                stem = os.path.join(directory, f"{filename_prefix}_{str(slot.cursor).zfill(4)}")
+                slot.used.add(slot.cursor)
+                try:
+                    os.close(os.open(f"{stem}.{file_extension}", os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+                except FileExistsError:
+                    continue  # 被其它进程抢先占用
+                return f"{stem}.{file_extension}", f"{stem}.txt"
+
+    def _rotate_out_of_range(self, slot, key, directory, file_max, before_backup):
+        """从第一个范围重新开始，并在后台轮转 2*FileMax 之外的序号 (否则它们永远不会被轮转)"""
+        if slot.file_max is not None:
+            slot.used = self._scan(*key)
+        stale = {index for index in slot.used if index > 2 * file_max}
+        if stale:
+            rotate_in_background(directory, key[1], key[2], stale, before_backup)
+            slot.used -= stale
+        slot.file_max = file_max
+        slot.base = 0
+        slot.cursor = 1
+
+    def _switch_range(self, slot, key, directory, file_max, before_backup):
+        indexes = range(slot.base + 1, slot.base + file_max + 1)
+        slot.rotations[slot.base] = rotate_in_background(directory, key[1], key[2], indexes, before_backup)
+        slot.base = file_max if slot.base == 0 else 0
+        previous = slot.rotations.pop(slot.base, None)
+        if previous is not None:
+            previous.result()
+        # 另一个范围的文件已移走，重新扫描得到其中仍被占用的序号 (范围之外的序号不再分配)
+        slot.used = {index for index in self._scan(*key) if index <= 2 * file_max} - set(indexes)
+        slot.cursor = slot.base + 1
+
+
+_allocator = FileIndexAllocator()
+
+
+def claim_file_path(directory, filename_prefix, file_extension, file_max=64, before_backup=None):
+    return _allocator.claim(directory, filename_prefix, file_extension, file_max, before_backup)
+
+
+def forget_directory(directory):
+    _allocator.forget(directory)
@@ -0,0 +1,127 @@
+"""
+保存目录的轮转备份
+
+保存的文件数超过 FileMax 时，把一个序号范围内的文件 (及同名 .txt 标签) 移入新的 bak_NNNN 目录。
+只扫描一次目录: 同时得到要移动的文件与已有的备份目录编号，之后逐个 os.replace (同一文件系统内只是重命名)。
+
+保留策略通过环境变量配置:
+    SMELL_BACKUP_KEEP     只保留最近 K 个备份，默认 0 (全部保留)
+    SMELL_BACKUP_POLICY   超出的旧备份 delete (删除，默认) 或 compress (压缩为 bak_NNNN.zip 后删除目录)
+
+rotate_in_background 在单独的轮转线程中执行，不占用共享线程池 (轮转前可能要等待线程池中的保存任务完成)。
+"""
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .function import log
+
+_keep = int(os.environ.get("SMELL_BACKUP_KEEP", 0))
+_policy = os.environ.get("SMELL_BACKUP_POLICY", "delete")
+_executor = None
+_lock = threading.Lock()
+
+BACKUP_PATTERN = re.compile(r"bak_(\d+)(\.zip)?$")
+
+
+def configure(keep: int = None, policy: str = None):
+    global _keep, _policy
+    if keep is not None:
+        _keep = max(0, int(keep))
+    if policy is not None:
+        if policy not in ("delete", "compress"):
+            raise ValueError(f"Unknown backup policy '{policy}'")
+        _policy = policy
+
+
+def rotate_files(directory, filename_prefix, file_extension, indexes=None, keep=None, policy=None) -> int:
+    """
+    把 {prefix}_{序号}.{扩展名} 文件及其同名 .txt 移入新的备份目录，返回移动的文件数 (不含 .txt)
+
+    indexes 为 None 时移动所有序号，否则只移动其中的序号；之后按保留策略清理旧备份。
+    """
+    pattern = re.compile(re.escape(filename_prefix) + r"_(\d+)\.(" + re.escape(file_extension) + r"|txt)$")
+    files, sidecars, backups = [], set(), []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = BACKUP_PATTERN.match(entry.name)
+            if match:
+                backups.append((int(match.group(1)), entry.name))
+                continue
+            match = pattern.match(entry.name)
+            if match and (indexes is None or int(match.group(1)) in indexes):
+                if match.group(2) == file_extension:
+                    files.append(entry.name)
+                else:
+                    sidecars.add(entry.name)
+    if not files:
+        return 0
+
+    # 已有备份的最大编号之后的第一个空闲编号，其它进程抢先创建时顺延
+    bak_index = max((index for index, _ in backups), default=-1) + 1
+    while True:
+        bak_name = f"bak_{str(bak_index).zfill(4)}"
+        try:
+            os.mkdir(os.path.join(directory, bak_name))
+            break
+        except FileExistsError:
+            bak_index += 1
+    bak_path = os.path.join(directory, bak_name)
+
+    moves = list(files)
+    for name in files:
+        sidecar = os.path.splitext(name)[0] + ".txt"
+        if sidecar in sidecars:
+            moves.append(sidecar)
+    for name in moves:
+        os.replace(os.path.join(directory, name), os.path.join(bak_path, name))
+    log(f"Moved {len(files)} files and {len(moves) - len(files)} tag files to {bak_path}")
+
+    apply_retention(directory, backups + [(bak_index, bak_name)], keep, policy)
+    return len(files)
+
+
+def apply_retention(directory, backups, keep=None, policy=None):
+    """backups 为 [(编号, 名称)]，只保留编号最大的 keep 个，其余按 policy 删除或压缩"""
+    keep = _keep if keep is None else keep
+    policy = _policy if policy is None else policy
+    if keep <= 0:
+        return
+    for _, name in sorted(backups)[:-keep]:
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith(".zip"):
+                if policy == "delete":
+                    os.remove(path)
+            elif policy == "compress":
+                shutil.make_archive(path, "zip", path)
+                shutil.rmtree(path)
+            else:
+                shutil.rmtree(path)
+        except OSError as e:
+            log(f"Failed to clean up backup {path}: {e}", message_type='warning')
+
+
+def rotate_in_background(directory, filename_prefix, file_extension, indexes, before_rotate=None):
+    """
+    在轮转线程中执行 rotate_files，返回 Future (结果为移动的文件数，出错时为 0)
+
+    before_rotate 在移动前调用，如等待后台保存写完这些文件。
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smell_rotation")
+
+    def rotate():
+        try:
+            if before_rotate is not None:
+                before_rotate()
+            return rotate_files(directory, filename_prefix, file_extension, indexes)
+        except Exception as e:
+            log(f"Failed to rotate {directory}: {e}", message_type='error')
+            return 0
+
+    return _executor.submit(rotate)
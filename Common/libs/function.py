@@ -1,7 +1,6 @@
 import torch
 import sys
 import os
-import shutil
 
 def clear_memory():
     import gc
@@ -45,30 +44,9 @@ def smell_debug(*args, **kwargs):
     sys.stdout.flush()
 
 def bakup_excessive_file(directory, filename_prefix, file_extension):
-    bak_index = 0
-    while True:
-        padding = str(bak_index).zfill(4)
-        dir_name = f"bak_{padding}"
-        dir_path = os.path.join(directory, dir_name)
-        if not os.path.exists(dir_path):
-            os.makedirs(dir_path, exist_ok=True)
-            moved_files = 0
-            for existing_file in os.listdir(directory):
-                if (existing_file.startswith(filename_prefix) and
-                    existing_file.endswith(file_extension)):
-                    src_path = os.path.join(directory, existing_file)
-                    dst_path = os.path.join(dir_path, existing_file)
-                    shutil.move(src_path, dst_path)
-                    moved_files += 1
-
-                    txt_filename = existing_file[:-5] + ".txt"
-                    txt_src_path = os.path.join(directory, txt_filename)
-                    if os.path.exists(txt_src_path):
-                        txt_dst_path = os.path.join(dir_path, txt_filename)
-                        shutil.move(txt_src_path, txt_dst_path)
-                        print(f"同时移动文本文件: {txt_filename}")
-            return moved_files
-        bak_index += 1
+    # 移动所有序号的文件及同名 txt 到新的 bak 目录，返回移动的文件数
+    from .file_rotation import rotate_files  # file_rotation 依赖本模块的 log
+    return rotate_files(directory, filename_prefix, file_extension)
 
 def get_next_file_path(directory, filename_prefix, file_extension, file_max=64):
     index = 1
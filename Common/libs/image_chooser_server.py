@@ -1,60 +1,280 @@
-from server import PromptServer
-from aiohttp import web
-import time
-import logging
-
-class Cancelled(Exception):
-    pass
-
-class MessageHolder:
-    stash = {}
-    messages = {}
-    cancelled = False
-    
-    @classmethod
-    def addMessage(cls, id, message):
-        if message=='__cancel__':
-            cls.messages = {}
-            cls.cancelled = True
-        elif message=='__start__':
-            cls.messages = {}
-            cls.stash = {}
-            cls.cancelled = False
-        else:
-            cls.messages[str(id)] = message
-    
-    @classmethod
-    def waitForMessage(cls, id, period = 0.1, asList = False):
-        sid = str(id)
-        while not (sid in cls.messages) and not ("-1" in cls.messages):
-            if cls.cancelled:
-                cls.cancelled = False
-                raise Cancelled()
-            time.sleep(period)
-        if cls.cancelled:
-            cls.cancelled = False
-            raise Cancelled()
-        message = cls.messages.pop(str(id),None) or cls.messages.pop("-1")
-        try:
-            if asList:
-                return [int(x.strip()) for x in message.split(",")]
-            else:
-                return int(message.strip())
-        except ValueError:
-            print(f"ERROR IN IMAGE_CHOOSER - failed to parse '${message}' as ${'comma separated list of ints' if asList else 'int'}")
-            return [1] if asList else 1
-
-try:
-    routes = PromptServer.instance.routes
-except AttributeError:
-    logging.warning("PromptServer.instance does not have 'routes' attribute. Routes will not be initialized.")
-    routes = None
-
-if routes is not None:
-    @routes.post('/image_chooser_message')
-    async def make_image_selection(request):
-        post = await request.post()
-        MessageHolder.addMessage(post.get("id"), post.get("message"))
-        return web.json_response({})
-else:
-    logging.warning("Routes is not initialized. '/image_chooser_message' endpoint will not be available.")
\ No newline at end of file
+from server import PromptServer
+from aiohttp import web, WSMsgType
+import asyncio
+import json
+import threading
+import logging
+
+from .chooser_stash import ChooserStash
+from .selection_history import SelectionHistory
+from .chooser_preview import encode_image
+from .image_convert import to_uint8
+from .chooser_tiles import TileCache, pick_image, pyramid_info, encode_tile, TILE_CONTENT_TYPES, TILE_FORMAT
+
+class Cancelled(Exception):
+    pass
+
+def current_session():
+    """当前执行中的 (client_id, prompt_id)，取自 ComfyUI 执行器写入 PromptServer 的字段"""
+    server = getattr(PromptServer, "instance", None)
+    return (getattr(server, "client_id", None), getattr(server, "last_prompt_id", None))
+
+class MessageHolder:
+    """
+    选择消息、暂存区与取消状态，按 (client_id, prompt_id, node_id) 隔离
+
+    消息中 client_id / prompt_id 为 None 表示通配 (旧版前端或未知 prompt 时)，node_id 为 "-1"
+    表示发给该会话中任意节点。暂存区按 (client_id, node_id) 保存，跨 prompt 保留以支持
+    "Repeat last selection" 与从选择节点重启。
+    """
+    stash = ChooserStash()
+    history = SelectionHistory()
+    messages = {}      # (client_id, prompt_id, node_id) -> 整数列表
+    cancelled = set()  # {(client_id, prompt_id)}
+
+    # 每个 (client_id, prompt_id, node_id) 一个条件变量，共享同一把锁；消息到达时直接唤醒匹配的等待线程
+    _lock = threading.Lock()
+    _waiters = {}
+
+    @staticmethod
+    def stashKey(id, client_id=None):
+        return f"{client_id}:{id}"
+
+    @staticmethod
+    def _covers(key, target):
+        """消息/取消的 key 是否作用于等待者 target=(client_id, prompt_id, node_id)"""
+        client_id, prompt_id = key[0], key[1]
+        if client_id is not None and client_id != target[0]:
+            return False
+        if prompt_id is not None and prompt_id != target[1]:
+            return False
+        return len(key) < 3 or key[2] == "-1" or key[2] == target[2]
+
+    @classmethod
+    def _waiter(cls, key):
+        # 调用方必须已持有 cls._lock
+        if key not in cls._waiters:
+            cls._waiters[key] = threading.Condition(cls._lock)
+        return cls._waiters[key]
+
+    @classmethod
+    def _notify(cls, key):
+        # 调用方必须已持有 cls._lock
+        for target, cond in cls._waiters.items():
+            if cls._covers(key, target):
+                cond.notify_all()
+
+    @classmethod
+    def _find_message(cls, target):
+        # 优先匹配最具体的消息
+        client_id, prompt_id, sid = target
+        for c in (client_id, None):
+            for p in (prompt_id, None):
+                for s in (sid, "-1"):
+                    if (c, p, s) in cls.messages:
+                        return (c, p, s)
+        return None
+
+    @classmethod
+    def _find_cancel(cls, target):
+        for key in cls.cancelled:
+            if cls._covers(key, target):
+                return key
+        return None
+
+    @staticmethod
+    def parseMessage(message):
+        """
+        将消息解析为控制字符串 ('__cancel__' / '__start__') 或整数列表
+
+        message 可以是 JSON 通道传来的整数列表，也可以是旧表单接口的逗号分隔字符串；空列表与无法解析的消息一样按 [1] 处理。
+        """
+        if message in ('__cancel__', '__start__'):
+            return message
+        try:
+            if isinstance(message, (list, tuple)):
+                selection = [int(x) for x in message]
+            elif isinstance(message, int):
+                selection = [message]
+            else:
+                selection = [int(x.strip()) for x in str(message).split(",")]
+            if not selection:
+                raise ValueError("empty selection")
+            return selection
+        except (TypeError, ValueError):
+            logging.warning(f"image_chooser: failed to parse '{message}' as comma separated list of ints")
+            return [1]
+
+    @classmethod
+    def _add(cls, id, message, client_id, prompt_id):
+        # 调用方必须已持有 cls._lock
+        session = (client_id, prompt_id)
+        if message=='__cancel__':
+            cls.messages = {k: v for k, v in cls.messages.items() if not cls._covers(session, k)}
+            cls.cancelled.add(session)
+            cls._notify(session)
+        elif message=='__start__':
+            # 新的执行开始: 清理该客户端之前的消息、取消标记与暂存
+            mine = lambda key: client_id is None or key[0] == client_id
+            cls.messages = {k: v for k, v in cls.messages.items() if not mine(k)}
+            cls.cancelled = {k for k in cls.cancelled if not mine(k)}
+            if client_id is None:
+                cls.stash.clear()
+            else:
+                cls.stash.clear(prefix=cls.stashKey("", client_id))
+        else:
+            key = (client_id, prompt_id, str(id))
+            cls.messages[key] = message
+            cls._notify(key)
+
+    @classmethod
+    def addMessage(cls, id, message, client_id=None, prompt_id=None):
+        message = cls.parseMessage(message)
+        with cls._lock:
+            cls._add(id, message, client_id or None, prompt_id or None)
+
+    @classmethod
+    def addMessages(cls, messages):
+        """批量添加 [(id, message, client_id, prompt_id), ...]，先全部解析，再在一次加锁内按顺序投递"""
+        parsed = [(id, cls.parseMessage(message), client_id or None, prompt_id or None) for id, message, client_id, prompt_id in messages]
+        with cls._lock:
+            for args in parsed:
+                cls._add(*args)
+
+    @classmethod
+    def waitForMessage(cls, id, asList = False, timeout = None, session = None):
+        """
+        等待节点 id 的选择；timeout 秒内没有收到消息时返回 None
+
+        session 为 (client_id, prompt_id)，默认取当前正在执行的 prompt。
+        """
+        client_id, prompt_id = current_session() if session is None else session
+        target = (client_id, prompt_id, str(id))
+        with cls._lock:
+            cond = cls._waiter(target)
+            try:
+                if not cond.wait_for(lambda: cls._find_cancel(target) or cls._find_message(target), timeout):
+                    return None
+                cancel = cls._find_cancel(target)
+                if cancel is not None:
+                    cls.cancelled.discard(cancel)
+                    raise Cancelled()
+                selection = cls.messages.pop(cls._find_message(target))
+            finally:
+                cls._waiters.pop(target, None)
+        return selection if asList else selection[0]
+
+def read_bulk_messages(data):
+    """
+    解析 {"messages": [{"id", "message", "client_id", "prompt_id"}, ...]}，
+    返回 [(id, message, client_id, prompt_id), ...]
+    """
+    messages = data.get("messages", []) if isinstance(data, dict) else []
+    return [(m.get("id"), m.get("message"), m.get("client_id"), m.get("prompt_id")) for m in messages if isinstance(m, dict)]
+
+async def make_image_selection(request):
+    post = await request.post()
+    MessageHolder.addMessage(post.get("id"), post.get("message"), post.get("client_id"), post.get("prompt_id"))
+    return web.json_response({})
+
+async def make_image_selections(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.json_response({"error": "invalid json"}, status=400)
+    messages = read_bulk_messages(data)
+    MessageHolder.addMessages(messages)
+    return web.json_response({"count": len(messages)})
+
+async def image_chooser_websocket(request):
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    async for msg in ws:
+        if msg.type == WSMsgType.TEXT:
+            try:
+                MessageHolder.addMessages(read_bulk_messages(json.loads(msg.data)))
+            except ValueError:
+                logging.warning(f"image_chooser_ws: ignored malformed message {msg.data[:100]}")
+        elif msg.type == WSMsgType.ERROR:
+            logging.warning(f"image_chooser_ws: connection closed with exception {ws.exception()}")
+    return ws
+
+def stashed_image(stash_key, index):
+    entry = MessageHolder.stash.get(stash_key)
+    return pick_image(entry.get('images', None) if entry else None, index)
+
+def encode_full_resolution(stash_key, index):
+    image = stashed_image(stash_key, index)
+    return None if image is None else encode_image(to_uint8(image.unsqueeze(0))[0].numpy(), 'png')
+
+tile_cache = TileCache()
+
+def get_tile_info(stash_key, index):
+    image = stashed_image(stash_key, index)
+    if image is None:
+        return None
+    # version 由前端附加在瓦片地址上，同一节点重新执行后浏览器缓存不会返回旧瓦片
+    return dict(pyramid_info(image), version=MessageHolder.stash.version(stash_key))
+
+def get_tile(stash_key, index, level, x, y):
+    cache_key = (stash_key, MessageHolder.stash.version(stash_key), index, level, x, y)
+    body = tile_cache.get(cache_key)
+    if body is None:
+        image = stashed_image(stash_key, index)
+        body = None if image is None else encode_tile(image, level, x, y)
+        if body is not None:
+            tile_cache.put(cache_key, body)
+    return body
+
+def _query_ints(request, *names):
+    try:
+        return [int(request.query.get(name, "0")) for name in names]
+    except ValueError:
+        return None
+
+def _query_stash_key(request):
+    return MessageHolder.stashKey(request.query.get("id"), request.query.get("client_id") or None)
+
+async def get_full_resolution_image(request):
+    args = _query_ints(request, "index")
+    if args is None:
+        return web.Response(status=400)
+    body = await asyncio.get_running_loop().run_in_executor(None, encode_full_resolution, _query_stash_key(request), *args)
+    if body is None:
+        return web.Response(status=404)
+    return web.Response(body=body, content_type="image/png")
+
+async def get_tile_pyramid_info(request):
+    args = _query_ints(request, "index")
+    if args is None:
+        return web.Response(status=400)
+    info = await asyncio.get_running_loop().run_in_executor(None, get_tile_info, _query_stash_key(request), *args)
+    if info is None:
+        return web.Response(status=404)
+    return web.json_response(info)
+
+async def get_tile_image(request):
+    args = _query_ints(request, "index", "level", "x", "y")
+    if args is None:
+        return web.Response(status=400)
+    body = await asyncio.get_running_loop().run_in_executor(None, get_tile, _query_stash_key(request), *args)
+    if body is None:
+        return web.Response(status=404)
+    # 瓦片地址中带有 version，同一地址内容不会变化，可由浏览器缓存
+    return web.Response(body=body, content_type=TILE_CONTENT_TYPES.get(TILE_FORMAT, "image/webp"), headers={"Cache-Control": "private, max-age=3600"})
+
+try:
+    routes = PromptServer.instance.routes
+except AttributeError:
+    logging.warning("PromptServer.instance does not have 'routes' attribute. Routes will not be initialized.")
+    routes = None
+
+if routes is not None:
+    routes.post('/image_chooser_message')(make_image_selection)
+    routes.post('/image_chooser_messages')(make_image_selections)
+    routes.get('/image_chooser_ws')(image_chooser_websocket)
+    routes.get('/image_chooser_full')(get_full_resolution_image)
+    routes.get('/image_chooser_tiles')(get_tile_pyramid_info)
+    routes.get('/image_chooser_tile')(get_tile_image)
+else:
+    logging.warning("Routes is not initialized. Image chooser endpoints will not be available.")
@@ -0,0 +1,211 @@
+import math
+
+import torch
+import torch.nn.functional as TF
+
+from .canvas import new_canvas
+from .function import log
+from .tiled_resize import needs_tiling, tiled_resize_batch
+
+
+def resize_batch(images: torch.Tensor, width: int, height: int, mode: str = "nearest-exact", antialias: bool = False) -> torch.Tensor:
+    """
+    将 [B, H, W, C] 图像或 [B, H, W] 掩膜批次一次性缩放到 (height, width)，在原设备上完成
+
+    mode 为 torch.nn.functional.interpolate 的插值方式，"nearest-exact" 与 PIL 的 NEAREST 取样位置一致。
+    antialias 只对 bilinear / bicubic 有效，缩小时避免锯齿；bicubic 的结果会被截断到 [0, 1]。
+    额外内存超过 SMELL_RESIZE_BUDGET_MB 时改为按行带分块缩放 (见 tiled_resize)。
+    """
+    if images.shape[1] == height and images.shape[2] == width:
+        return images
+    if needs_tiling(images, width, height):
+        return tiled_resize_batch(images, width, height, mode, antialias)
+    is_mask = images.dim() == 3
+    samples = images.unsqueeze(1) if is_mask else images.movedim(-1, 1)
+    kwargs = {} if mode.startswith("nearest") or mode == "area" else {"align_corners": False, "antialias": antialias}
+    samples = TF.interpolate(samples.float(), size=(height, width), mode=mode, **kwargs)
+    if mode == "bicubic":
+        samples = samples.clamp_(0.0, 1.0)
+    samples = samples.to(images.dtype)
+    return samples.squeeze(1) if is_mask else samples.movedim(1, -1)
+
+
+# PIL 重采样方法 -> (interpolate 模式, 是否抗锯齿)；torch 没有 lanczos / hamming，取最接近的可分离滤波
+TORCH_RESAMPLE = {
+    "lanczos": ("bicubic", True),
+    "bicubic": ("bicubic", True),
+    "hamming": ("bilinear", True),
+    "bilinear": ("bilinear", True),
+    "box": ("area", False),
+    "nearest": ("nearest-exact", False),
+}
+
+
+def fit_resize_batch(images: torch.Tensor, width: int, height: int, fit: str = "fill", method: str = "bilinear", background=0.0) -> torch.Tensor:
+    """
+    fit_resize_image 的 torch 实现，整个 [B, H, W, C] 图像或 [B, H, W] 掩膜批次一次插值，在原设备上完成
+
+    fit:
+        letterbox  等比缩放到目标尺寸内，居中放在以 background 填充的画布上
+        crop       居中裁剪到目标宽高比后缩放
+        fill       直接拉伸到目标尺寸
+    method 为 PIL 重采样方法名，按 TORCH_RESAMPLE 映射；background 为 0-1 颜色或标量。
+    """
+    mode, antialias = TORCH_RESAMPLE.get(method, TORCH_RESAMPLE["bilinear"])
+    H, W = images.shape[1], images.shape[2]
+    if fit == 'letterbox':
+        if W / H > width / height:  # 更宽，上下留边
+            fit_width, fit_height = width, max(1, int(width / W * H))
+        else:  # 更瘦，左右留边
+            fit_width, fit_height = max(1, int(height / H * W)), height
+        resized = resize_batch(images, fit_width, fit_height, mode, antialias)
+        channels = None if images.dim() == 3 else images.shape[-1]
+        canvas = new_canvas(images.shape[0], height, width, channels, background, images.dtype, images.device)
+        return paste(canvas, resized, (width - fit_width) // 2, (height - fit_height) // 2)
+    if fit == 'crop':
+        if W / H > width / height:  # 更宽，裁左右
+            crop_width = int(H * width / height)
+            images = images[:, :, (W - crop_width) // 2:(W - crop_width) // 2 + crop_width]
+        else:  # 更瘦，裁上下
+            crop_height = int(W * height / width)
+            images = images[:, (H - crop_height) // 2:(H - crop_height) // 2 + crop_height]
+    return resize_batch(images, width, height, mode, antialias)
+
+
+def mask_for(image: torch.Tensor, mask, name: str = "mask") -> torch.Tensor:
+    """
+    返回与 [B, H, W, C] 图像匹配的 [B, H, W] 掩膜
+
+    mask 为 None 时返回全零掩膜；批次为 1 时广播到整个批次 (不复制)；尺寸不匹配时给出警告并返回全零掩膜。
+    """
+    B, H, W = image.shape[0], image.shape[1], image.shape[2]
+    if mask is None:
+        return image.new_zeros((B, H, W))
+    if mask.dim() == 2:
+        mask = mask.unsqueeze(0)
+    if mask.shape[1] != H or mask.shape[2] != W or mask.shape[0] not in (1, B):
+        log(f"{name} size {tuple(mask.shape)} does not match image size {(B, H, W)}, using a blank mask instead", message_type='warning')
+        return image.new_zeros((B, H, W))
+    return mask.expand(B, H, W)
+
+
+def channel_count(*images: torch.Tensor) -> int:
+    return max(image.shape[-1] for image in images)
+
+
+def paste(canvas: torch.Tensor, image: torch.Tensor, x: int, y: int, fill: float = 1.0):
+    """
+    将 image 写入 canvas 的 (x, y) 处 (原地修改 canvas)
+
+    image 的通道数少于 canvas 时 (如 RGB 写入 RGBA 画布)，缺少的通道以 fill 填充，
+    与先 torch.cat 一个全 1 的 alpha 通道效果相同但不产生中间张量。掩膜 ([B, H, W]) 直接写入。
+    """
+    h, w = image.shape[1], image.shape[2]
+    if canvas.dim() == 3:
+        canvas[:, y:y + h, x:x + w] = image
+        return canvas
+    c = image.shape[-1]
+    canvas[:, y:y + h, x:x + w, :c] = image
+    if c < canvas.shape[-1]:
+        canvas[:, y:y + h, x:x + w, c:] = fill
+    return canvas
+
+
+def grid_layout(sizes, columns: int = 0, spacing: int = 0):
+    """
+    计算网格布局
+
+    sizes 为每个格子的 (width, height)，按行优先排列；columns 为 0 时取 ceil(sqrt(n))。
+    每列宽度取该列最宽的格子，每行高度取该行最高的格子，格子贴在单元格左上角。
+    返回 (positions [(x, y), ...], canvas_width, canvas_height)。
+    """
+    n = len(sizes)
+    if n == 0:
+        return [], 0, 0
+    if columns <= 0:
+        columns = math.ceil(math.sqrt(n))
+    columns = min(columns, n)
+    rows = math.ceil(n / columns)
+    col_widths = [0] * columns
+    row_heights = [0] * rows
+    for i, (w, h) in enumerate(sizes):
+        col_widths[i % columns] = max(col_widths[i % columns], w)
+        row_heights[i // columns] = max(row_heights[i // columns], h)
+    col_x = [sum(col_widths[:c]) + spacing * c for c in range(columns)]
+    row_y = [sum(row_heights[:r]) + spacing * r for r in range(rows)]
+    positions = [(col_x[i % columns], row_y[i // columns]) for i in range(n)]
+    return positions, col_x[-1] + col_widths[-1], row_y[-1] + row_heights[-1]
+
+
+def skyline_pack(sizes, width: int, spacing: int = 0):
+    """
+    在宽度为 width 的条带上用 skyline (bottom-left) 算法放置矩形
+
+    sizes 为 (width, height) 列表，按高度从大到小依次放置，每个矩形选择顶边最低、其次最靠左的位置。
+    返回 (positions, used_width, used_height)；有矩形比 width 更宽时返回 None。
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    skyline = [[0, 0, width]]  # [x, y, w] 线段，按 x 排列，首尾相接覆盖整个宽度
+    positions = [None] * len(sizes)
+    used_width = used_height = 0
+    for i in order:
+        w, h = sizes[i][0] + spacing, sizes[i][1] + spacing
+        best = None  # (top, x, y, segment index)
+        for s in range(len(skyline)):
+            x = skyline[s][0]
+            if x + w > width:
+                break
+            # 矩形底边落在所跨线段中最高的一段上
+            y, covered, j = 0, 0, s
+            while covered < w:
+                y = max(y, skyline[j][1])
+                covered += skyline[j][2] - (x - skyline[j][0] if j == s else 0)
+                j += 1
+            if best is None or (y + h, x) < best[:2]:
+                best = (y + h, x, y, s)
+        if best is None:
+            return None
+        top, x, y, s = best
+        positions[i] = (x, y)
+        used_width = max(used_width, x + w - spacing)
+        used_height = max(used_height, top - spacing)
+
+        # 更新 skyline: 插入新线段，裁掉被覆盖的部分
+        right = x + w
+        new_line = skyline[:s] + [[x, top, w]]
+        for seg in skyline[s:]:
+            seg_right = seg[0] + seg[2]
+            if seg_right <= right:
+                continue
+            if seg[0] < right:
+                seg = [right, seg[1], seg_right - right]
+            new_line.append(seg)
+        # 合并高度相同的相邻线段
+        skyline = [new_line[0]]
+        for seg in new_line[1:]:
+            if seg[1] == skyline[-1][1]:
+                skyline[-1] = [skyline[-1][0], skyline[-1][1], skyline[-1][2] + seg[2]]
+            else:
+                skyline.append(seg)
+    return positions, used_width, used_height
+
+
+def atlas_layout(sizes, spacing: int = 0):
+    """
+    为尺寸各异的矩形寻找面积最小的图集布局
+
+    以总面积的平方根为基准尝试若干条带宽度，分别做 skyline 装箱，取画布面积最小 (其次更接近正方形) 的结果。
+    返回 (positions [(x, y), ...], canvas_width, canvas_height)。
+    """
+    if not sizes:
+        return [], 0, 0
+    widest = max(w for w, _ in sizes) + spacing
+    side = math.sqrt(sum((w + spacing) * (h + spacing) for w, h in sizes))
+    candidates = sorted({max(widest, int(side * f)) for f in (1.0, 1.1, 1.25, 1.5, 2.0)} | {widest})
+    best = None
+    for width in candidates:
+        positions, used_width, used_height = skyline_pack(sizes, width, spacing)
+        score = (used_width * used_height, abs(used_width - used_height))
+        if best is None or score < best[0]:
+            best = (score, positions, used_width, used_height)
+    return best[1:]
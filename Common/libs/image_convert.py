@@ -0,0 +1,88 @@
+"""
+tensor / PIL / numpy 之间的转换
+
+ComfyUI 的 IMAGE 为 [B, H, W, C] float(0-1)，MASK 为 [B, H, W] float(0-1)。
+float -> uint8 整批只转换一次，只分配一个中间 float 缓冲区并原地运算；GPU 张量在设备上转换后
+只传输 uint8 数据。uint8 -> float 只分配最终的 float32 数组并原地归一化，再通过 torch.from_numpy
+零拷贝包装为张量。
+"""
+import numpy as np
+import torch
+from PIL import Image
+from typing import List, Union
+
+
+def to_uint8(images: torch.Tensor) -> torch.Tensor:
+    """float(0-1) 张量 -> 同形状 uint8 CPU 张量，与旧版 np.clip(255. * x, 0, 255).astype(np.uint8) 相同 (截断小数)"""
+    if images.device.type != 'cpu' or images.dtype == torch.bfloat16:
+        # 在原设备上转换，设备到主机只拷贝 1/4 的数据
+        return images.float().mul_(255.0).clamp_(0, 255).to(dtype=torch.uint8, device='cpu')
+    buffer = np.multiply(images.detach().numpy(), 255.0, dtype=np.float32)
+    np.clip(buffer, 0, 255, out=buffer)
+    return torch.from_numpy(buffer.astype(np.uint8))
+
+
+def tensor2np(tensor: torch.Tensor) -> Union[np.ndarray, List[np.ndarray]]:
+    """
+    单张 [H, W, C] 返回 uint8 数组；批次 [B, ...] 返回 uint8 数组列表
+
+    整个批次只转换一次，列表中的数组都是同一块内存的视图。
+    """
+    array = to_uint8(tensor).numpy()
+    if len(tensor.shape) == 3:  # Single image
+        return array
+    return list(array)  # Batch of images
+
+
+def tensor2pil(t_image: torch.Tensor) -> Image.Image:
+    """单张图像或掩膜 (允许带大小为 1 的维度) -> PIL Image"""
+    return Image.fromarray(to_uint8(t_image).numpy().squeeze())
+
+
+def tensor2pil_batch(images: torch.Tensor) -> List[Image.Image]:
+    """[B, H, W, C] 图像或 [B, H, W] 掩膜批次 -> PIL Image 列表，整批只转换一次"""
+    if images.dim() == 2:
+        images = images.unsqueeze(0)
+    array = to_uint8(images).numpy()
+    if array.ndim == 4 and array.shape[-1] == 1:
+        array = array[..., 0]
+    return [Image.fromarray(a) for a in array]
+
+
+def np2tensor(array: np.ndarray) -> torch.Tensor:
+    """
+    numpy 数组 -> float32 张量 (不增加批次维度)
+
+    uint8 数组只分配一次 float32 结果并原地归一化；其它整数类型按其最大值归一化。
+    """
+    if array.dtype == np.uint8:
+        return torch.from_numpy(array.astype(np.float32)).div_(255.0)
+    if array.dtype == np.bool_:
+        return torch.from_numpy(array.astype(np.float32))
+    if np.issubdtype(array.dtype, np.integer):
+        return torch.from_numpy(array.astype(np.float32) / np.iinfo(array.dtype).max)
+    return torch.from_numpy(np.ascontiguousarray(array, dtype=np.float32))
+
+
+def pil2tensor(image: Image.Image) -> torch.Tensor:
+    """PIL Image -> [1, H, W, C] (或单通道图像的 [1, H, W]) float32 张量"""
+    return np2tensor(np.asarray(image)).unsqueeze(0)
+
+
+def pils2tensor(images: List[Image.Image]) -> torch.Tensor:
+    """尺寸相同的 PIL Image 列表 -> [B, H, W, C] float32 张量，先拼成一个 uint8 数组，整批只转换一次"""
+    return np2tensor(np.stack([np.asarray(image) for image in images]))
+
+
+def image2mask(image: Image.Image) -> torch.Tensor:
+    """PIL Image -> [1, H, W] 掩膜，L 模式直接使用，其它模式取 R 通道"""
+    if image.mode != 'L':
+        image = image.convert('RGB').getchannel(0)
+    return pil2tensor(image)
+
+
+def mask2image(mask: torch.Tensor) -> Image.Image:
+    """掩膜 (批次时取最后一张) -> RGBA 灰度图，掩膜值为颜色，alpha 不透明"""
+    if mask.dim() > 2:
+        mask = mask.reshape(-1, *mask.shape[-2:])[-1]
+    return tensor2pil(mask).convert('L').convert('RGBA')
@@ -0,0 +1,93 @@
+"""
+保存节点使用的图像编码器
+
+每种格式提供 fast / balanced / small 三个预设，在编码速度与文件大小之间取舍；balanced 的 PNG 与旧版 (compress_level=4) 相同。
+有损格式的 quality 由节点输入指定；元数据 (prompt / workflow) 只写入 PNG。
+"""
+import io
+from typing import Dict
+
+from PIL import Image
+
+PRESETS = ["balanced", "fast", "small"]
+
+
+class ImageEncoder:
+    """
+    extension   文件扩展名
+    pil_format  PIL 的保存格式
+    presets     预设名 -> PIL 保存参数
+    level_key   可由 level 参数覆盖的压缩级别参数名 (如 PNG 的 compress_level)
+    lossy       是否使用 quality 参数
+    alpha       是否支持透明通道，不支持时转为 RGB
+    """
+
+    def __init__(self, extension: str, pil_format: str, presets: Dict[str, dict], level_key: str = None,
+                 lossy: bool = False, alpha: bool = True):
+        self.extension = extension
+        self.pil_format = pil_format
+        self.presets = presets
+        self.level_key = level_key
+        self.lossy = lossy
+        self.alpha = alpha
+
+    def options(self, preset: str = "balanced", quality: int = None, level: int = None) -> dict:
+        if preset not in self.presets:
+            raise ValueError(f"Unknown encoder preset '{preset}', available: {', '.join(self.presets)}")
+        options = dict(self.presets[preset])
+        if self.lossy and quality is not None:
+            options["quality"] = quality
+        if self.level_key and level is not None:
+            options[self.level_key] = level
+        return options
+
+    def encode(self, image: Image.Image, preset: str = "balanced", quality: int = None, level: int = None, pnginfo=None) -> bytes:
+        if not self.alpha and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        options = self.options(preset, quality, level)
+        if pnginfo is not None and self.pil_format == "PNG":
+            options["pnginfo"] = pnginfo
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.pil_format, **options)
+        return buffer.getvalue()
+
+
+ENCODERS: Dict[str, ImageEncoder] = {
+    "png": ImageEncoder("png", "PNG", {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 4},
+        "small": {"compress_level": 9},
+    }, level_key="compress_level"),
+    # 无损 WebP 的 quality 表示压缩力度 (0-100)
+    "webp lossless": ImageEncoder("webp", "WEBP", {
+        "fast": {"lossless": True, "quality": 0, "method": 0},
+        "balanced": {"lossless": True, "quality": 25, "method": 2},
+        "small": {"lossless": True, "quality": 75, "method": 4},
+    }, level_key="method"),
+    "webp": ImageEncoder("webp", "WEBP", {
+        "fast": {"quality": 90, "method": 0},
+        "balanced": {"quality": 90, "method": 4},
+        "small": {"quality": 90, "method": 6},
+    }, level_key="method", lossy=True),
+    "jpeg": ImageEncoder("jpg", "JPEG", {
+        "fast": {"quality": 95},
+        "balanced": {"quality": 95, "optimize": True},
+        "small": {"quality": 95, "optimize": True, "progressive": True},
+    }, lossy=True, alpha=False),
+    # 不压缩的 TIFF 编码最快但文件最大，small 使用 deflate (照片类图像上 LZW 往往比不压缩还大)
+    "tiff": ImageEncoder("tiff", "TIFF", {
+        "fast": {"compression": "raw"},
+        "balanced": {"compression": "raw"},
+        "small": {"compression": "tiff_adobe_deflate"},
+    }),
+}
+
+
+def register_encoder(name: str, encoder: ImageEncoder):
+    ENCODERS[name] = encoder
+
+
+def get_encoder(name: str) -> ImageEncoder:
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown image encoder '{name}', available: {', '.join(ENCODERS)}")
+    return ENCODERS[name]
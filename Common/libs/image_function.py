@@ -4,39 +4,13 @@ from PIL import Image, ImageOps
 from PIL.PngImagePlugin import PngInfo
 from typing import List
 
+from .thread_pool import map_ordered
+from .image_convert import to_uint8, tensor2np, tensor2pil, tensor2pil_batch, np2tensor, pil2tensor, pils2tensor, image2mask, mask2image
+
 '''Value Functions'''
 def is_valid_mask(tensor:torch.Tensor) -> bool:
     return not bool(torch.all(tensor == 0).item())
 
-def pil2tensor(image) -> torch.Tensor:
-    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
-
-def tensor2pil(t_image: torch.Tensor)  -> Image:
-    return Image.fromarray(np.clip(255.0 * t_image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
-
-def tensor2np(tensor: torch.Tensor) -> List[np.ndarray]:
-    if len(tensor.shape) == 3:  # Single image
-        return np.clip(255.0 * tensor.cpu().numpy(), 0, 255).astype(np.uint8)
-    else:  # Batch of images
-        return [np.clip(255.0 * t.cpu().numpy(), 0, 255).astype(np.uint8) for t in tensor]
-
-def image2mask(image:Image) -> torch.Tensor:
-    if image.mode == 'L':
-        return torch.tensor([pil2tensor(image)[0, :, :].tolist()])
-    else:
-        image = image.convert('RGB').split()[0]
-        return torch.tensor([pil2tensor(image)[0, :, :].tolist()])
-
-
-def mask2image(mask:torch.Tensor)  -> Image:
-    masks = tensor2np(mask)
-    for m in masks:
-        _mask = Image.fromarray(m).convert("L")
-        _image = Image.new("RGBA", _mask.size, color='white')
-        _image = Image.composite(
-            _image, Image.new("RGBA", _mask.size, color='black'), _mask)
-    return _image
-
 def fit_resize_image(image:Image, target_width:int, target_height:int, fit:str, resize_sampler:str, background_color:str = '#000000') -> Image:
     image = image.convert('RGB')
     orig_width, orig_height = image.size
@@ -66,14 +40,18 @@ def fit_resize_image(image:Image, target_width:int, target_height:int, fit:str,
     return  ret_image
 
 
+def fit_resize_images(images:List[Image.Image], target_width:int, target_height:int, fit:str, resize_sampler:str, background_color:str = '#000000') -> List[Image.Image]:
+    """fit_resize_image 的批量版本，每张图像提交到共享线程池，按输入顺序返回"""
+    return map_ordered(fit_resize_image, images, target_width, target_height, fit, resize_sampler, background_color)
+
+
 def load_image_from_path(image_path):
     image = Image.open(image_path)
     image = ImageOps.exif_transpose(image)
     image = image.convert("RGB")
 
     if 'A' in image.getbands():
-        mask = np.array(image.getchannel('A')).astype(np.float32) / 255.0
-        mask = 1. - torch.from_numpy(mask)
+        mask = 1. - np2tensor(np.array(image.getchannel('A')))
     else:
         mask = None
     return pil2tensor(image), mask
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+PNG 压缩级别自动调节
+
+固定的 compress_level 在本地 SSD 上浪费 CPU，在慢速网络共享上又写入太多字节。这里对每个保存目录记录最近
+若干次保存 (环境变量 SMELL_PNG_AUTOTUNE_WINDOW，默认 32) 的编码耗时、压缩后字节数与写入耗时，
+估计每个级别的有效吞吐 (按未压缩数据计):
+    min(并行数 * 未压缩字节 / 编码耗时, 磁盘带宽 * 未压缩字节 / 压缩后字节)
+即编码与写入中较慢的一方，取吞吐最大的级别。并行数为同时编码的帧数上限 (线程数与保存队列长度中较小的一个)，
+写入耗时包含 fsync，测得的是磁盘带宽而不是页缓存的写入速度。未测量的相邻级别会先试一次，之后每隔几次保存试一次相邻级别，
+使选择能跟随图像内容与磁盘负载的变化。
+"""
+import os
+import threading
+from collections import deque
+
+from .thread_pool import max_workers
+
+LEVELS = range(1, 10)  # 不使用 0 (不压缩)，避免文件大小翻倍
+DEFAULT_LEVEL = 4
+EXPLORE_EVERY = 8
+
+_window = int(os.environ.get("SMELL_PNG_AUTOTUNE_WINDOW", 32))
+
+
+class PngAutotuner:
+    def __init__(self, window: int = _window, explore_every: int = EXPLORE_EVERY, parallelism: int = None):
+        self._lock = threading.Lock()
+        self._samples = {level: deque(maxlen=window) for level in LEVELS}  # (未压缩字节, 压缩后字节, 编码耗时)
+        self._writes = deque(maxlen=window)  # (写入字节, 写入耗时)
+        self._tried = set()
+        self._count = 0
+        self.explore_every = explore_every
+        self.parallelism = parallelism  # None 时按线程池大小
+        self.level = DEFAULT_LEVEL
+
+    def record(self, level: int, raw_bytes: int, encoded_bytes: int, encode_seconds: float, write_seconds: float):
+        with self._lock:
+            self._samples[level].append((raw_bytes, encoded_bytes, encode_seconds))
+            self._writes.append((encoded_bytes, write_seconds))
+
+    def _bandwidth(self):
+        written = sum(b for b, _ in self._writes)
+        seconds = sum(s for _, s in self._writes)
+        return written / seconds if seconds > 0 else None
+
+    def _throughput(self, level: int, bandwidth):
+        samples = self._samples[level]
+        if not samples:
+            return None
+        raw = sum(s[0] for s in samples)
+        encoded = sum(s[1] for s in samples)
+        seconds = sum(s[2] for s in samples)
+        parallelism = self.parallelism or max_workers()
+        encode_rate = raw * parallelism / seconds if seconds > 0 else float("inf")
+        write_rate = raw * bandwidth / encoded if bandwidth and encoded else float("inf")
+        return min(encode_rate, write_rate)
+
+    def choose(self) -> int:
+        """返回下一次保存使用的级别"""
+        with self._lock:
+            self._count += 1
+            bandwidth = self._bandwidth()
+            measured = {level: self._throughput(level, bandwidth) for level in LEVELS}
+            measured = {level: rate for level, rate in measured.items() if rate is not None}
+            if measured:
+                # 吞吐相同时取更高的级别 (文件更小)
+                self.level = max(measured, key=lambda level: (measured[level], level))
+
+            neighbours = [level for level in (self.level - 1, self.level + 1) if level in LEVELS]
+            untried = [level for level in [self.level] + neighbours if level not in self._tried]
+            if untried:
+                level = untried[0]
+            elif self._count % self.explore_every == 0:
+                level = neighbours[(self._count // self.explore_every) % len(neighbours)]
+            else:
+                level = self.level
+            self._tried.add(level)
+            return level
+
+    def stats(self) -> dict:
+        with self._lock:
+            bandwidth = self._bandwidth()
+            levels = {}
+            for level in LEVELS:
+                samples = self._samples[level]
+                if not samples:
+                    continue
+                raw = sum(s[0] for s in samples)
+                levels[level] = {
+                    "samples": len(samples),
+                    "encode_mb_s": raw / max(sum(s[2] for s in samples), 1e-9) / 1048576.0,
+                    "ratio": sum(s[1] for s in samples) / raw,
+                    "throughput_mb_s": self._throughput(level, bandwidth) / 1048576.0,
+                }
+            return {
+                "level": self.level,
+                "disk_mb_s": None if bandwidth is None else bandwidth / 1048576.0,
+                "levels": levels,
+            }
+
+    def report(self) -> str:
+        s = self.stats()
+        disk = "unknown" if s["disk_mb_s"] is None else f"{s['disk_mb_s']:.1f}MB/s"
+        levels = ", ".join(f"{level}: {m['throughput_mb_s']:.1f}MB/s x{m['ratio']:.2f}" for level, m in s["levels"].items())
+        return f"PNG autotune level {s['level']}, disk {disk}, throughput by level {{{levels}}}"
+
+
+_tuners = {}
+_lock = threading.Lock()
+
+
+def get_tuner(directory: str, parallelism: int = None) -> PngAutotuner:
+    """每个保存目录一个调节器，本地磁盘与网络共享分别测量；parallelism 为同时编码的帧数上限"""
+    directory = os.path.abspath(directory)
+    with _lock:
+        tuner = _tuners.get(directory)
+        if tuner is None:
+            tuner = _tuners[directory] = PngAutotuner()
+        if parallelism is not None:
+            tuner.parallelism = parallelism
+        return tuner
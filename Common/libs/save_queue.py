@@ -0,0 +1,242 @@
+"""
+后台保存队列
+
+保存节点只在执行线程中把整批图像转换为 uint8 快照并分配文件名，编码、写文件与写标签都交给共享线程池完成，
+下一个 prompt 不必等待磁盘。队列中待保存的帧数有上限 (环境变量 SMELL_SAVE_QUEUE_SIZE，默认 8)，
+队列已满时提交会阻塞，避免快照无限堆积占用内存；进程退出时会等待队列写完。
+"""
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import wait
+
+from PIL import Image
+
+from .file_index import claim_file_path
+from .function import log
+from .image_encoders import get_encoder
+from .png_autotune import get_tuner
+from .thread_pool import max_workers, submit
+
+_max_pending = int(os.environ.get("SMELL_SAVE_QUEUE_SIZE", 8))
+
+
+class SaveQueue:
+    def __init__(self, max_pending: int):
+        self.max_pending = max(1, int(max_pending))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._groups = {}  # 分组 (保存目录) -> 未完成任务的序号
+        self.submitted = 0  # 已提交的任务数，即最后一个任务的序号
+        self.saved = 0
+        self.failed = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.blocked = 0
+
+    def depth(self) -> int:
+        with self._idle:
+            return self._pending
+
+    def put(self, fn, *args, group=None, **kwargs):
+        """
+        提交一个保存任务，fn 返回 (编码耗时, 写入耗时) 秒；group (如保存目录) 用于 flush 只等待其中的任务
+
+        队列已满时阻塞到有任务完成 (背压)，阻塞次数与时间计入 blocked / wait_seconds。
+        """
+        start = time.perf_counter()
+        blocked = not self._slots.acquire(blocking=False)
+        if blocked:
+            self._slots.acquire()
+        with self._idle:
+            if blocked:
+                self.blocked += 1
+                self.wait_seconds += time.perf_counter() - start
+            self._pending += 1
+            self.submitted += 1
+            ticket = self.submitted
+            self._groups.setdefault(group, set()).add(ticket)
+        try:
+            return submit(self._run, fn, args, kwargs, group, ticket)
+        except Exception:
+            self._finish(group, ticket)
+            raise
+
+    def _run(self, fn, args, kwargs, group=None, ticket=None) -> bool:
+        """执行保存任务，返回是否成功 (失败只记录日志，不抛到线程池)"""
+        try:
+            encode_seconds, write_seconds = fn(*args, **kwargs)
+            with self._idle:
+                self.saved += 1
+                self.encode_seconds += encode_seconds
+                self.write_seconds += write_seconds
+            return True
+        except Exception as e:
+            with self._idle:
+                self.failed += 1
+            log(f"Save failed: {e}", message_type='error')
+            return False
+        finally:
+            self._finish(group, ticket)
+
+    def _finish(self, group, ticket):
+        self._slots.release()
+        with self._idle:
+            self._pending -= 1
+            self._groups[group].discard(ticket)
+            if not self._groups[group]:
+                del self._groups[group]
+            self._idle.notify_all()
+
+    def flush(self, timeout: float = None, group=None, upto: int = None) -> bool:
+        """
+        等待队列中的任务全部完成，超时返回 False
+
+        指定 group 时只等待该分组；指定 upto (之前读取的 submitted) 时只等待在那之前提交的任务，
+        不受之后持续提交的任务影响。
+        """
+        def done():
+            if group is None and upto is None:
+                return self._pending == 0
+            limit = self.submitted if upto is None else upto
+            groups = [self._groups.get(group, ())] if group is not None else self._groups.values()
+            return not any(ticket <= limit for tickets in groups for ticket in tickets)
+
+        with self._idle:
+            return self._idle.wait_for(done, timeout)
+
+    def stats(self) -> dict:
+        with self._idle:
+            done = max(1, self.saved)
+            return {
+                "depth": self._pending,
+                "max_pending": self.max_pending,
+                "saved": self.saved,
+                "failed": self.failed,
+                "encode_ms": self.encode_seconds * 1000.0 / done,
+                "write_ms": self.write_seconds * 1000.0 / done,
+                "wait_ms": self.wait_seconds * 1000.0,
+                "blocked": self.blocked,
+            }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"Save queue depth {s['depth']}/{s['max_pending']}, saved {s['saved']}, failed {s['failed']}, "
+                f"encode {s['encode_ms']:.1f}ms, write {s['write_ms']:.1f}ms per image, backpressure wait {s['wait_ms']:.0f}ms over {s['blocked']} saves")
+
+
+class SaveBatch:
+    """一次 queue_image_batch 提交的保存任务，autotune 为 PNG 自动调节器的状态 (未使用时为 None)"""
+
+    def __init__(self, queue: SaveQueue, futures: list, autotune: dict = None):
+        self.queue = queue
+        self.futures = futures
+        self.autotune = autotune
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待本批保存完成，超时返回 False"""
+        return not wait(self.futures, timeout).not_done
+
+    def status(self) -> dict:
+        """本批已保存 / 失败 / 未完成的帧数，以及队列启动以来失败的总数"""
+        done = [future for future in self.futures if future.done()]
+        failed = sum(1 for future in done if not future.result())
+        return {
+            "queued": len(self.futures),
+            "saved": len(done) - failed,
+            "failed": failed,
+            "pending": len(self.futures) - len(done),
+            "failed_total": self.queue.stats()["failed"],
+        }
+
+
+_queue = None
+_lock = threading.Lock()
+
+
+def get_save_queue() -> SaveQueue:
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = SaveQueue(_max_pending)
+        return _queue
+
+
+def save_frame(frame, encoder, image_path, txt_path=None, tags=None, pnginfo=None, preset="balanced", quality=None, level=None, tuner=None):
+    """
+    编码 uint8 帧 [H, W, C] 并写入 image_path，tags 非空时写入 txt_path；返回 (编码耗时, 写入耗时) 秒
+
+    tuner 不为 None 时写入后 fsync，并把本次的级别、字节数与耗时记录到 PNG 自动调节器。编码、写入或写标签失败时删除 image_path (与 txt_path) 后重新抛出。
+    """
+    start = time.perf_counter()
+    try:
+        if frame.ndim == 3 and frame.shape[-1] == 1:
+            frame = frame[..., 0]
+        data = encoder.encode(Image.fromarray(frame), preset, quality, level, pnginfo=pnginfo)
+        encoded = time.perf_counter()
+        with open(image_path, 'wb') as f:
+            f.write(data)
+            if tuner is not None:
+                # 自动调节需要磁盘带宽，不计 fsync 时测得的只是页缓存的写入速度
+                f.flush()
+                os.fsync(f.fileno())
+        written = time.perf_counter()
+        if tags:
+            # 不使用 smell_write_text_file: 它吞掉写入错误，标签缺失的帧会被计为保存成功
+            with open(txt_path, 'w', encoding="utf-8", newline='\n') as f:
+                f.write(tags)
+    except Exception:
+        # 分配文件名时独占创建的占位文件 (或写了一半的文件) 不能留在目录中，标签写入失败时图像也一并删除，
+        # 目录中的文件与失败计数一致
+        for path in (image_path, txt_path if tags else None):
+            try:
+                if path:
+                    os.remove(path)
+            except OSError:
+                pass
+        raise
+    if tuner is not None:
+        tuner.record(level, frame.nbytes, len(data), encoded - start, written - encoded)
+    return encoded - start, written - encoded
+
+
+def queue_image_batch(frames, directory, filename_prefix, file_max, tags=None, pnginfo=None, encoder="png", preset="balanced", quality=None) -> SaveBatch:
+    """
+    为每一帧分配文件名并提交后台保存，encoder 为 image_encoders.ENCODERS 中的编码器名，返回 SaveBatch
+
+    文件名在调用线程中按顺序分配 (分配时即独占创建空文件，后台写完之前后续分配不会重复)；
+    目录需要轮转备份时先等待队列中该目录在分配之前提交的保存写完，避免移走尚未写入的文件
+    (之后提交的保存属于另一个范围，不必等待，持续保存时轮转也能完成)。
+    preset 为 "autotune" 时 PNG 的压缩级别由该目录的自动调节器逐帧选择 (其它格式按 balanced)。
+    队列出现背压或失败时记录一次队列状态。
+    """
+    queue = get_save_queue()
+    # 同时编码的帧数受线程池与队列长度两者限制
+    tuner = get_tuner(directory, min(max_workers(), queue.max_pending)) if preset == "autotune" and encoder == "png" else None
+    if preset == "autotune":
+        preset = "balanced"
+    encoder = get_encoder(encoder)
+    group = os.path.abspath(directory)
+    before = queue.stats()
+    futures = []
+    for frame in frames:
+        upto = queue.submitted
+        image_path, txt_path = claim_file_path(directory, filename_prefix, encoder.extension, file_max,
+                                               before_backup=lambda upto=upto: queue.flush(group=group, upto=upto))
+        level = None if tuner is None else tuner.choose()
+        futures.append(queue.put(save_frame, frame, encoder, image_path, txt_path, tags, pnginfo, preset, quality, level, tuner, group=group))
+    after = queue.stats()
+    if after["failed"] > before["failed"] or after["blocked"] > before["blocked"]:
+        log(queue.report(), message_type='warning')
+    return SaveBatch(queue, futures, None if tuner is None else tuner.stats())
+
+
+@atexit.register
+def _flush_at_exit():
+    if _queue is not None and _queue.depth():
+        log(f"Waiting for {_queue.depth()} pending saves")
+        _queue.flush()
+        log(_queue.report(), message_type='finish')
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+import folder_paths
+
+from .function import log
+
+
+def content_digest(images) -> str:
+    """
+    批次内容的 blake2b 摘要 (包含形状与 dtype)
+
+    images 可以是 tensor，也可以是 tensor 列表 (SEGS 等尺寸不一的批次)。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for tensor in (images if isinstance(images, (list, tuple)) else [images]):
+        tensor = tensor.detach().contiguous().cpu()
+        h.update(f"{tuple(tensor.shape)}|{tensor.dtype}|".encode())
+        h.update(tensor.reshape(-1).view(torch.uint8).numpy())
+    return h.hexdigest()
+
+
+def _default_path():
+    get_user_directory = getattr(folder_paths, "get_user_directory", None)
+    directory = get_user_directory() if get_user_directory else folder_paths.base_path
+    return os.path.join(directory, "smell_chooser_history.json")
+
+
+class SelectionHistory:
+    """
+    以 (节点 id, 输入批次内容摘要) 为键的选择记录，持久化到磁盘，按 LRU 限制条目数
+
+    重新运行工作流、生成的图像与之前逐字节相同时，"Repeat last selection" 直接复用之前的选择，
+    不再暂停也不再生成预览。
+
+    默认值可通过环境变量配置:
+        SMELL_CHOOSER_HISTORY       记录文件路径，默认 ComfyUI user 目录下 smell_chooser_history.json
+        SMELL_CHOOSER_HISTORY_SIZE  最多保留的条目数，默认 1000
+    """
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or os.environ.get("SMELL_CHOOSER_HISTORY") or None
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("SMELL_CHOOSER_HISTORY_SIZE", 1000))
+        self._entries = None  # 首次使用时从磁盘加载
+        self._lock = threading.Lock()
+
+    digest = staticmethod(content_digest)
+
+    def _load(self):
+        # 调用方必须已持有 self._lock
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        if self.path is None:
+            self.path = _default_path()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for key, selections in json.load(f).get("entries", []):
+                    self._entries[key] = [int(x) for x in selections]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            log(f"SelectionHistory: ignored unreadable history '{self.path}': {e}", message_type='warning')
+
+    def _save(self):
+        # 调用方必须已持有 self._lock；先写临时文件再替换，避免中断时留下损坏的记录
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": 1, "entries": list(self._entries.items())}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log(f"SelectionHistory: failed to save '{self.path}': {e}", message_type='error')
+
+    def get(self, id, digest):
+        key = f"{id}:{digest}"
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return list(self._entries[key])
+
+    def put(self, id, digest, selections):
+        key = f"{id}:{digest}"
+        with self._lock:
+            self._load()
+            self._entries[key] = [int(x) for x in selections]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
@@ -0,0 +1,64 @@
+"""
+共享线程池
+
+PIL 的 resize / paste / 编码以及 numpy 的大块运算都会释放 GIL，逐张处理批次时放进线程池可以接近线性地利用多核。
+所有节点与预览编码共用同一个线程池，避免每个模块各自创建线程。
+
+线程数可通过环境变量 SMELL_THREAD_POOL_WORKERS 配置，默认为 CPU 核数；设为 1 时所有任务在调用线程中顺序执行。
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .function import log
+
+_pool = None
+_max_workers = int(os.environ.get("SMELL_THREAD_POOL_WORKERS", 0)) or (os.cpu_count() or 1)
+_lock = threading.Lock()
+
+
+def max_workers() -> int:
+    return _max_workers
+
+
+def configure(workers: int):
+    """修改线程数；已创建的线程池在其任务完成后关闭，下次使用时按新的线程数重建"""
+    global _pool, _max_workers
+    with _lock:
+        _max_workers = max(1, int(workers))
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix="smell_worker")
+        return _pool
+
+
+def submit(fn, *args, **kwargs):
+    return get_pool().submit(fn, *args, **kwargs)
+
+
+def map_ordered(fn, items, *args, **kwargs) -> list:
+    """
+    对 items 中每一项并行调用 fn(item, *args, **kwargs)，按输入顺序返回结果列表
+
+    只有一项、线程数为 1 或已在线程池任务内部 (避免线程互相等待而死锁) 时直接在当前线程中顺序执行；
+    任一任务抛出的异常会在这里重新抛出。
+    """
+    items = list(items)
+    if len(items) <= 1 or _max_workers <= 1 or threading.current_thread().name.startswith("smell_worker"):
+        return [fn(item, *args, **kwargs) for item in items]
+    pool = get_pool()
+    futures = [pool.submit(fn, item, *args, **kwargs) for item in items]
+    try:
+        return [future.result() for future in futures]
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        log(f"map_ordered: {getattr(fn, '__name__', fn)} failed: {e}", message_type='error')
+        raise
@@ -0,0 +1,164 @@
+"""
+分块缩放
+
+整批 interpolate 需要同时持有输入的 float 副本与完整的输出，8K 以上的图像峰值内存会达到图像本身的数倍。
+这里先分配最终输出，再按输出的行带逐带处理: 每一带只取滤波器覆盖到的源图像行 (带与带之间按滤波支撑重叠)，
+水平方向用 interpolate 缩放 (高度不变时是恒等映射)，垂直方向用与 interpolate 相同的权重矩阵相乘，
+因此接缝处与整图缩放的结果一致，额外内存只与带高有关。
+
+额外内存上限可通过环境变量 SMELL_RESIZE_BUDGET_MB 配置 (默认 512MB)，设为 0 时不分块。
+"""
+import math
+import os
+
+import torch
+import torch.nn.functional as TF
+
+from .canvas import new_canvas
+from .function import log
+
+_budget_mb = int(os.environ.get("SMELL_RESIZE_BUDGET_MB", 512))
+
+
+def budget_bytes() -> int:
+    return _budget_mb * 1024 * 1024
+
+
+def configure(budget_mb: int):
+    """修改额外内存上限 (MB)，0 表示不分块"""
+    global _budget_mb
+    _budget_mb = max(0, int(budget_mb))
+
+
+def resize_cost(images: torch.Tensor, width: int, height: int) -> int:
+    """整批一次缩放时输入 float 副本与输出占用的字节数 (估计值)"""
+    channels = 1 if images.dim() == 3 else images.shape[-1]
+    return images.shape[0] * channels * 4 * (images.shape[1] * images.shape[2] + width * height)
+
+
+def needs_tiling(images: torch.Tensor, width: int, height: int, budget: int = None) -> bool:
+    budget = budget_bytes() if budget is None else budget
+    return budget > 0 and resize_cost(images, width, height) > budget
+
+
+def _cubic(x: torch.Tensor, a: float) -> torch.Tensor:
+    """三次卷积核 (Keys)"""
+    x = x.abs()
+    near = ((a + 2) * x - (a + 3)) * x * x + 1
+    far = ((a * x - 5 * a) * x + 8 * a) * x - 4 * a
+    return torch.where(x <= 1, near, torch.where(x < 2, far, torch.zeros_like(x)))
+
+
+def _triangle(x: torch.Tensor) -> torch.Tensor:
+    return (1 - x.abs()).clamp_(min=0)
+
+
+def axis_weights(in_size: int, out_size: int, mode: str, antialias: bool = False):
+    """
+    一维缩放的取样位置与权重，与 interpolate (align_corners=False) 的计算方式相同
+
+    返回 (index, weight)，形状都是 [out_size, K]，输出第 i 个像素 = sum(weight[i] * input[index[i]])。
+    """
+    scale = in_size / out_size
+    i = torch.arange(out_size, dtype=torch.float64)
+    if mode in ("nearest", "nearest-exact"):
+        # 与 interpolate 一样以 float32 计算取样位置，用 float64 时在整数边界附近会取到相邻的像素
+        scale32 = torch.tensor(in_size, dtype=torch.float32) / out_size
+        i32 = i.float()
+        src = i32 * scale32 if mode == "nearest" else (i32 + 0.5) * scale32
+        index = src.floor().long().clamp_(max=in_size - 1).unsqueeze(1)
+        return index, torch.ones(index.shape, dtype=torch.float64)
+    if mode == "area":
+        start = (i * in_size / out_size).floor().long()
+        end = ((i + 1) * in_size / out_size).ceil().long()
+        taps = int((end - start).max())
+        index = start.unsqueeze(1) + torch.arange(taps)
+        weight = (index < end.unsqueeze(1)).double() / (end - start).unsqueeze(1).double()
+        return index.clamp_(max=in_size - 1), weight
+    if mode not in ("bilinear", "bicubic"):
+        raise ValueError(f"Unsupported resize mode '{mode}'")
+
+    if antialias:
+        # 与 PIL / torch 的抗锯齿实现相同: 缩小时滤波器按比例展宽，bicubic 使用 a = -0.5
+        interp_size = 2 if mode == "bilinear" else 4
+        support = interp_size / 2 * scale if scale >= 1 else interp_size / 2
+        inv_scale = 1 / scale if scale >= 1 else 1.0
+        center = scale * (i + 0.5)
+        xmin = (center - support + 0.5).trunc().long().clamp_(min=0)
+        xmax = (center + support + 0.5).trunc().long().clamp_(max=in_size)
+        taps = int((xmax - xmin).max())
+        j = torch.arange(taps)
+        index = xmin.unsqueeze(1) + j
+        x = (index.double() - center.unsqueeze(1) + 0.5) * inv_scale
+        weight = _triangle(x) if mode == "bilinear" else _cubic(x, -0.5)
+        weight = weight * (index < xmax.unsqueeze(1))
+        weight = weight / weight.sum(dim=1, keepdim=True)
+        return index.clamp_(max=in_size - 1), weight
+
+    src = (i + 0.5) * scale - 0.5
+    if mode == "bilinear":
+        src = src.clamp(min=0)
+        low = src.floor()
+        frac = (src - low).unsqueeze(1)
+        index = low.long().unsqueeze(1) + torch.arange(2)
+        weight = torch.cat([1 - frac, frac], dim=1)
+        return index.clamp_(max=in_size - 1), weight
+    low = src.floor()
+    t = (src - low).unsqueeze(1)
+    index = low.long().unsqueeze(1) + torch.arange(-1, 3)
+    weight = _cubic(t - torch.arange(-1, 3, dtype=torch.float64), -0.75)
+    return index.clamp_(0, in_size - 1), weight
+
+
+def tiled_resize_batch(images: torch.Tensor, width: int, height: int, mode: str = "nearest-exact", antialias: bool = False, budget: int = None, out: torch.Tensor = None) -> torch.Tensor:
+    """
+    与 resize_batch 结果相同的分块缩放，[B, H, W, C] 图像或 [B, H, W] 掩膜
+
+    输出预先分配 (或写入 out，如更大画布中的一块视图)，逐个行带写入；每带的额外内存 (源行带的 float 副本、
+    水平缩放结果、输出带) 不超过 budget (默认为 SMELL_RESIZE_BUDGET_MB)，预算连一行都放不下时按一行处理。
+    """
+    budget = budget_bytes() if budget is None else budget
+    is_mask = images.dim() == 3
+    B, H, W = images.shape[0], images.shape[1], images.shape[2]
+    channels = 1 if is_mask else images.shape[-1]
+    if out is None:
+        output = new_canvas(B, height, width, None if is_mask else channels, None, images.dtype, images.device)
+    elif tuple(out.shape) != ((B, height, width) if is_mask else (B, height, width, channels)):
+        raise ValueError(f"tiled_resize_batch: out has shape {tuple(out.shape)}, expected {(B, height, width)} with {channels} channels")
+    else:
+        output = out
+
+    index, weight = axis_weights(H, height, mode, antialias)
+    taps = index.shape[1] + 1
+    row_bytes = B * channels * 4
+    scale = H / height
+    if budget <= 0:
+        band = height  # 预算为 0 表示不分块
+    else:
+        band = (budget / row_bytes - taps * (W + width)) / (scale * (W + width) + 2 * width)
+    band = max(1, min(height, int(band)))
+    if band < height:
+        log(f"Tiled resize {W}x{H} -> {width}x{height}: {math.ceil(height / band)} bands of {band} rows", message_type='info')
+
+    kwargs = {} if mode.startswith("nearest") or mode == "area" else {"align_corners": False, "antialias": antialias}
+    device = images.device
+    for top in range(0, height, band):
+        bottom = min(height, top + band)
+        rows = index[top:bottom]
+        first, last = int(rows.min()), int(rows.max()) + 1
+
+        # 垂直方向的带权重矩阵，边界处重复的取样位置累加到同一列
+        matrix = torch.zeros((bottom - top, last - first), dtype=torch.float64)
+        matrix.scatter_add_(1, rows - first, weight[top:bottom])
+        matrix = matrix.to(device=device, dtype=torch.float32)
+
+        source = images[:, first:last]
+        source = source.unsqueeze(1) if is_mask else source.movedim(-1, 1)
+        source = source.float()
+        if W != width:
+            source = TF.interpolate(source, size=(last - first, width), mode=mode, **kwargs)
+        rows_out = torch.matmul(matrix, source)  # [B, C, bottom - top, width]
+        if mode == "bicubic":
+            rows_out.clamp_(0.0, 1.0)
+        output[:, top:bottom] = rows_out.squeeze(1) if is_mask else rows_out.movedim(1, -1)
+    return output
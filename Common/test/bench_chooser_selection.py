@@ -0,0 +1,57 @@
+"""
+ImageChooser 选择引擎基准测试
+
+对比旧版 tensor_bundle (逐帧 unsqueeze_ + torch.cat + reshape) 与 libs.chooser_selection
+在 64 帧以上批次上的耗时。
+
+    python Common/test/bench_chooser_selection.py
+"""
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.chooser_selection import choose_indices, select_tensor
+
+REPEAT = 20
+
+
+def legacy_tensor_bundle(tensor_in, picks):
+    if tensor_in is not None and len(picks):
+        batch = tensor_in.shape[0]
+        return torch.cat(tuple([tensor_in[(x) % batch].unsqueeze_(0) for x in picks])).reshape([-1] + list(tensor_in.shape[1:]))
+    return None
+
+
+def timeit(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000.0
+
+
+def main():
+    cases = [
+        ("Pass through", []),
+        ("Take First n", []),
+        ("Take Last n", []),
+        ("Always pause", None),
+    ]
+    for batch in (64, 128):
+        images = torch.rand(batch, 512, 512, 3)
+        for mode, selections in cases:
+            if selections is None:
+                selections = list(range(0, batch, 3)) + [-1, 1]
+            chosen = choose_indices(mode, batch, batch // 2, selections)
+            assert torch.equal(select_tensor(images, chosen), legacy_tensor_bundle(images, chosen))
+            legacy = timeit(lambda: legacy_tensor_bundle(images, chosen))
+            engine = timeit(lambda: select_tensor(images, chosen))
+            print(f"batch={batch:4} {mode:>14}: legacy={legacy:8.3f}ms engine={engine:8.3f}ms speedup={legacy / max(engine, 1e-6):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+ImageChooser 选择消息往返延迟基准测试
+
+测量从 POST /image_chooser_message 到执行线程中 MessageHolder.waitForMessage 返回
+(即 ImageChooser.chooser 恢复执行) 的时间，并与旧版 100ms 轮询实现对比。
+
+需要在 ComfyUI 根目录下运行 (依赖 server / aiohttp):
+    python custom_nodes/ComfyUI_Custom_Nodes_Smell/Common/test/bench_image_chooser_message.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+from aiohttp import web, ClientSession
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.image_chooser_server import MessageHolder, make_image_selection
+
+ROUNDS = 200
+
+
+def legacy_wait_for_message(id, period=0.1):
+    """旧版实现: 每 period 秒轮询一次类字典 (表单消息不带 client_id / prompt_id)"""
+    key = (None, None, str(id))
+    while key not in MessageHolder.messages:
+        time.sleep(period)
+    return MessageHolder.messages.pop(key)
+
+
+async def measure(session, url, waiter, node_id):
+    resumed = {}
+
+    def executor():
+        waiter(node_id)
+        resumed["t"] = time.perf_counter()
+
+    thread = threading.Thread(target=executor)
+    thread.start()
+    # 等待执行线程进入等待状态
+    await asyncio.sleep(0.005)
+    start = time.perf_counter()
+    async with session.post(url, data={"id": node_id, "message": "0,-1"}) as resp:
+        await resp.read()
+    while thread.is_alive():
+        await asyncio.sleep(0)
+    return (resumed["t"] - start) * 1000.0
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/image_chooser_message", make_image_selection)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/image_chooser_message"
+
+    waiters = {
+        "event": lambda node_id: MessageHolder.waitForMessage(node_id, asList=True),
+        "legacy poll": legacy_wait_for_message,
+    }
+    async with ClientSession() as session:
+        for name, waiter in waiters.items():
+            rounds = ROUNDS if name == "event" else ROUNDS // 10
+            samples = [await measure(session, url, waiter, str(i)) for i in range(rounds)]
+            samples.sort()
+            print(f"{name:>12}: rounds={rounds} median={statistics.median(samples):.3f}ms "
+                  f"p95={samples[int(len(samples) * 0.95) - 1]:.3f}ms max={samples[-1]:.3f}ms")
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
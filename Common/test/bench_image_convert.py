@@ -0,0 +1,70 @@
+"""
+tensor / PIL / numpy 转换基准测试
+
+对比旧版 image_function 中的转换 (逐像素 tolist、float32 乘除与 astype) 与 libs/image_convert
+在 2048x2048 掩膜和图像上的耗时:
+    python custom_nodes/ComfyUI_Custom_Nodes_Smell/Common/test/bench_image_convert.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.image_convert import tensor2pil, tensor2np, pil2tensor, image2mask
+
+SIZE = 2048
+ROUNDS = 5
+
+
+def legacy_pil2tensor(image):
+    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
+
+
+def legacy_tensor2pil(t_image):
+    return Image.fromarray(np.clip(255.0 * t_image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
+
+
+def legacy_tensor2np(tensor):
+    return [np.clip(255.0 * t.cpu().numpy(), 0, 255).astype(np.uint8) for t in tensor]
+
+
+def legacy_image2mask(image):
+    return torch.tensor([legacy_pil2tensor(image)[0, :, :].tolist()])
+
+
+def best_ms(fn, rounds=ROUNDS):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    mask = torch.rand((1, SIZE, SIZE))
+    image = torch.rand((1, SIZE, SIZE, 3))
+    batch = torch.rand((8, 512, 512, 3))
+    mask_pil = legacy_tensor2pil(mask)
+    image_pil = legacy_tensor2pil(image)
+
+    cases = [
+        (f"image2mask {SIZE}x{SIZE} L", lambda: legacy_image2mask(mask_pil), lambda: image2mask(mask_pil), 1),
+        (f"tensor2pil {SIZE}x{SIZE} mask", lambda: legacy_tensor2pil(mask), lambda: tensor2pil(mask), ROUNDS),
+        (f"tensor2pil {SIZE}x{SIZE} RGB", lambda: legacy_tensor2pil(image), lambda: tensor2pil(image), ROUNDS),
+        (f"pil2tensor {SIZE}x{SIZE} RGB", lambda: legacy_pil2tensor(image_pil), lambda: pil2tensor(image_pil), ROUNDS),
+        ("tensor2np 8x512x512 RGB", lambda: legacy_tensor2np(batch), lambda: tensor2np(batch), ROUNDS),
+    ]
+    for name, legacy, current, rounds in cases:
+        old = best_ms(legacy, rounds)
+        new = best_ms(current)
+        print(f"{name:>28}: legacy {old:9.2f}ms  new {new:8.2f}ms  x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+ImagePad 基准测试
+
+对比 64x256x256 批次上旧版逐张循环的边缘填充与当前实现，以及各填充模式的耗时 (需要在 ComfyUI 环境中运行):
+    python custom_nodes/ComfyUI_Custom_Nodes_Smell/Common/test/bench_image_pad.py
+"""
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ImageFunctionNode import ImagePad
+
+BATCH, SIZE, PAD = 64, 256, 32
+ROUNDS = 3
+
+
+def legacy_edge_pad(image, pad_left, pad_right, pad_top, pad_bottom):
+    B, H, W, C = image.shape
+    out_image = torch.zeros((B, H + pad_top + pad_bottom, W + pad_left + pad_right, C), dtype=image.dtype)
+    out_masks = torch.ones((B, H + pad_top + pad_bottom, W + pad_left + pad_right))
+    for b in range(B):
+        out_image[b, :pad_top, :, :] = image[b, 0, :, :].mean(dim=0)
+        out_image[b, pad_top+H:, :, :] = image[b, H-1, :, :].mean(dim=0)
+        out_image[b, :, :pad_left, :] = image[b, :, 0, :].mean(dim=0)
+        out_image[b, :, pad_left+W:, :] = image[b, :, W-1, :].mean(dim=0)
+        out_image[b, pad_top:pad_top+H, pad_left:pad_left+W, :] = image[b]
+        out_masks[b, pad_top:pad_top+H, pad_left:pad_left+W] = 0.0
+    return out_image, out_masks
+
+
+def best_ms(fn, rounds=ROUNDS):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    image_pad = ImagePad()
+    image = torch.rand((BATCH, SIZE, SIZE, 3))
+    legacy = best_ms(lambda: legacy_edge_pad(image, PAD, PAD, PAD, PAD))
+    print(f"{'edge (per-image loop)':>24}: {legacy:8.1f}ms")
+    for pad_mode in ("edge", "color", "reflect", "replicate", "circular"):
+        elapsed = best_ms(lambda: image_pad.pad(
+            image=image, left=PAD, right=PAD, top=PAD, bottom=PAD, extra_padding=0,
+            color="255, 0, 0", pad_mode=pad_mode
+        ))
+        print(f"{pad_mode:>24}: {elapsed:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
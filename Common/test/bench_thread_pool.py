@@ -0,0 +1,38 @@
+"""
+共享线程池下 PIL 重采样的扩展性基准测试
+
+对 8 / 32 / 64 张图像调用 fit_resize_images (lanczos letterbox)，比较不同线程数的耗时:
+    python custom_nodes/ComfyUI_Custom_Nodes_Smell/Common/test/bench_thread_pool.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs import thread_pool
+from libs.image_function import fit_resize_images
+
+
+def main():
+    rng = np.random.default_rng(0)
+    source = [Image.fromarray(rng.integers(0, 255, (1200, 1800, 3), dtype=np.uint8)) for _ in range(8)]
+    cores = os.cpu_count() or 1
+    workers_list = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    for count in (8, 32, 64):
+        images = [source[i % len(source)] for i in range(count)]
+        baseline = None
+        for workers in workers_list:
+            thread_pool.configure(workers)
+            start = time.perf_counter()
+            fit_resize_images(images, 768, 768, 'letterbox', Image.LANCZOS)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{count:>3} images, {workers:>2} workers: {elapsed * 1000:8.1f}ms  speedup x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
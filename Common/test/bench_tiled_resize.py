@@ -0,0 +1,46 @@
+"""
+分块缩放基准测试
+
+在子进程中分别用整图 interpolate 与 libs/tiled_resize 缩放 8K 图像，对比耗时与峰值内存 (ru_maxrss) 的增量:
+    python custom_nodes/ComfyUI_Custom_Nodes_Smell/Common/test/bench_tiled_resize.py
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SOURCE = (7680, 4320)
+TARGET = (3840, 2160)
+BUDGET_MB = 128
+
+
+def run(tiled: bool):
+    from libs import tiled_resize
+    from libs.image_compose import resize_batch
+
+    image = torch.rand((1, SOURCE[1], SOURCE[0], 3))
+    tiled_resize.configure(BUDGET_MB if tiled else 0)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    resize_batch(image, TARGET[0], TARGET[1], "bicubic", True)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    print(f"{'tiled' if tiled else 'whole':>6}: {elapsed * 1000.0:8.1f}ms  peak +{peak / 1024:7.1f}MB")
+
+
+def main():
+    if len(sys.argv) > 1:
+        run(sys.argv[1] == "tiled")
+        return
+    print(f"bicubic {SOURCE[0]}x{SOURCE[1]} -> {TARGET[0]}x{TARGET[1]}, budget {BUDGET_MB}MB")
+    for mode in ("whole", "tiled"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
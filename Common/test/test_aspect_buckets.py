@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.aspect_buckets import COMMON_ASPECT_RATIOS, UNCOMMON_ASPECT_RATIOS, BucketTable, parse_ratios
+
+
+class TestAspectBuckets(unittest.TestCase):
+
+    def test_parse_ratios(self):
+        self.assertEqual(parse_ratios("common"), COMMON_ASPECT_RATIOS)
+        self.assertEqual(len(parse_ratios(" ALL ")), len(COMMON_ASPECT_RATIOS) + len(UNCOMMON_ASPECT_RATIOS))
+        self.assertEqual(parse_ratios("1:1, 16:9\n1.85:1"), {"1:1": (1.0, 1.0), "16:9": (16.0, 9.0), "1.85:1": (1.85, 1.0)})
+        for text in ("", "16x9", "0:1", "1:2:3"):
+            with self.assertRaises(ValueError, msg=text):
+                parse_ratios(text)
+
+    def test_bucket_sizes(self):
+        table = BucketTable(parse_ratios("1:1, 16:9, 2:3"), 1024, 64)
+        self.assertEqual(table.names, ["1:1", "16:9", "2:3"])
+        # 最长边为 max_length，短边取最接近的 64 的倍数
+        self.assertEqual(table.sizes, [(1024, 1024), (1024, 576), (704, 1024)])
+        self.assertEqual(len(table), 3)
+
+    def test_max_length_rounded_to_multiple(self):
+        table = BucketTable(parse_ratios("1:1, 3:1"), 1000, 64)
+        self.assertEqual(table.sizes, [(960, 960), (960, 320)])
+
+    def test_assign_and_group(self):
+        table = BucketTable(parse_ratios("1:1, 16:9, 2:3"), 512)
+        sizes = [(1920, 1080), (500, 510), (400, 600), (1280, 700), (300, 1000)]
+        self.assertEqual(table.assign(sizes).tolist(), [1, 0, 2, 1, 2])
+        self.assertEqual(table.group(sizes), {0: [1], 1: [0, 3], 2: [2, 4]})
+        self.assertEqual(table.group([]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.canvas import canvas_like, new_canvas, rgb_fill
+
+
+class TestCanvas(unittest.TestCase):
+
+    def test_scalar_fill(self):
+        canvas = new_canvas(2, 4, 5, 3, 0.25, torch.float16)
+        self.assertEqual(tuple(canvas.shape), (2, 4, 5, 3))
+        self.assertEqual(canvas.dtype, torch.float16)
+        self.assertTrue(torch.all(canvas == 0.25))
+        mask = new_canvas(2, 4, 5, fill=1.0)
+        self.assertEqual(tuple(mask.shape), (2, 4, 5))
+
+    def test_colour_fill_pads_alpha(self):
+        canvas = new_canvas(1, 2, 2, 4, (0.1, 0.2, 0.3))
+        self.assertTrue(torch.allclose(canvas[0, 1, 1], torch.tensor([0.1, 0.2, 0.3, 1.0])))
+        self.assertTrue(canvas.is_contiguous())
+        with self.assertRaises(ValueError):
+            new_canvas(1, 2, 2, None, (0.1, 0.2, 0.3))
+
+    def test_colour_canvas_is_writable(self):
+        canvas = new_canvas(2, 4, 4, 3, (1.0, 0.0, 0.0))
+        self.assertTrue(canvas.is_contiguous())
+        canvas[0, 0, 0] = 0.5
+        self.assertEqual(float(canvas[1, 3, 3, 0]), 1.0)
+
+    def test_uninitialised(self):
+        self.assertEqual(tuple(new_canvas(1, 3, 3, 3, None).shape), (1, 3, 3, 3))
+
+    def test_canvas_like(self):
+        image = torch.rand((2, 4, 4, 4), dtype=torch.float64)
+        canvas = canvas_like(image, 6, 7, fill=rgb_fill(255, 0, 0))
+        self.assertEqual(tuple(canvas.shape), (2, 6, 7, 4))
+        self.assertEqual(canvas.dtype, torch.float64)
+        self.assertEqual(canvas[0, 0, 0].tolist(), [1.0, 0.0, 0.0, 1.0])
+        self.assertEqual(tuple(canvas_like(image[..., 0], 6, 7).shape), (2, 6, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
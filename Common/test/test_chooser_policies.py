@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.chooser_policies import AUTO_MODES, POLICIES, auto_select, register_policy, sharpness_score
+
+
+def checkerboard(size, period):
+    y, x = torch.meshgrid(torch.arange(size), torch.arange(size), indexing="ij")
+    return ((x // period + y // period) % 2).float().unsqueeze(-1).expand(size, size, 3)
+
+
+class TestChooserPolicies(unittest.TestCase):
+
+    def setUp(self):
+        # 0: 纯灰  1: 细格 (最清晰)  2: 粗格  3: 低对比度细格
+        self.images = torch.stack([
+            torch.full((32, 32, 3), 0.5),
+            checkerboard(32, 1),
+            checkerboard(32, 8),
+            checkerboard(32, 1) * 0.3 + 0.35,
+        ])
+
+    def test_first_and_last(self):
+        self.assertEqual(auto_select("first n", self.images, 2), [0, 1])
+        self.assertEqual(auto_select("last n", self.images, 3), [1, 2, 3])
+        self.assertEqual(auto_select("first n", self.images, 10), [0, 1, 2, 3])
+
+    def test_sharpest(self):
+        self.assertEqual(auto_select("sharpest n", self.images, 2), [1, 3])
+        self.assertEqual(auto_select("sharpest n", self.images, 10)[0], 1)
+
+    def test_highest_contrast(self):
+        self.assertEqual(sorted(auto_select("highest contrast n", self.images, 2)), [1, 2])
+
+    def test_image_list(self):
+        # 尺寸不一的列表 (SEGS) 逐张计算，结果与整批相同
+        images = [self.images[0], self.images[1][:16, :24], self.images[2]]
+        self.assertEqual(sharpness_score(images).shape, (3,))
+        self.assertEqual(auto_select("sharpest n", images, 1), [1])
+
+    def test_tiny_images(self):
+        # 小于 3x3 卷积核的图像得分为 0，不会让无人值守的队列出错
+        self.assertEqual(sharpness_score(torch.rand((2, 1, 1, 3))).tolist(), [0.0, 0.0])
+        images = [self.images[0], torch.rand((2, 9, 3)), torch.rand((1, 1, 3))]
+        self.assertEqual(sharpness_score(images)[1:].tolist(), [0.0, 0.0])
+        self.assertEqual(auto_select("sharpest n", images, 1), [0])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            auto_select("random n", self.images, 1)
+
+    def test_register_policy(self):
+        register_policy("reverse n", lambda images, count: list(range(len(images)))[::-1][:count], auto_mode="Auto pick reversed n")
+        try:
+            self.assertEqual(auto_select(AUTO_MODES["Auto pick reversed n"], self.images, 2), [3, 2])
+        finally:
+            POLICIES.pop("reverse n")
+            AUTO_MODES.pop("Auto pick reversed n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.chooser_selection import choose_indices, select_items, select_tensor
+
+
+class TestChooserSelection(unittest.TestCase):
+
+    def test_choose_indices(self):
+        self.assertEqual(list(choose_indices("Pass through", 5, 2, [])), [0, 1, 2, 3, 4])
+        self.assertEqual(list(choose_indices("Take First n", 5, 2, [])), [0, 1])
+        self.assertEqual(list(choose_indices("Take First n", 3, 8, [])), [0, 1, 2])
+        self.assertEqual(list(choose_indices("Take Last n", 5, 2, [])), [3, 4])
+        self.assertEqual(list(choose_indices("Take Last n", 3, 8, [])), [0, 1, 2])
+        # 负数是前端的分隔符
+        self.assertEqual(choose_indices("Always pause", 5, 1, [3, -1, 0, 3]), [3, 0, 3])
+
+    def test_contiguous_selection_is_a_view(self):
+        images = torch.rand((6, 4, 4, 3))
+        for chosen in (range(1, 4), [2, 3, 4], [7, 8]):
+            selected = select_tensor(images, chosen)
+            self.assertEqual(selected.data_ptr(), images[chosen[0] % 6].data_ptr())
+            self.assertTrue(torch.equal(selected, images[[x % 6 for x in chosen]]))
+
+    def test_scattered_selection_copies(self):
+        images = torch.rand((6, 4, 4, 3))
+        selected = select_tensor(images, [4, 0, 4, -1])
+        self.assertTrue(torch.equal(selected, images[[4, 0, 4, 5]]))
+        selected.zero_()
+        self.assertNotEqual(float(images[4].sum()), 0.0)  # 从不修改输入
+
+    def test_empty_selection(self):
+        self.assertIsNone(select_tensor(torch.rand((2, 3)), []))
+        self.assertIsNone(select_tensor(None, [0]))
+        self.assertIsNone(select_items(None, [0]))
+        self.assertEqual(select_items([], [0]), [])
+
+    def test_select_items(self):
+        self.assertEqual(select_items(["a", "b", "c"], [2, 0, 4]), ["c", "a", "b"])
+        self.assertEqual(select_items(["a", "b", "c"], range(0, 2)), ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
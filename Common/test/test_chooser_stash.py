@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.chooser_stash import ChooserStash, tensor_nbytes
+
+ENTRY_FLOATS = 100 * 1024  # 每个条目 400KB，预算 1MB 内最多放两个
+
+
+def make_entry(value):
+    return {"images": torch.full((ENTRY_FLOATS,), float(value)), "latents": [None], "count": 1}
+
+
+class TestChooserStash(unittest.TestCase):
+
+    def test_tensor_nbytes(self):
+        entry = {"images": torch.zeros((2, 4, 4, 3)), "latents": [{"samples": torch.zeros((2, 4), dtype=torch.float16)}], "n": 3}
+        self.assertEqual(tensor_nbytes(entry), 2 * 4 * 4 * 3 * 4 + 2 * 4 * 2)
+
+    def test_evicts_least_recently_used(self):
+        stash = ChooserStash(budget_mb=1, spill_dir="")
+        stash.put(1, make_entry(1))
+        stash.put(2, make_entry(2))
+        stash.get(1)  # 1 成为最近使用的条目
+        stash.put(3, make_entry(3))
+        self.assertIn(1, stash)
+        self.assertNotIn(2, stash)
+        self.assertIn(3, stash)
+        self.assertLessEqual(stash.nbytes, stash.budget)
+
+    def test_evicted_versions_dropped(self):
+        stash = ChooserStash(budget_mb=1, spill_dir="")
+        for key in range(50):
+            stash.put(key, make_entry(key))
+        # 丢弃的条目不保留写入序号
+        self.assertIsNone(stash.version(0))
+        self.assertIsNotNone(stash.version(49))
+        self.assertEqual(len(stash._versions), len(stash._entries))
+
+    def test_keeps_single_entry_over_budget(self):
+        stash = ChooserStash(budget_mb=1, spill_dir="")
+        big = {"images": torch.zeros((512 * 1024,))}  # 2MB
+        stash.put("big", big)
+        self.assertIs(stash.get("big"), big)
+
+    def test_replace_updates_size_and_version(self):
+        stash = ChooserStash(budget_mb=1, spill_dir="")
+        stash.put("a", make_entry(1))
+        version = stash.version("a")
+        stash.put("a", make_entry(2))
+        self.assertEqual(stash.nbytes, ENTRY_FLOATS * 4)
+        self.assertGreater(stash.version("a"), version)
+        self.assertIsNone(stash.version("missing"))
+
+    def test_clear_prefix(self):
+        stash = ChooserStash(budget_mb=1, spill_dir="")
+        stash.put("client:1", make_entry(1))
+        stash.put("other:1", make_entry(2))
+        stash.clear("client:")
+        self.assertNotIn("client:1", stash)
+        self.assertIn("other:1", stash)
+        self.assertEqual(stash.nbytes, ENTRY_FLOATS * 4)
+
+    def test_spill_and_restore(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            stash = ChooserStash(budget_mb=1, spill_dir=spill_dir)
+            bf16 = torch.arange(8, dtype=torch.bfloat16)
+            stash.put(1, {"images": torch.full((ENTRY_FLOATS,), 1.0), "extra": (bf16,)})
+            stash.put(2, make_entry(2))
+            stash.put(3, make_entry(3))
+            # 被淘汰的条目写入磁盘，读取时恢复为相同的内容
+            self.assertIn(1, stash)
+            restored = stash.get(1)
+            self.assertTrue(torch.equal(restored["images"], torch.full((ENTRY_FLOATS,), 1.0)))
+            self.assertEqual(restored["extra"][0].dtype, torch.bfloat16)
+            self.assertTrue(torch.equal(restored["extra"][0], bf16))
+            stash.clear()
+            self.assertEqual(os.listdir(spill_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
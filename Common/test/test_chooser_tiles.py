@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.chooser_tiles import TileCache, pick_image, pyramid_levels, render_tile
+
+
+class TestChooserTiles(unittest.TestCase):
+
+    def test_pyramid_levels(self):
+        self.assertEqual(pyramid_levels(256, 256, 256), 1)
+        self.assertEqual(pyramid_levels(257, 100, 256), 2)
+        self.assertEqual(pyramid_levels(1024, 4000, 256), 5)
+
+    def test_pick_image(self):
+        batches = [torch.zeros((2, 4, 4, 3)), torch.ones((3, 4, 4, 3))]
+        self.assertEqual(float(pick_image(batches, 1).sum()), 0.0)
+        self.assertEqual(float(pick_image(batches, 2).mean()), 1.0)
+        self.assertIsNone(pick_image(batches, 5))
+        self.assertIsNone(pick_image(batches, -1))
+        self.assertIsNone(pick_image(None, 0))
+
+    def test_render_tile(self):
+        image = torch.rand((300, 520, 3))
+        # 第 0 层是原图的裁剪，边缘的瓦片按剩余大小裁剪
+        tile = render_tile(image, 0, 2, 1, tile_size=256)
+        self.assertEqual(tile.shape, (300 - 256, 520 - 512, 3))
+        full = render_tile(image, 0, 0, 0, tile_size=256)
+        self.assertTrue((full == (image[:256, :256] * 255).clamp(0, 255).to(torch.uint8).numpy()).all())
+        # 最高层整张图缩小后放进单个瓦片
+        levels = pyramid_levels(520, 300, 256)
+        self.assertEqual(levels, 3)
+        self.assertEqual(render_tile(image, 2, 0, 0, tile_size=256).shape, (75, 130, 3))
+        self.assertEqual(render_tile(image, 1, 1, 0, tile_size=256).shape, (150, 4, 3))
+        self.assertIsNone(render_tile(image, levels, 0, 0, tile_size=256))
+        self.assertIsNone(render_tile(image, 1, 2, 0, tile_size=256))
+
+    def test_tile_cache_lru(self):
+        cache = TileCache(budget_mb=1)
+        chunk = b"x" * (400 * 1024)
+        cache.put("a", chunk)
+        cache.put("b", chunk)
+        cache.get("a")  # a 成为最近使用的瓦片
+        cache.put("c", chunk)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.nbytes, cache.budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
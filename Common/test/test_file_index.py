@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.file_index import FileIndexAllocator
+from libs.file_rotation import rotate_in_background
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.allocator = FileIndexAllocator()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def claim_name(self, prefix="img", ext="png", file_max=64):
+        image_path, txt_path = self.allocator.claim(self.path, prefix, ext, file_max)
+        self.assertEqual(os.path.splitext(image_path)[0], os.path.splitext(txt_path)[0])
+        return os.path.basename(image_path)
+
+    def test_sequential_numbering(self):
+        self.assertEqual([self.claim_name() for _ in range(3)], ["img_0001.png", "img_0002.png", "img_0003.png"])
+        # 分配时即创建空文件
+        self.assertEqual(sorted(os.listdir(self.path)), ["img_0001.png", "img_0002.png", "img_0003.png"])
+
+    def test_skips_existing_files(self):
+        for name in ("img_0001.png", "img_0003.png", "img_0002.jpg", "other_0002.png"):
+            open(os.path.join(self.path, name), 'w').close()
+        self.assertEqual([self.claim_name() for _ in range(3)], ["img_0002.png", "img_0004.png", "img_0005.png"])
+        self.assertEqual(self.claim_name(ext="jpg"), "img_0001.jpg")
+
+    def test_file_created_by_another_process(self):
+        self.assertEqual(self.claim_name(), "img_0001.png")
+        # 扫描之后由其它进程创建的文件通过独占创建发现并跳过
+        open(os.path.join(self.path, "img_0002.png"), 'w').close()
+        self.assertEqual(self.claim_name(), "img_0003.png")
+
+    def test_forget_rescans(self):
+        self.claim_name()
+        os.remove(os.path.join(self.path, "img_0001.png"))
+        self.allocator.forget(self.path)
+        self.assertEqual(self.claim_name(), "img_0001.png")
+
+    def wait_rotation(self):
+        # 轮转线程只有一个，排在其后的空任务完成时之前的轮转都已完成
+        rotate_in_background(self.path, "none", "png", ()).result()
+
+    def listing(self):
+        return sorted(os.listdir(self.path))
+
+    def test_switch_range_rotates_in_background(self):
+        names = [self.claim_name(file_max=3) for _ in range(4)]
+        self.assertEqual(names, ["img_0001.png", "img_0002.png", "img_0003.png", "img_0004.png"])
+        self.wait_rotation()
+        # 第一个范围移入备份目录，新的保存使用第二个范围
+        self.assertEqual(self.listing(), ["bak_0000", "img_0004.png"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "bak_0000"))), names[:3])
+
+        names = [self.claim_name(file_max=3) for _ in range(3)]
+        self.assertEqual(names, ["img_0005.png", "img_0006.png", "img_0001.png"])
+        self.wait_rotation()
+        self.assertEqual(self.listing(), ["bak_0000", "bak_0001", "img_0001.png"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "bak_0001"))), ["img_0004.png", "img_0005.png", "img_0006.png"])
+
+    def test_out_of_range_files_rotated(self):
+        for name in ("img_0002.png", "img_0007.png", "img_0009.png", "img_0009.txt"):
+            open(os.path.join(self.path, name), 'w').close()
+        # 2*FileMax 之外的旧文件在首次分配时轮转，范围内的文件保留并跳过
+        self.assertEqual(self.claim_name(file_max=3), "img_0001.png")
+        self.assertEqual(self.claim_name(file_max=3), "img_0003.png")
+        self.wait_rotation()
+        self.assertEqual(self.listing(), ["bak_0000", "img_0001.png", "img_0002.png", "img_0003.png"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "bak_0000"))), ["img_0007.png", "img_0009.png", "img_0009.txt"])
+
+    def test_file_max_change_restarts_ranges(self):
+        for _ in range(5):
+            self.claim_name(file_max=8)
+        # FileMax 变小后 2*FileMax 之外的序号被轮转，两个已占满的范围也依次轮转，从 1 重新开始
+        self.assertEqual(self.claim_name(file_max=2), "img_0001.png")
+        self.wait_rotation()
+        self.assertEqual(self.listing(), ["bak_0000", "bak_0001", "bak_0002", "img_0001.png"])
+        contents = [sorted(os.listdir(os.path.join(self.path, f"bak_000{i}"))) for i in range(3)]
+        self.assertEqual(contents, [["img_0005.png"], ["img_0001.png", "img_0002.png"], ["img_0003.png", "img_0004.png"]])
+
+    def test_concurrent_claims_are_unique(self):
+        names = []
+        lock = threading.Lock()
+
+        def claim():
+            for _ in range(10):
+                name = self.claim_name(file_max=1000)
+                with lock:
+                    names.append(name)
+
+        threads = [threading.Thread(target=claim) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(names)), 40)
+        self.assertEqual(sorted(names), [f"img_{i:04}.png" for i in range(1, 41)])
+
+
+if __name__ == '__main__':
+    unittest.main()
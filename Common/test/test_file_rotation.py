@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.file_rotation import rotate_files, apply_retention
+
+
+class TestFileRotation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def touch(self, *names):
+        for name in names:
+            open(os.path.join(self.path, name), 'w').close()
+
+    def listing(self, *parts):
+        return sorted(os.listdir(os.path.join(self.path, *parts)))
+
+    def test_rotate_selected_indexes(self):
+        self.touch("img_0001.png", "img_0001.txt", "img_0002.png", "img_0003.png", "img_0003.txt", "other_0001.png")
+        self.assertEqual(rotate_files(self.path, "img", "png", indexes={1, 2}, keep=0), 2)
+        self.assertEqual(self.listing(), ["bak_0000", "img_0003.png", "img_0003.txt", "other_0001.png"])
+        self.assertEqual(self.listing("bak_0000"), ["img_0001.png", "img_0001.txt", "img_0002.png"])
+
+    def test_rotate_all_and_numbering(self):
+        self.touch("img_0001.png", "bak_0004.zip")
+        os.mkdir(os.path.join(self.path, "bak_0002"))
+        # 新备份编号在已有备份 (含压缩包) 的最大编号之后
+        self.assertEqual(rotate_files(self.path, "img", "png", keep=0), 1)
+        self.assertEqual(self.listing(), ["bak_0002", "bak_0004.zip", "bak_0005"])
+
+    def test_nothing_to_rotate(self):
+        self.touch("img_0001.txt")
+        self.assertEqual(rotate_files(self.path, "img", "png", keep=0), 0)
+        self.assertEqual(self.listing(), ["img_0001.txt"])
+
+    def test_retention_delete(self):
+        for index in range(3):
+            self.touch(f"img_000{index}.png")
+            rotate_files(self.path, "img", "png", indexes={index}, keep=2, policy="delete")
+        self.assertEqual(self.listing(), ["bak_0001", "bak_0002"])
+
+    def test_retention_compress(self):
+        for index in range(3):
+            self.touch(f"img_000{index}.png")
+            rotate_files(self.path, "img", "png", indexes={index}, keep=1, policy="compress")
+        self.assertEqual(self.listing(), ["bak_0000.zip", "bak_0001.zip", "bak_0002"])
+        # 已压缩的备份在 delete 策略下被删除
+        apply_retention(self.path, [(0, "bak_0000.zip"), (1, "bak_0001.zip"), (2, "bak_0002")], keep=1, policy="delete")
+        self.assertEqual(self.listing(), ["bak_0002"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.image_chooser_server import Cancelled, MessageHolder, read_bulk_messages
+
+
+class TestImageChooserMessages(unittest.TestCase):
+
+    def setUp(self):
+        MessageHolder.messages = {}
+        MessageHolder.cancelled = set()
+
+    def test_parse_message(self):
+        self.assertEqual(MessageHolder.parseMessage("1, 2,3"), [1, 2, 3])
+        self.assertEqual(MessageHolder.parseMessage([4, "5"]), [4, 5])
+        self.assertEqual(MessageHolder.parseMessage(7), [7])
+        # 空列表与无法解析的消息一样按 [1] 处理，waitForMessage 不会取到空选择
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(MessageHolder.parseMessage([]), [1])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(MessageHolder.parseMessage("a,b"), [1])
+        self.assertEqual(MessageHolder.parseMessage("__cancel__"), "__cancel__")
+
+    def test_read_bulk_messages(self):
+        data = {"messages": [
+            {"id": "3", "message": [0, 2], "client_id": "c", "prompt_id": "p"},
+            {"id": "4", "message": "1"},
+            "not a message",
+        ]}
+        self.assertEqual(read_bulk_messages(data), [("3", [0, 2], "c", "p"), ("4", "1", None, None)])
+        self.assertEqual(read_bulk_messages([1, 2]), [])
+
+    def test_bulk_messages_wake_waiters(self):
+        results = {}
+
+        def wait(id):
+            results[id] = MessageHolder.waitForMessage(id, asList=True, timeout=5, session=("c", "p"))
+
+        threads = [threading.Thread(target=wait, args=(id,)) for id in ("1", "2")]
+        for thread in threads:
+            thread.start()
+        MessageHolder.addMessages([("1", [0, 3], "c", "p"), ("2", "2", "c", "p")])
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {"1": [0, 3], "2": [2]})
+
+    def test_wait_timeout(self):
+        self.assertIsNone(MessageHolder.waitForMessage("9", asList=True, timeout=0.01, session=("c", "p")))
+
+
+class TestImageChooserSessions(unittest.TestCase):
+
+    def setUp(self):
+        MessageHolder.messages = {}
+        MessageHolder.cancelled = set()
+
+    def test_messages_are_scoped_per_session(self):
+        MessageHolder.addMessage("1", "2", "other", "p")
+        MessageHolder.addMessage("1", "3", "c", "p")
+        self.assertEqual(MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("c", "p")), [3])
+        self.assertEqual(MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("other", "p")), [2])
+        self.assertIsNone(MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("c", "p")))
+
+    def test_wildcard_message(self):
+        # 旧版前端不带 client_id / prompt_id，node_id 为 -1 时发给任意节点
+        MessageHolder.addMessage("-1", "4")
+        self.assertEqual(MessageHolder.waitForMessage("7", asList=True, timeout=0.01, session=("c", "p")), [4])
+
+    def test_specific_message_preferred(self):
+        MessageHolder.addMessage("1", "1")
+        MessageHolder.addMessage("1", "2", "c", "p")
+        self.assertEqual(MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("c", "p")), [2])
+
+    def test_cancel_only_affects_its_session(self):
+        MessageHolder.addMessage("1", "__cancel__", "c", "p")
+        with self.assertRaises(Cancelled):
+            MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("c", "p"))
+        self.assertIsNone(MessageHolder.waitForMessage("1", asList=True, timeout=0.01, session=("other", "p")))
+
+    def test_start_clears_only_its_client(self):
+        MessageHolder.addMessage("1", "1", "c", "p")
+        MessageHolder.addMessage("1", "2", "other", "p")
+        MessageHolder.addMessage("1", "__start__", "c")
+        self.assertEqual(list(MessageHolder.messages), [("other", "p", "1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
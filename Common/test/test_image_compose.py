@@ -0,0 +1,140 @@
+import os
+import random
+import sys
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.image_compose import atlas_layout, channel_count, fit_resize_batch, grid_layout, mask_for, paste, resize_batch, skyline_pack
+
+
+class TestConcatenation(unittest.TestCase):
+
+    def test_mask_for(self):
+        image = torch.rand((3, 8, 6, 3))
+        self.assertTrue(torch.equal(mask_for(image, None), torch.zeros((3, 8, 6))))
+        # 批次为 1 的掩膜广播到整个批次，不复制
+        single = torch.rand((1, 8, 6))
+        expanded = mask_for(image, single)
+        self.assertEqual(tuple(expanded.shape), (3, 8, 6))
+        self.assertEqual(expanded.data_ptr(), single.data_ptr())
+        self.assertEqual(tuple(mask_for(image, torch.rand((8, 6))).shape), (3, 8, 6))
+        # 尺寸不匹配时使用全零掩膜
+        self.assertTrue(torch.equal(mask_for(image, torch.rand((3, 4, 4))), torch.zeros((3, 8, 6))))
+
+    def test_channel_count(self):
+        self.assertEqual(channel_count(torch.rand((1, 2, 2, 3)), torch.rand((1, 2, 2, 4))), 4)
+
+    def test_paste_fills_missing_channels(self):
+        canvas = torch.zeros((2, 6, 8, 4))
+        image = torch.rand((2, 3, 4, 3))
+        paste(canvas, image, 2, 1)
+        expected = torch.zeros((2, 6, 8, 4))
+        expected[:, 1:4, 2:6] = torch.cat([image, torch.ones((2, 3, 4, 1))], dim=-1)
+        self.assertTrue(torch.equal(canvas, expected))
+
+    def test_paste_mask(self):
+        canvas = torch.zeros((1, 4, 4))
+        paste(canvas, torch.ones((1, 2, 2)), 1, 2)
+        self.assertEqual(float(canvas.sum()), 4.0)
+        self.assertEqual(float(canvas[0, 2:4, 1:3].sum()), 4.0)
+
+
+class TestGridLayout(unittest.TestCase):
+
+    def test_square_grid(self):
+        positions, width, height = grid_layout([(10, 10)] * 5)
+        # 5 个格子默认 ceil(sqrt(5)) = 3 列
+        self.assertEqual(positions, [(0, 0), (10, 0), (20, 0), (0, 10), (10, 10)])
+        self.assertEqual((width, height), (30, 20))
+
+    def test_column_widths_and_spacing(self):
+        sizes = [(10, 5), (20, 8), (15, 12), (4, 4)]
+        positions, width, height = grid_layout(sizes, columns=2, spacing=3)
+        # 每列取最宽的格子，每行取最高的格子
+        self.assertEqual(positions, [(0, 0), (18, 0), (0, 11), (18, 11)])
+        self.assertEqual((width, height), (38, 23))
+
+    def test_columns_clamped(self):
+        positions, width, height = grid_layout([(4, 6), (4, 6)], columns=5)
+        self.assertEqual(positions, [(0, 0), (4, 0)])
+        self.assertEqual((width, height), (8, 6))
+        self.assertEqual(grid_layout([]), ([], 0, 0))
+
+
+def overlaps(a, b, spacing):
+    (ax, ay, aw, ah), (bx, by, bw, bh) = a, b
+    return ax < bx + bw + spacing and bx < ax + aw + spacing and ay < by + bh + spacing and by < ay + ah + spacing
+
+
+class TestAtlasLayout(unittest.TestCase):
+
+    def check_layout(self, sizes, positions, width, height, spacing=0):
+        boxes = [(x, y, w, h) for (x, y), (w, h) in zip(positions, sizes)]
+        for x, y, w, h in boxes:
+            self.assertTrue(0 <= x and 0 <= y and x + w <= width and y + h <= height)
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                self.assertFalse(overlaps(boxes[i], boxes[j], spacing), (boxes[i], boxes[j]))
+
+    def test_perfect_fit(self):
+        sizes = [(10, 10), (20, 10), (10, 10)]
+        positions, width, height = atlas_layout(sizes)
+        self.check_layout(sizes, positions, width, height)
+        self.assertEqual((width, height), (20, 20))
+
+    def test_random_sizes(self):
+        rng = random.Random(0)
+        sizes = [(rng.randint(8, 64), rng.randint(8, 64)) for _ in range(40)]
+        for spacing in (0, 2):
+            positions, width, height = atlas_layout(sizes, spacing)
+            self.check_layout(sizes, positions, width, height, spacing)
+            self.assertGreaterEqual(width * height, sum(w * h for w, h in sizes))
+            # 不比简单的网格布局更差
+            _, grid_width, grid_height = grid_layout(sizes, spacing=spacing)
+            self.assertLessEqual(width * height, grid_width * grid_height)
+
+    def test_skyline_too_wide(self):
+        self.assertIsNone(skyline_pack([(10, 4), (30, 4)], 20))
+        self.assertEqual(atlas_layout([]), ([], 0, 0))
+
+
+class TestFitResize(unittest.TestCase):
+
+    def test_resize_batch(self):
+        images = torch.rand((2, 8, 8, 3))
+        self.assertIs(resize_batch(images, 8, 8), images)
+        # nearest-exact 取每个 2x2 块的右下像素 (与 PIL NEAREST 相同)
+        self.assertTrue(torch.equal(resize_batch(images, 4, 4), images[:, 1::2, 1::2]))
+        self.assertEqual(tuple(resize_batch(images[..., 0], 3, 5, "bilinear", antialias=True).shape), (2, 5, 3))
+        upscaled = resize_batch(images, 16, 16, "bicubic")
+        self.assertTrue(0.0 <= float(upscaled.min()) and float(upscaled.max()) <= 1.0)
+
+    def test_fill(self):
+        images = torch.rand((3, 20, 40, 3))
+        self.assertEqual(tuple(fit_resize_batch(images, 32, 32, "fill").shape), (3, 32, 32, 3))
+
+    def test_letterbox(self):
+        images = torch.rand((2, 20, 40, 3))
+        out = fit_resize_batch(images, 32, 32, "letterbox", "nearest", background=(1.0, 0.0, 0.0))
+        self.assertEqual(tuple(out.shape), (2, 32, 32, 3))
+        # 更宽的图像缩放为 32x16，上下各留 8 行背景色
+        self.assertTrue(torch.all(out[:, :8] == torch.tensor([1.0, 0.0, 0.0])))
+        self.assertTrue(torch.all(out[:, 24:] == torch.tensor([1.0, 0.0, 0.0])))
+        self.assertTrue(torch.equal(out[:, 8:24], resize_batch(images, 32, 16)))
+
+    def test_crop(self):
+        images = torch.rand((1, 20, 40, 3))
+        out = fit_resize_batch(images, 10, 10, "crop", "nearest")
+        # 居中裁剪为 20x20 后缩放
+        self.assertTrue(torch.equal(out, resize_batch(images[:, :, 10:30], 10, 10)))
+        masks = torch.rand((1, 40, 20))
+        self.assertTrue(torch.equal(fit_resize_batch(masks, 10, 10, "crop", "nearest"), resize_batch(masks[:, 10:30], 10, 10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import torch
+from PIL import Image
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.image_convert import image2mask, np2tensor, pil2tensor, pils2tensor, tensor2np, tensor2pil, tensor2pil_batch, to_uint8
+
+
+def legacy_uint8(images):
+    """旧版 image_function 的转换方式"""
+    return np.clip(255. * images.cpu().numpy(), 0, 255).astype(np.uint8)
+
+
+class TestImageConvert(unittest.TestCase):
+
+    def test_to_uint8_matches_legacy(self):
+        images = torch.rand((2, 16, 16, 3)) * 1.2 - 0.1
+        self.assertTrue(np.array_equal(to_uint8(images).numpy(), legacy_uint8(images)))
+        self.assertTrue(np.array_equal(to_uint8(images.bfloat16()).numpy(), legacy_uint8(images.bfloat16().float())))
+
+    def test_tensor2np(self):
+        images = torch.rand((3, 4, 5, 3))
+        arrays = tensor2np(images)
+        self.assertEqual(len(arrays), 3)
+        self.assertTrue(np.array_equal(arrays[1], legacy_uint8(images[1])))
+        self.assertEqual(tensor2np(images[0]).shape, (4, 5, 3))
+
+    def test_pil_round_trip(self):
+        array = np.random.randint(0, 256, (6, 7, 3), dtype=np.uint8)
+        tensor = pil2tensor(Image.fromarray(array))
+        self.assertEqual(tuple(tensor.shape), (1, 6, 7, 3))
+        self.assertTrue(np.array_equal(np.asarray(tensor2pil(tensor)), array))
+        batch = pils2tensor([Image.fromarray(array)] * 2)
+        self.assertEqual(tuple(batch.shape), (2, 6, 7, 3))
+        self.assertEqual([image.size for image in tensor2pil_batch(batch)], [(7, 6), (7, 6)])
+
+    def test_np2tensor(self):
+        self.assertEqual(float(np2tensor(np.array([255], dtype=np.uint8))[0]), 1.0)
+        self.assertEqual(float(np2tensor(np.array([65535], dtype=np.uint16))[0]), 1.0)
+        self.assertEqual(float(np2tensor(np.array([True]))[0]), 1.0)
+        self.assertEqual(np2tensor(np.array([0.5], dtype=np.float64)).dtype, torch.float32)
+
+    def test_image2mask(self):
+        image = Image.new("RGB", (4, 3), (255, 0, 0))
+        mask = image2mask(image)
+        self.assertEqual(tuple(mask.shape), (1, 3, 4))
+        self.assertTrue(torch.all(mask == 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.image_encoders import ENCODERS, PRESETS, ImageEncoder, get_encoder, register_encoder
+
+
+def gradient(mode="RGB", width=48, height=32):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    channels = [np.broadcast_to(x, (height, width)), np.broadcast_to(y[:, None], (height, width)),
+                np.full((height, width), 128, dtype=np.uint8), np.full((height, width), 200, dtype=np.uint8)]
+    return Image.fromarray(np.stack(channels[:len(mode)], axis=-1), mode)
+
+
+def decode(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def webp_available():
+    try:
+        Image.new("RGB", (1, 1)).save(io.BytesIO(), format="WEBP")
+        return True
+    except (KeyError, OSError):
+        return False
+
+
+class TestImageEncoders(unittest.TestCase):
+
+    def test_lossless_round_trip(self):
+        names = ["png", "tiff"] + (["webp lossless"] if webp_available() else [])
+        for name in names:
+            for mode in ("RGB", "RGBA"):
+                for preset in PRESETS:
+                    image = gradient(mode)
+                    decoded = decode(get_encoder(name).encode(image, preset=preset))
+                    self.assertEqual(decoded.mode, mode, (name, preset))
+                    self.assertTrue(np.array_equal(np.asarray(decoded), np.asarray(image)), (name, mode, preset))
+
+    def test_lossy_round_trip(self):
+        names = ["jpeg"] + (["webp"] if webp_available() else [])
+        image = gradient()
+        for name in names:
+            for preset in PRESETS:
+                decoded = decode(get_encoder(name).encode(image, preset=preset, quality=90))
+                self.assertEqual(decoded.size, image.size, (name, preset))
+                error = np.abs(np.asarray(decoded.convert("RGB"), dtype=np.int16) - np.asarray(image, dtype=np.int16))
+                self.assertLess(float(error.mean()), 4.0, (name, preset))
+
+    def test_jpeg_drops_alpha(self):
+        decoded = decode(get_encoder("jpeg").encode(gradient("RGBA")))
+        self.assertEqual(decoded.format, "JPEG")
+        self.assertEqual(decoded.mode, "RGB")
+
+    def test_png_metadata(self):
+        pnginfo = PngInfo()
+        pnginfo.add_text("prompt", "{}")
+        decoded = decode(get_encoder("png").encode(gradient(), pnginfo=pnginfo))
+        self.assertEqual(decoded.text.get("prompt"), "{}")
+
+    def test_options_override(self):
+        png = get_encoder("png")
+        self.assertEqual(png.options("balanced"), {"compress_level": 4})
+        self.assertEqual(png.options("fast", quality=50, level=7), {"compress_level": 7})
+        self.assertEqual(get_encoder("jpeg").options("fast", quality=70, level=3), {"quality": 70})
+        self.assertEqual(get_encoder("webp").options("small", quality=80), {"quality": 80, "method": 6})
+        # 返回副本，不修改预设
+        png.options("small")["compress_level"] = 0
+        self.assertEqual(png.presets["small"], {"compress_level": 9})
+
+    def test_level_changes_size(self):
+        image = gradient(width=256, height=256)
+        png = get_encoder("png")
+        self.assertLessEqual(len(png.encode(image, level=9)), len(png.encode(image, level=1)))
+
+    def test_unknown_names(self):
+        with self.assertRaises(ValueError):
+            get_encoder("bmp")
+        with self.assertRaises(ValueError):
+            get_encoder("png").options("tiny")
+
+    def test_register_encoder(self):
+        encoder = ImageEncoder("bmp", "BMP", {"balanced": {}}, alpha=False)
+        register_encoder("bmp", encoder)
+        try:
+            self.assertIs(get_encoder("bmp"), encoder)
+            decoded = decode(encoder.encode(gradient("RGBA")))
+            self.assertEqual((decoded.format, decoded.mode), ("BMP", "RGB"))
+        finally:
+            del ENCODERS["bmp"]
+
+
+if __name__ == '__main__':
+    unittest.main()
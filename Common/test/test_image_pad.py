@@ -1,5 +1,6 @@
 import torch
 import unittest
+from unittest import mock
 import sys
 import os
 
@@ -9,6 +10,26 @@ sys.path.insert(0, project_root)
 
 from ImageFunctionNode import ImagePad
 
+def legacy_edge_pad(image, pad_left, pad_right, pad_top, pad_bottom):
+    """旧版逐张循环的边缘填充，用于校验结果"""
+    B, H, W, C = image.shape
+    out_image = torch.zeros((B, H + pad_top + pad_bottom, W + pad_left + pad_right, C), dtype=image.dtype)
+    for b in range(B):
+        out_image[b, :pad_top, :, :] = image[b, 0, :, :].mean(dim=0)
+        out_image[b, pad_top+H:, :, :] = image[b, H-1, :, :].mean(dim=0)
+        out_image[b, :, :pad_left, :] = image[b, :, 0, :].mean(dim=0)
+        out_image[b, :, pad_left+W:, :] = image[b, :, W-1, :].mean(dim=0)
+        out_image[b, pad_top:pad_top+H, pad_left:pad_left+W, :] = image[b]
+    return out_image
+
+
+def legacy_masks(B, H, W, pad_left, pad_right, pad_top, pad_bottom):
+    out_masks = torch.ones((B, H + pad_top + pad_bottom, W + pad_left + pad_right))
+    for m in range(B):
+        out_masks[m, pad_top:pad_top+H, pad_left:pad_left+W] = 0.0
+    return out_masks
+
+
 class TestImagePad(unittest.TestCase):
 
     def setUp(self):
@@ -22,7 +43,7 @@ class TestImagePad(unittest.TestCase):
         color = "255, 0, 0"  # Red color
         pad_mode = "color"
 
-        padded_image, padded_mask = self.image_pad.pad(
+        padded_image, padded_mask, *_ = self.image_pad.pad(
             image=image,
             left=left,
             right=right,
@@ -46,7 +67,7 @@ class TestImagePad(unittest.TestCase):
         color = "0, 0, 0"  # Black color (not used in edge mode)
         pad_mode = "edge"
 
-        padded_image, _ = self.image_pad.pad(
+        padded_image, *_ = self.image_pad.pad(
             image=image,
             left=left,
             right=right,
@@ -66,7 +87,7 @@ class TestImagePad(unittest.TestCase):
         color = "0, 255, 0"  # Green color
         pad_mode = "color"
 
-        padded_image, _ = self.image_pad.pad(
+        padded_image, *_ = self.image_pad.pad(
             image=image,
             left=0,
             right=0,
@@ -82,5 +103,116 @@ class TestImagePad(unittest.TestCase):
         self.assertEqual(padded_image.shape[1], target_height)
         self.assertEqual(padded_image.shape[2], target_width)
 
+    def test_letterbox_target_size(self):
+        image = torch.rand((2, 100, 200, 3))
+        mask = torch.rand((2, 100, 200))
+        padded_image, padded_mask, box_x, box_y, box_width, box_height = self.image_pad.pad(
+            image=image, left=0, right=0, top=0, bottom=0, extra_padding=8,
+            color="0, 0, 0", pad_mode="color", mask=mask,
+            target_width=128, target_height=128, letterbox=True
+        )
+        self.assertEqual(tuple(padded_image.shape), (2, 128, 128, 3))
+        self.assertEqual(tuple(padded_mask.shape), (2, 128, 128))
+        # 112x112 的内容区域内等比缩放为 112x56 并居中
+        self.assertEqual((box_x, box_y, box_width, box_height), (8, 36, 112, 56))
+        self.assertTrue(torch.all(padded_image[:, :box_y] == 0))
+        self.assertTrue(torch.all(padded_image[:, box_y + box_height:] == 0))
+
+    def test_letterbox_tiled_matches_direct(self):
+        image = torch.rand((2, 100, 200, 3))
+        kwargs = dict(image=image, left=0, right=0, top=0, bottom=0, extra_padding=8,
+                      color="0, 0, 0", pad_mode="color", target_width=128, target_height=128, letterbox=True)
+        direct = self.image_pad.pad(**kwargs)[0]
+        # 超出内存预算时分块缩放并直接写入输出
+        with mock.patch.object(sys.modules[ImagePad.__module__], "needs_tiling", return_value=True):
+            tiled = self.image_pad.pad(**kwargs)[0]
+        self.assertTrue(torch.allclose(direct, tiled, atol=1e-5))
+
+    def test_target_size_without_letterbox_keeps_image(self):
+        image = torch.rand((1, 64, 32, 3))
+        padded_image, _, box_x, box_y, box_width, box_height = self.image_pad.pad(
+            image=image, left=0, right=0, top=0, bottom=0, extra_padding=0,
+            color="0, 0, 0", pad_mode="color", target_width=128, target_height=128
+        )
+        self.assertEqual((box_x, box_y, box_width, box_height), (48, 32, 32, 64))
+        self.assertTrue(torch.equal(padded_image[:, 32:96, 48:80], image))
+
+    def test_target_size_extra_padding_shrinks_image(self):
+        image = torch.rand((1, 64, 64, 3))
+        padded_image, padded_mask, box_x, box_y, box_width, box_height = self.image_pad.pad(
+            image=image, left=0, right=0, top=0, bottom=0, extra_padding=8,
+            color="0, 0, 0", pad_mode="color", target_width=128, target_height=128
+        )
+        # 未开启 letterbox 时与旧版相同: 宽高各缩小 extra_padding 后居中
+        self.assertEqual((box_x, box_y, box_width, box_height), (36, 36, 56, 56))
+        self.assertEqual(tuple(padded_image.shape), (1, 128, 128, 3))
+        self.assertEqual(float(padded_mask[0, 36:92, 36:92].sum()), 0.0)
+        self.assertEqual(float(padded_mask.sum()), 128 * 128 - 56 * 56)
+
+    def test_target_size_smaller_than_image(self):
+        image = torch.rand((1, 200, 100, 3))
+        with self.assertRaises(ValueError):
+            self.image_pad.pad(
+                image=image, left=0, right=0, top=0, bottom=0, extra_padding=0,
+                color="0, 0, 0", pad_mode="color", target_width=128, target_height=128
+            )
+
+    def test_native_modes_with_mask(self):
+        image = torch.rand((2, 16, 20, 3))
+        mask = torch.rand((2, 16, 20))
+        for pad_mode in ("reflect", "replicate", "circular"):
+            _, padded_mask, *_ = self.image_pad.pad(
+                image=image, left=5, right=3, top=2, bottom=7, extra_padding=1,
+                color="0, 0, 0", pad_mode=pad_mode, mask=mask
+            )
+            expected = torch.nn.functional.pad(mask, (6, 4, 3, 8), mode="replicate")
+            self.assertTrue(torch.equal(padded_mask, expected), pad_mode)
+
+    def test_edge_matches_legacy(self):
+        image = torch.rand((4, 48, 64, 3))
+        padded_image, padded_mask, *_ = self.image_pad.pad(
+            image=image, left=3, right=7, top=5, bottom=2, extra_padding=1,
+            color="0, 0, 0", pad_mode="edge"
+        )
+        self.assertTrue(torch.allclose(padded_image, legacy_edge_pad(image, 4, 8, 6, 3)))
+        self.assertTrue(torch.equal(padded_mask, legacy_masks(4, 48, 64, 4, 8, 6, 3)))
+
+    def test_native_modes(self):
+        image = torch.rand((3, 32, 40, 3))
+        for pad_mode in ("reflect", "replicate", "circular"):
+            padded_image, *_ = self.image_pad.pad(
+                image=image, left=4, right=2, top=6, bottom=8, extra_padding=0,
+                color="0, 0, 0", pad_mode=pad_mode
+            )
+            expected = torch.nn.functional.pad(image.movedim(-1, 1), (4, 2, 6, 8), mode=pad_mode).movedim(1, -1)
+            self.assertTrue(torch.equal(padded_image, expected), pad_mode)
+            self.assertTrue(padded_image.is_contiguous(), pad_mode)
+
+    def test_reflect_too_large(self):
+        image = torch.rand((1, 8, 8, 3))
+        with self.assertRaises(ValueError):
+            self.image_pad.pad(
+                image=image, left=8, right=0, top=0, bottom=0, extra_padding=0,
+                color="0, 0, 0", pad_mode="reflect"
+            )
+
+    def test_mask_resized_to_image(self):
+        image = torch.rand((2, 64, 64, 3))
+        mask = torch.rand((2, 32, 32))
+        _, padded_mask, *_ = self.image_pad.pad(
+            image=image, left=2, right=2, top=2, bottom=2, extra_padding=0,
+            color="0, 0, 0", pad_mode="color", mask=mask
+        )
+        self.assertEqual(tuple(padded_mask.shape), (2, 68, 68))
+
+    def test_large_batch_edge_matches_legacy(self):
+        image = torch.rand((16, 96, 80, 3))
+        padded_image, padded_mask, *_ = self.image_pad.pad(
+            image=image, left=32, right=32, top=32, bottom=32, extra_padding=0,
+            color="0, 0, 0", pad_mode="edge"
+        )
+        self.assertTrue(torch.allclose(padded_image, legacy_edge_pad(image, 32, 32, 32, 32)))
+        self.assertTrue(torch.equal(padded_mask, legacy_masks(16, 96, 80, 32, 32, 32, 32)))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
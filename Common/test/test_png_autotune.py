@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.png_autotune import DEFAULT_LEVEL, LEVELS, PngAutotuner, get_tuner
+
+MB = 1048576
+RAW = 8 * MB
+
+
+def encode_rate(level):
+    """模拟的单线程编码速度: 级别越高越慢"""
+    return 100 * MB / level
+
+
+def ratio(level):
+    """模拟的压缩率: 级别越高文件越小"""
+    return 0.5 - 0.03 * level
+
+
+def record(tuner, level, disk):
+    encoded = int(RAW * ratio(level))
+    tuner.record(level, RAW, encoded, RAW / encode_rate(level), encoded / disk)
+
+
+def simulate(tuner, disk, rounds=64):
+    for _ in range(rounds):
+        record(tuner, tuner.choose(), disk)
+    return tuner.level
+
+
+class TestPngAutotune(unittest.TestCase):
+
+    def test_initial_exploration(self):
+        tuner = PngAutotuner(explore_every=8, parallelism=1)
+        levels = [tuner.choose() for _ in range(16)]
+        # 先试默认级别与两个相邻级别，之后每隔 explore_every 次轮流试一个相邻级别
+        self.assertEqual(levels[:3], [DEFAULT_LEVEL, DEFAULT_LEVEL - 1, DEFAULT_LEVEL + 1])
+        self.assertEqual(levels[7], DEFAULT_LEVEL + 1)
+        self.assertEqual(levels[15], DEFAULT_LEVEL - 1)
+        self.assertEqual(set(levels[3:7] + levels[8:15]), {DEFAULT_LEVEL})
+
+    def test_fast_disk_prefers_low_level(self):
+        tuner = PngAutotuner(parallelism=1)
+        self.assertEqual(simulate(tuner, disk=10000 * MB), min(LEVELS))
+
+    def test_slow_disk_prefers_high_level(self):
+        tuner = PngAutotuner(parallelism=1)
+        self.assertEqual(simulate(tuner, disk=1 * MB), max(LEVELS))
+
+    def test_follows_disk_change(self):
+        tuner = PngAutotuner(window=8, parallelism=1)
+        simulate(tuner, disk=10000 * MB)
+        # 磁盘变慢后，旧样本移出窗口，选择逐步移向更高的级别
+        self.assertEqual(simulate(tuner, disk=1 * MB, rounds=256), max(LEVELS))
+
+    def test_parallelism(self):
+        def best(parallelism):
+            tuner = PngAutotuner(parallelism=parallelism)
+            for level in LEVELS:
+                record(tuner, level, disk=20 * MB)
+            tuner.choose()
+            return tuner.level
+
+        # 单线程时受编码速度限制，多个帧同时编码时受磁盘限制
+        self.assertEqual(best(1), 2)
+        self.assertEqual(best(8), 9)
+
+    def test_stats(self):
+        tuner = PngAutotuner(parallelism=2)
+        stats = tuner.stats()
+        self.assertEqual(stats, {"level": DEFAULT_LEVEL, "disk_mb_s": None, "levels": {}})
+        record(tuner, 3, disk=50 * MB)
+        stats = tuner.stats()
+        self.assertAlmostEqual(stats["disk_mb_s"], 50.0, places=3)
+        self.assertEqual(set(stats["levels"]), {3})
+        level = stats["levels"][3]
+        self.assertEqual(level["samples"], 1)
+        self.assertAlmostEqual(level["encode_mb_s"], 100 / 3, places=3)
+        self.assertAlmostEqual(level["ratio"], ratio(3), places=3)
+        self.assertAlmostEqual(level["throughput_mb_s"], min(2 * 100 / 3, 50 / ratio(3)), places=3)
+        self.assertIn("disk 50.0MB/s", tuner.report())
+
+    def test_get_tuner(self):
+        first = get_tuner("autotune_test_a", parallelism=3)
+        self.assertIs(get_tuner(os.path.abspath("autotune_test_a")), first)
+        self.assertEqual(first.parallelism, 3)
+        # 省略 parallelism 时保留原值，传入时更新
+        get_tuner("autotune_test_a")
+        self.assertEqual(first.parallelism, 3)
+        get_tuner("autotune_test_a", parallelism=5)
+        self.assertEqual(first.parallelism, 5)
+        self.assertIsNot(get_tuner("autotune_test_b"), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+from PIL import Image
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs import thread_pool
+from libs.image_encoders import get_encoder
+from libs.save_queue import SaveQueue, queue_image_batch, save_frame
+
+
+def timed(value):
+    return 0.001, 0.002
+
+
+def failing():
+    raise OSError("disk full")
+
+
+class TestSaveQueue(unittest.TestCase):
+
+    def setUp(self):
+        # 阻塞的任务占用一个线程，其它任务需要另一个线程
+        self.workers = thread_pool.max_workers()
+        thread_pool.configure(max(2, self.workers))
+
+    def tearDown(self):
+        thread_pool.configure(self.workers)
+
+    def test_success_and_failure(self):
+        queue = SaveQueue(4)
+        ok = queue.put(timed, 1)
+        bad = queue.put(failing)
+        self.assertTrue(queue.flush(timeout=5))
+        self.assertTrue(ok.result())
+        self.assertFalse(bad.result())
+        stats = queue.stats()
+        self.assertEqual((stats["saved"], stats["failed"], stats["depth"]), (1, 1, 0))
+
+    def test_backpressure(self):
+        queue = SaveQueue(1)
+        release = threading.Event()
+        queue.put(lambda: (release.wait(5), (0.0, 0.0))[1])
+        blocked = threading.Thread(target=queue.put, args=(timed, 2))
+        blocked.start()
+        blocked.join(0.05)
+        self.assertTrue(blocked.is_alive())  # 队列已满，提交被阻塞
+        release.set()
+        blocked.join(5)
+        self.assertTrue(queue.flush(timeout=5))
+        self.assertEqual(queue.stats()["blocked"], 1)
+
+    def test_flush_group(self):
+        queue = SaveQueue(4)
+        release = threading.Event()
+        queue.put(lambda: (release.wait(5), (0.0, 0.0))[1], group="slow")
+        queue.put(timed, 1, group="fast")
+        # 只等待指定分组，不受其它分组的未完成任务影响
+        self.assertTrue(queue.flush(timeout=5, group="fast"))
+        self.assertFalse(queue.flush(timeout=0.05, group="slow"))
+        release.set()
+        self.assertTrue(queue.flush(timeout=5))
+
+    def test_flush_upto(self):
+        queue = SaveQueue(4)
+        first, second = threading.Event(), threading.Event()
+        queue.put(lambda: (first.wait(5), (0.0, 0.0))[1], group="dir")
+        upto = queue.submitted
+        queue.put(lambda: (second.wait(5), (0.0, 0.0))[1], group="dir")
+        # 只等待读取 submitted 之前提交的任务，之后提交的任务未完成也不影响
+        self.assertFalse(queue.flush(timeout=0.05, group="dir", upto=upto))
+        first.set()
+        self.assertTrue(queue.flush(timeout=5, group="dir", upto=upto))
+        self.assertFalse(queue.flush(timeout=0.05, group="dir"))
+        second.set()
+        self.assertTrue(queue.flush(timeout=5))
+
+    def test_queue_image_batch(self):
+        frames = [np.full((8, 8, 3), i * 40, dtype=np.uint8) for i in range(3)] + [np.zeros((8, 8, 7), dtype=np.uint8)]
+        with tempfile.TemporaryDirectory() as directory:
+            batch = queue_image_batch(frames, directory, "img", 64, tags="a, b")
+            self.assertTrue(batch.wait(timeout=10))
+            status = batch.status()
+            self.assertEqual((status["queued"], status["saved"], status["failed"], status["pending"]), (4, 3, 1, 0))
+            # 失败的帧不会留下占位文件
+            self.assertEqual(sorted(os.listdir(directory)), ["img_0001.png", "img_0001.txt", "img_0002.png", "img_0002.txt", "img_0003.png", "img_0003.txt"])
+            with Image.open(os.path.join(directory, "img_0002.png")) as image:
+                self.assertEqual(np.asarray(image)[0, 0].tolist(), [40, 40, 40])
+            self.assertIsNone(batch.autotune)
+
+    def test_tag_failure_removes_image(self):
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, "img_0001.png")
+            txt_path = os.path.join(directory, "img_0001.txt")
+            os.mkdir(txt_path)  # 标签文件无法写入
+            with self.assertRaises(OSError):
+                save_frame(frame, get_encoder("png"), image_path, txt_path, tags="a, b")
+            # 计为失败的帧不会留下没有标签的图像
+            self.assertFalse(os.path.exists(image_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.selection_history import SelectionHistory, content_digest
+
+
+class TestSelectionHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_content_digest(self):
+        images = torch.rand((2, 8, 8, 3))
+        self.assertEqual(content_digest(images), content_digest(images.clone()))
+        self.assertNotEqual(content_digest(images), content_digest(images.half()))
+        self.assertNotEqual(content_digest(images), content_digest(images.reshape(2, 8, 3, 8)))
+        changed = images.clone()
+        changed[1, 7, 7, 2] += 0.5
+        self.assertNotEqual(content_digest(images), content_digest(changed))
+        # 尺寸不一的列表
+        self.assertEqual(content_digest([images[0], images[1, :4]]), content_digest([images[0].clone(), images[1, :4].clone()]))
+
+    def test_put_get(self):
+        history = SelectionHistory(self.path, max_entries=10)
+        self.assertIsNone(history.get("1", "abc"))
+        history.put("1", "abc", [2, 0])
+        self.assertEqual(history.get("1", "abc"), [2, 0])
+        self.assertIsNone(history.get("2", "abc"))
+
+    def test_lru_limit(self):
+        history = SelectionHistory(self.path, max_entries=2)
+        history.put("1", "a", [0])
+        history.put("1", "b", [1])
+        history.get("1", "a")  # a 成为最近使用的条目
+        history.put("1", "c", [2])
+        self.assertEqual(history.get("1", "a"), [0])
+        self.assertIsNone(history.get("1", "b"))
+        self.assertEqual(history.get("1", "c"), [2])
+
+    def test_persisted(self):
+        SelectionHistory(self.path, max_entries=10).put("1", "a", [3])
+        self.assertEqual(SelectionHistory(self.path, max_entries=10).get("1", "a"), [3])
+
+    def test_unreadable_file_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write("{not json")
+        history = SelectionHistory(self.path, max_entries=10)
+        self.assertIsNone(history.get("1", "a"))
+        history.put("1", "a", [1])
+        self.assertEqual(SelectionHistory(self.path, max_entries=10).get("1", "a"), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
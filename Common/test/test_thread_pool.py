@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import unittest
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs import thread_pool
+from libs.thread_pool import map_ordered, max_workers
+
+
+def slow_square(x, delay=0.0):
+    time.sleep(delay * (5 - x))  # 先提交的任务后完成
+    return x * x
+
+
+def nested(x):
+    return sum(map_ordered(slow_square, range(x)))
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+class TestThreadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = max_workers()
+        thread_pool.configure(4)
+
+    def tearDown(self):
+        thread_pool.configure(self.workers)
+
+    def test_results_in_input_order(self):
+        self.assertEqual(map_ordered(slow_square, range(5), delay=0.005), [0, 1, 4, 9, 16])
+
+    def test_nested_calls_do_not_deadlock(self):
+        # 线程池任务内部的 map_ordered 在当前线程中顺序执行
+        self.assertEqual(map_ordered(nested, [2, 3, 4, 5, 6, 7]), [1, 5, 14, 30, 55, 91])
+
+    def test_exception_propagates(self):
+        with self.assertRaises(ValueError):
+            map_ordered(fail_on_three, range(6))
+
+    def test_single_worker_runs_inline(self):
+        thread_pool.configure(1)
+        self.assertEqual(max_workers(), 1)
+        self.assertEqual(map_ordered(slow_square, [1, 2]), [1, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
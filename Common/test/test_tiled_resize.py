@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import torch
+import torch.nn.functional as TF
+
+# 添加项目根目录到 Python 路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from libs.tiled_resize import needs_tiling, tiled_resize_batch
+
+SMALL_BUDGET = 64 * 1024  # 测试图像需要分成多个行带
+
+
+def reference(images, width, height, mode, antialias):
+    kwargs = {} if mode.startswith("nearest") or mode == "area" else {"align_corners": False, "antialias": antialias}
+    out = TF.interpolate(images.movedim(-1, 1), size=(height, width), mode=mode, **kwargs)
+    if mode == "bicubic":
+        out = out.clamp(0.0, 1.0)
+    return out.movedim(1, -1)
+
+
+class TestTiledResize(unittest.TestCase):
+
+    def test_matches_interpolate(self):
+        images = torch.rand((2, 70, 90, 3))
+        cases = [("nearest", False), ("nearest-exact", False), ("area", False),
+                 ("bilinear", False), ("bilinear", True), ("bicubic", False), ("bicubic", True)]
+        for width, height in ((41, 33), (150, 120)):
+            for mode, antialias in cases:
+                if mode == "area" and width > 90:
+                    continue
+                out = tiled_resize_batch(images, width, height, mode, antialias, budget=SMALL_BUDGET)
+                self.assertTrue(torch.allclose(out, reference(images, width, height, mode, antialias), atol=1e-5), (width, mode, antialias))
+
+    def test_mask(self):
+        masks = torch.rand((3, 64, 48))
+        out = tiled_resize_batch(masks, 20, 30, "bilinear", True, budget=SMALL_BUDGET)
+        expected = reference(masks.unsqueeze(-1), 20, 30, "bilinear", True)[..., 0]
+        self.assertTrue(torch.allclose(out, expected, atol=1e-5))
+
+    def test_writes_into_out(self):
+        images = torch.rand((1, 40, 40, 3))
+        canvas = torch.zeros((1, 30, 30, 3))
+        view = canvas[:, 5:25, 5:25]
+        tiled_resize_batch(images, 20, 20, "bilinear", True, budget=SMALL_BUDGET, out=view)
+        self.assertTrue(torch.allclose(canvas[:, 5:25, 5:25], reference(images, 20, 20, "bilinear", True), atol=1e-5))
+        self.assertEqual(float(canvas[:, :5].abs().sum()), 0.0)
+        with self.assertRaises(ValueError):
+            tiled_resize_batch(images, 20, 20, out=torch.zeros((1, 20, 21, 3)))
+
+    def test_zero_budget_single_band(self):
+        images = torch.rand((1, 64, 80, 3))
+        # 分成多个行带时才会记录日志
+        with mock.patch("libs.tiled_resize.log") as log:
+            out = tiled_resize_batch(images, 70, 56, "bicubic", False, budget=0)
+        log.assert_not_called()
+        self.assertTrue(torch.allclose(out, reference(images, 70, 56, "bicubic", False), atol=1e-5))
+
+    def test_needs_tiling(self):
+        images = torch.zeros((1, 100, 100, 3))
+        self.assertTrue(needs_tiling(images, 100, 100, budget=1024))
+        self.assertFalse(needs_tiling(images, 100, 100, budget=0))
+        self.assertFalse(needs_tiling(images, 100, 100, budget=1 << 30))
+
+
+if __name__ == '__main__':
+    unittest.main()
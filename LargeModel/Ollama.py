@@ -7,6 +7,8 @@ import random
 import os
 from PIL.PngImagePlugin import PngInfo
 
+from ..Common.libs.image_convert import tensor2pil
+
 class OllamaVisionSimple:
     def __init__(self):
         pass
@@ -68,11 +70,8 @@ class OllamaVisionSimple:
         }
 
         for (batch_number, image) in enumerate(images):
-            # Convert tensor to numpy array
-            i = 255. * image.cpu().numpy()
-
             # Create PIL Image
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+            img = tensor2pil(image)
 
             # Save to BytesIO buffer
             buffered = BytesIO()
@@ -502,8 +501,7 @@ class OllamaGenerateAdvance:
         if images is not None:
             images_b64 = []
             for (batch_number, image) in enumerate(images):
-                i = 255. * image.cpu().numpy()
-                img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+                img = tensor2pil(image)
                 buffered = BytesIO()
                 img.save(buffered, format="PNG")
                 img_bytes = base64.b64encode(buffered.getvalue())
@@ -4,30 +4,9 @@ import torch
 import numpy as np
 from PIL import Image, ImageChops
 
-def tensor_to_pil(tensor_image):
-    # Check if the input is a batch of images  
-    if tensor_image.ndim == 4:  # Batch of images (N, C, H, W)  
-        pil_images = []  
-        for i in range(tensor_image.shape[0]):  
-            img = tensor_image[i].squeeze(0)  # Remove the channel dimension  
-            pil_image = Image.fromarray((img.cpu().numpy() * 255).astype(np.uint8))  
-            pil_images.append(pil_image)  
-        return pil_images  # Return a list of PIL images  
-    else:  # Single image (C, H, W)  
-        tensor_image = tensor_image.squeeze(0)  
-        pil_image = Image.fromarray((tensor_image.cpu().numpy() * 255).astype(np.uint8))  
-        return [pil_image] 
-def pil_to_tensor(pil_image):  
-    # Check if the input is a list of images  
-    if isinstance(pil_image, list):  
-        tensors = []  
-        for pil_image in pil_image:  
-            tensor = torch.from_numpy(np.array(pil_image).astype(np.float32) / 255).unsqueeze(0)  
-            tensors.append(tensor)  
-        return torch.cat(tensors, dim=0)  # Concatenate tensors along the batch dimension  
-    else:  # Single image  
-        return torch.from_numpy(np.array(pil_image).astype(np.float32) / 255).unsqueeze(0)  
-    
+from ..Common.libs.image_convert import tensor2pil_batch, pils2tensor
+
+
 def generate_gaussian_noise(width, height, noise_scale=0.05):
         noise = np.random.normal(128, 128 * noise_scale, (height, width, 3)).astype(np.uint8)
         return Image.fromarray(noise)
@@ -62,7 +41,7 @@ class HighresFixScaler:
         blended_images = []  
 
         if mask is not None:  
-            mask_pils = tensor_to_pil(mask)
+            mask_pils = tensor2pil_batch(mask)
 
         
         for i in range(0, len(base_images)):  
@@ -101,10 +80,10 @@ class HighresFixScaler:
         scaled = scaled.movedim(1, -1)
 
         # Apply noise and blend
-        scaled_pils = tensor_to_pil(scaled)
+        scaled_pils = tensor2pil_batch(scaled)
         noise_image = generate_gaussian_noise(new_width, new_height, noise_scale)
         blended_images = self.soft_light_blend(scaled_pils, noise_image, inject_func, mask, blend_opacity)
-        blended_tensor = pil_to_tensor(blended_images)
+        blended_tensor = pils2tensor(blended_images)
 
         # Encode with VAE
         encoded = vae.encode(blended_tensor[:, :, :, :3])
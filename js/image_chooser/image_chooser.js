@@ -3,8 +3,8 @@ import { api } from "../../../scripts/api.js";
 
 import { restart_from_here } from "./image_chooser_prompt.js";
 import { hud, FlowState } from "./image_chooser_hud.js";
-import { send_cancel, send_message, send_onstart, skip_next_restart_message } from "./image_chooser_messaging.js";
-import { display_preview_images, additionalDrawBackground, click_is_in_image } from "./image_chooser_preview.js";
+import { send_cancel, send_message, send_onstart, skip_next_restart_message, connect_socket, set_current_prompt } from "./image_chooser_messaging.js";
+import { display_preview_images, additionalDrawBackground, click_is_in_image, open_zoom_viewer } from "./image_chooser_preview.js";
 
 function progressButtonPressed() {
     const node = app.graph._nodes_by_id[this.node_id];
@@ -94,7 +94,8 @@ app.registerExtension({
         /*
         At the start of execution
         */
-        function on_execution_start() {
+        function on_execution_start(event) {
+            set_current_prompt(event?.detail?.prompt_id);
             if (send_onstart()) {
                 app.graph._nodes.forEach((node)=> { 
                     if (node._ic_selected || node.anti__ic_selected) { 
@@ -209,6 +210,14 @@ app.registerExtension({
             type: "boolean",
             defaultValue: false,
         });
+        app.ui.settings.addSetting({
+            id: "ImageChooser.websocket",
+            name: "Image Chooser: send selections over a websocket",
+            type: "boolean",
+            defaultValue: true,
+            onChange: (newValue) => { if (newValue) connect_socket(); }
+        });
+        connect_socket();
     },
 
     async nodeCreated(node) {
@@ -234,6 +243,14 @@ app.registerExtension({
                 return (org_onMouseDown && org_onMouseDown.apply(this, arguments));
             }
 
+            /* Double click opens the deep zoom viewer - previews are downscaled */
+            const org_onDblClick = node.onDblClick;
+            node.onDblClick = function( e, pos, canvas ) {
+                const i = click_is_in_image(node, pos);
+                if (i>=0) { open_zoom_viewer(node, i); }
+                return (org_onDblClick && org_onDblClick.apply(this, arguments));
+            }
+
             /* The buttons */
             node.cancel_button_widget = node.addWidget("button", "", "", cancelButtonPressed);
             node.send_button_widget = node.addWidget("button", "", "", progressButtonPressed);
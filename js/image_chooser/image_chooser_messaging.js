@@ -1,3 +1,4 @@
+import { app } from "../../../scripts/app.js";
 import { api } from "../../../scripts/api.js";
 import { FlowState } from "./image_chooser_hud.js";
 
@@ -6,11 +7,56 @@ function send_message_from_pausing_node(message) {
     send_message(id, message);
 }
 
+/*
+Messages queued in the same tick are sent together as one bulk message:
+    { messages: [ { id, message, client_id, prompt_id }, ... ] }
+over the image chooser websocket when it is open, otherwise as one POST to /image_chooser_messages.
+
+client_id and prompt_id scope the message on the server so other users' paused choosers are untouched.
+prompt_id is null when nothing is running (e.g. restart from a chooser), which matches whichever
+prompt of this client picks the message up.
+*/
+var pending = null;
+var socket = null;
+var current_prompt_id = null;
+
+function set_current_prompt(prompt_id) {
+    if (prompt_id) current_prompt_id = prompt_id;
+}
+
+function session_of_message() {
+    return {
+        client_id: api.clientId ?? api.initialClientId ?? null,
+        prompt_id: FlowState.running() ? current_prompt_id : null,
+    };
+}
+
+function connect_socket() {
+    if (!app.ui.settings.getSettingValue("ImageChooser.websocket", true)) return;
+    if (socket && socket.readyState <= WebSocket.OPEN) return;
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    socket = new WebSocket(`${protocol}//${window.location.host}${api.apiURL("/image_chooser_ws")}`);
+    socket.addEventListener("close", () => { socket = null; });
+    socket.addEventListener("error", () => { socket = null; });
+}
+
+function flush_messages() {
+    const body = JSON.stringify({ messages: pending });
+    pending = null;
+    if (socket?.readyState === WebSocket.OPEN) {
+        socket.send(body);
+    } else {
+        api.fetchApi("/image_chooser_messages", { method: "POST", body, headers: { "Content-Type": "application/json" } });
+        connect_socket();
+    }
+}
+
 function send_message(id, message) {
-    const body = new FormData();
-    body.append('message',message);
-    body.append('id', id);
-    api.fetchApi("/image_chooser_message", { method: "POST", body, });
+    if (!pending) {
+        pending = [];
+        queueMicrotask(flush_messages);
+    }
+    pending.push({ id: String(id), message: message, ...session_of_message() });
 }
 
 function send_cancel() {
@@ -31,4 +77,4 @@ function send_onstart() {
     return true;
 }
 
-export { send_message_from_pausing_node, send_cancel, send_message, send_onstart, skip_next_restart_message }
+export { send_message_from_pausing_node, send_cancel, send_message, send_onstart, skip_next_restart_message, connect_socket, set_current_prompt }
@@ -1,29 +1,203 @@
 import { app } from "../../../scripts/app.js";
 import { api } from "../../../scripts/api.js";
+import { set_current_prompt } from "./image_chooser_messaging.js";
+
+/* 1x1 transparent placeholder, shown until a streamed preview arrives */
+const PLACEHOLDER = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7";
 
 function display_preview_images(event) {
     const node = app.graph._nodes_by_id[event.detail.id];
     if (node?.isImageChooser) {
-        node._ic_selected = new Set();
-        node.anti__ic_selected = new Set();
-        showImages(node, event.detail.urls);
+        set_current_prompt(event.detail.prompt_id);
+        if (event.detail.index === undefined) {
+            node._ic_selected = new Set();
+            node.anti__ic_selected = new Set();
+            showImages(node, event.detail.urls, event.detail.count);
+        } else {
+            showImage(node, event.detail.index, event.detail.urls[0]);
+        }
     } else {
         console.log(`Image Chooser Preview - failed to find ${event.detail.id}`)
     }
 }
 
-function showImages(node, urls) {
+function newImage() {
+    const img = new Image();
+    img.onload = () => { app.graph.setDirtyCanvas(true); };
+    return img;
+}
+
+function showImages(node, urls, count) {
     node.imgs = [];
     urls.forEach((u)=> {
-        const img = new Image();
+        const img = newImage();
         node.imgs.push(img);
-        img.onload = () => { app.graph.setDirtyCanvas(true); };
         //img.src = `/view?filename=${encodeURIComponent(u.filename)}&type=temp&subfolder=${app.getPreviewFormatParam()}`
         img.src = api.apiURL(`/view?filename=${encodeURIComponent(u.filename)}&type=temp&subfolder=${app.getPreviewFormatParam()}`);
     })
+    /* previews are streamed one by one - reserve a slot for each */
+    for (let i = urls.length; i < (count ?? 0); i++) {
+        const img = newImage();
+        node.imgs.push(img);
+        img.src = PLACEHOLDER;
+    }
     node.setSizeForImage?.();
 }
 
+function showImage(node, index, u) {
+    if (!node.imgs) node.imgs = [];
+    while (node.imgs.length <= index) {
+        const img = newImage();
+        node.imgs.push(img);
+        img.src = PLACEHOLDER;
+    }
+    node.imgs[index].src = api.apiURL(`/view?filename=${encodeURIComponent(u.filename)}&type=${u.type}&subfolder=${encodeURIComponent(u.subfolder)}`);
+}
+
+function stash_query(node, index) {
+    const client_id = api.clientId ?? api.initialClientId ?? "";
+    return `id=${encodeURIComponent(node.id)}&index=${index}&client_id=${encodeURIComponent(client_id)}`;
+}
+
+function open_full_resolution(node, index) {
+    window.open(api.apiURL(`/image_chooser_full?${stash_query(node, index)}`), "_blank");
+}
+
+/*
+Deep zoom viewer. The streamed preview is shown at once as the overview; the server
+cuts a tile pyramid from the stashed full resolution image and only the tiles covering
+the visible area at the current zoom are fetched. Wheel zooms, drag pans,
+'f' opens the full resolution image, Escape or double click closes.
+*/
+function open_zoom_viewer(node, index) {
+    const query = stash_query(node, index);
+    const overview = node.imgs?.[index];
+    const overlay = document.createElement("div");
+    overlay.style.cssText = "position:fixed;inset:0;z-index:10000;background:rgba(0,0,0,0.9);cursor:grab;";
+    const canvas = document.createElement("canvas");
+    overlay.appendChild(canvas);
+    const hint = document.createElement("div");
+    hint.style.cssText = "position:absolute;left:8px;bottom:8px;color:#aaa;font:12px sans-serif;pointer-events:none;";
+    hint.textContent = "wheel: zoom  |  drag: pan  |  f: full resolution  |  esc / double click: close";
+    overlay.appendChild(hint);
+    document.body.appendChild(overlay);
+    const ctx = canvas.getContext("2d");
+
+    /* image size is the overview size until the pyramid info arrives */
+    const view = { info: null, width: overview?.naturalWidth || 1, height: overview?.naturalHeight || 1, scale: 1, x: 0, y: 0 };
+    const tiles = new Map();
+    let pending = false;
+
+    function fit() {
+        view.scale = Math.min(canvas.width / view.width, canvas.height / view.height);
+        view.x = (canvas.width - view.width * view.scale) / 2;
+        view.y = (canvas.height - view.height * view.scale) / 2;
+    }
+
+    function redraw() {
+        if (pending) return;
+        pending = true;
+        requestAnimationFrame(() => { pending = false; draw(); });
+    }
+
+    function tile(level, tx, ty) {
+        const key = `${level}/${tx}/${ty}`;
+        if (!tiles.has(key)) {
+            const img = new Image();
+            img.onload = redraw;
+            img.src = api.apiURL(`/image_chooser_tile?${query}&level=${level}&x=${tx}&y=${ty}&v=${view.info.version}`);
+            tiles.set(key, img);
+        }
+        return tiles.get(key);
+    }
+
+    function draw() {
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        ctx.imageSmoothingEnabled = view.scale < 1;
+        if (overview?.complete) ctx.drawImage(overview, view.x, view.y, view.width * view.scale, view.height * view.scale);
+        const info = view.info;
+        if (!info) return;
+        /* coarsest level that still has at least one image pixel per screen pixel */
+        const level = Math.max(0, Math.min(info.levels - 1, Math.floor(Math.log2(1 / view.scale))));
+        /* tiles that are no sharper than the overview are not worth fetching */
+        if ((info.width >> level) <= (overview?.naturalWidth ?? 0)) return;
+        const span = info.tile_size << level;
+        const x0 = Math.max(0, -view.x / view.scale), x1 = Math.min(info.width, (canvas.width - view.x) / view.scale);
+        const y0 = Math.max(0, -view.y / view.scale), y1 = Math.min(info.height, (canvas.height - view.y) / view.scale);
+        for (let ty = Math.floor(y0 / span); ty * span < y1; ty++) {
+            for (let tx = Math.floor(x0 / span); tx * span < x1; tx++) {
+                const img = tile(level, tx, ty);
+                if (!img.complete || !img.naturalWidth) continue;
+                const w = Math.min(span, info.width - tx * span), h = Math.min(span, info.height - ty * span);
+                ctx.drawImage(img, view.x + tx * span * view.scale, view.y + ty * span * view.scale, w * view.scale, h * view.scale);
+            }
+        }
+    }
+
+    function resize() {
+        canvas.width = window.innerWidth;
+        canvas.height = window.innerHeight;
+        redraw();
+    }
+
+    function close() {
+        window.removeEventListener("resize", resize);
+        window.removeEventListener("keydown", keydown, true);
+        tiles.clear();
+        overlay.remove();
+    }
+
+    function keydown(e) {
+        if (e.key === "Escape") { close(); }
+        else if (e.key === "f") { open_full_resolution(node, index); }
+        else { return; }
+        e.preventDefault();
+        e.stopPropagation();
+    }
+
+    overlay.addEventListener("wheel", (e) => {
+        e.preventDefault();
+        const factor = Math.exp(-e.deltaY * 0.002);
+        const scale = Math.min(8, Math.max(0.01, view.scale * factor));
+        view.x = e.clientX - (e.clientX - view.x) * scale / view.scale;
+        view.y = e.clientY - (e.clientY - view.y) * scale / view.scale;
+        view.scale = scale;
+        redraw();
+    }, { passive: false });
+
+    let drag = null;
+    overlay.addEventListener("pointerdown", (e) => {
+        drag = { x: e.clientX - view.x, y: e.clientY - view.y };
+        overlay.setPointerCapture(e.pointerId);
+        overlay.style.cursor = "grabbing";
+    });
+    overlay.addEventListener("pointermove", (e) => {
+        if (!drag) return;
+        view.x = e.clientX - drag.x;
+        view.y = e.clientY - drag.y;
+        redraw();
+    });
+    overlay.addEventListener("pointerup", () => { drag = null; overlay.style.cursor = "grab"; });
+    overlay.addEventListener("dblclick", close);
+    window.addEventListener("resize", resize);
+    window.addEventListener("keydown", keydown, true);
+
+    canvas.width = window.innerWidth;
+    canvas.height = window.innerHeight;
+    fit();
+    redraw();
+
+    api.fetchApi(`/image_chooser_tiles?${query}`).then((response) => response.ok ? response.json() : null).then((info) => {
+        if (!info || !overlay.isConnected) return;
+        /* keep the same view, now measured in full resolution pixels */
+        view.scale *= view.width / info.width;
+        view.info = info;
+        view.width = info.width;
+        view.height = info.height;
+        redraw();
+    }).catch((e) => { console.log(`Image Chooser Preview - failed to load tile info: ${e}`); });
+}
+
 function drawRect(node, s, ctx) {
     const padding = 1;
     var rect;
@@ -86,4 +260,4 @@ function click_is_in_image(node, pos) {
     return -1;
 }
 
-export { display_preview_images, additionalDrawBackground, click_is_in_image }
\ No newline at end of file
+export { display_preview_images, additionalDrawBackground, click_is_in_image, open_full_resolution, open_zoom_viewer }
\ No newline at end of file
@@ -0,0 +1,67 @@
+import { app } from "../../../scripts/app.js";
+
+import { ComfyWidgets } from "../../../scripts/widgets.js";
+
+// 在保存节点上显示后台保存的结果 (失败的帧数) 与 PNG 自动调节的状态
+const SAVER_NODES = ["ImageSaver", "ImageSwitchSaver"];
+
+function describe(message) {
+	const lines = [];
+	for (const s of message.save ?? []) {
+		let line = `saved ${s.saved}/${s.queued}`;
+		if (s.failed) {
+			line += `, FAILED ${s.failed}`;
+		}
+		if (s.pending) {
+			line += `, ${s.pending} still writing`;
+		}
+		if (s.failed_total) {
+			line += ` (${s.failed_total} failed since start, see log)`;
+		}
+		lines.push(line);
+	}
+	// preset 为 autotune 时显示 PNG 自动调节器选中的级别与测得的磁盘带宽
+	for (const t of message.autotune ?? []) {
+		const disk = t.disk_mb_s == null ? "unknown" : `${t.disk_mb_s.toFixed(1)}MB/s`;
+		lines.push(`PNG autotune: level ${t.level}, disk ${disk}`);
+	}
+	return lines.join("\n");
+}
+
+app.registerExtension({
+	name: "smell.SaveStatus",
+	async beforeRegisterNodeDef(nodeType, nodeData, app) {
+		if (!SAVER_NODES.includes(nodeData.name)) {
+			return;
+		}
+
+		function populate(text) {
+			let w = this.widgets?.find((w) => w.name === "save_status");
+			if (!w) {
+				w = ComfyWidgets["STRING"](this, "save_status", ["STRING", { multiline: true }], app).widget;
+				w.inputEl.readOnly = true;
+				w.inputEl.style.opacity = 0.6;
+				w.serialize = false;
+			}
+			w.value = text;
+
+			requestAnimationFrame(() => {
+				const sz = this.computeSize();
+				if (sz[0] < this.size[0]) {
+					sz[0] = this.size[0];
+				}
+				if (sz[1] < this.size[1]) {
+					sz[1] = this.size[1];
+				}
+				this.onResize?.(sz);
+				app.graph.setDirtyCanvas(true, false);
+			});
+		}
+
+		const onExecuted = nodeType.prototype.onExecuted;
+		nodeType.prototype.onExecuted = function (message) {
+			onExecuted?.apply(this, arguments);
+			populate.call(this, describe(message));
+		};
+	},
+});